@@ -234,20 +234,47 @@ class Assignment(base.AssignmentDriverV9):
             elif user_id:
                 actors = [user_id]
 
-            query = session.query(RoleAssignment)
+            query = sql.bakery(
+                lambda session: session.query(RoleAssignment))
+            params = {}
 
             if role_id:
-                query = query.filter_by(role_id=role_id)
+                query += lambda q: q.filter(
+                    RoleAssignment.role_id == sql.bindparam('role_id'))
+                params['role_id'] = role_id
+            # The number of parameters of each IN clause is part of the key
+            # of the baked query, as the clause depends on it. Queries over
+            # long lists are not baked, since their IN clauses are not padded.
+            if any(len(values) > sql.IN_SIZE_MAX
+                   for values in (actors or [], targets or [])):
+                query.spoil()
             if actors:
-                query = query.filter(RoleAssignment.actor_id.in_(actors))
+                actors_size = sql.in_size(actors)
+                query.add_criteria(lambda q: q.filter(sql.in_bindparams(
+                    RoleAssignment.actor_id, 'actor_id', actors_size)),
+                    actors_size)
+                params.update(sql.in_params('actor_id', actors, actors_size))
             if targets:
-                query = query.filter(RoleAssignment.target_id.in_(targets))
+                targets_size = sql.in_size(targets)
+                query.add_criteria(lambda q: q.filter(sql.in_bindparams(
+                    RoleAssignment.target_id, 'target_id', targets_size)),
+                    targets_size)
+                params.update(
+                    sql.in_params('target_id', targets, targets_size))
             if assignment_types:
-                query = query.filter(RoleAssignment.type.in_(assignment_types))
+                types_size = sql.in_size(assignment_types)
+                query.add_criteria(lambda q: q.filter(sql.in_bindparams(
+                    RoleAssignment.type, 'type', types_size)),
+                    types_size)
+                params.update(
+                    sql.in_params('type', assignment_types, types_size))
             if inherited_to_projects is not None:
-                query = query.filter_by(inherited=inherited_to_projects)
+                query += lambda q: q.filter(
+                    RoleAssignment.inherited == sql.bindparam('inherited'))
+                params['inherited'] = inherited_to_projects
 
-            return [denormalize_role(ref) for ref in query.all()]
+            return [denormalize_role(ref)
+                    for ref in query(session).params(**params).all()]
 
     def delete_project_assignments(self, project_id):
         with sql.session_for_write() as session:
@@ -19,6 +19,7 @@ import functools
 
 from oslo_log import log
 from oslo_log import versionutils
+from six.moves import range
 
 from keystone.assignment.backends import base
 from keystone.assignment.role_backends import base as role_base
@@ -31,11 +32,16 @@ from keystone import exception
 from keystone.i18n import _
 from keystone.i18n import _LI, _LE
 from keystone import notifications
+from keystone.token import provider as token_provider
 
 
 CONF = keystone.conf.CONF
 LOG = log.getLogger(__name__)
 
+# The maximum number of projects whose assignments are read by a single query
+# when listing the users of a whole domain.
+MAX_PROJECTS_PER_QUERY = 500
+
 # This is a general cache region for assignment administration (CRUD
 # operations).
 MEMOIZE = cache.get_memoization_decorator(group='role')
@@ -124,6 +130,41 @@ class Manager(manager.Manager):
         # Use set() to process the list to remove any duplicates
         return list(set([x['user_id'] for x in assignment_list]))
 
+    def list_user_ids_for_domain(self, domain_id, project_ids):
+        """List the users with a role on a domain or on any of its projects.
+
+        This reads the assignments of many projects per query and lists the
+        members of each group once, rather than computing the effective
+        assignments of every project in turn. Since every project of the
+        domain is covered, assignments inherited within the domain need no
+        expanding.
+
+        :param domain_id: the domain
+        :param project_ids: the IDs of all the projects of the domain
+        :returns: a set of user IDs
+        """
+        assignments = self.driver.list_role_assignments(domain_id=domain_id)
+        project_ids = list(project_ids)
+        for i in range(0, len(project_ids), MAX_PROJECTS_PER_QUERY):
+            assignments.extend(self.driver.list_role_assignments(
+                project_ids=project_ids[i:i + MAX_PROJECTS_PER_QUERY]))
+
+        user_ids = set()
+        group_ids = set()
+        for assignment in assignments:
+            if 'user_id' in assignment:
+                user_ids.add(assignment['user_id'])
+            else:
+                group_ids.add(assignment['group_id'])
+        for group_id in group_ids:
+            try:
+                users = self.identity_api.list_users_in_group(group_id)
+            except exception.GroupNotFound:
+                LOG.debug('Group %s not found, no users to list.', group_id)
+                continue
+            user_ids.update(user['id'] for user in users)
+        return user_ids
+
     def _list_parent_ids_of_project(self, project_id):
         if CONF.os_inherit.enabled:
             return [x['id'] for x in (
@@ -214,6 +255,7 @@ class Manager(manager.Manager):
                 tenant_id,
                 CONF.member_role_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     @notifications.role_assignment('created')
     def _add_role_to_user_and_project_adapter(self, role_id, user_id=None,
@@ -234,6 +276,7 @@ class Manager(manager.Manager):
         self._add_role_to_user_and_project_adapter(
             role_id, user_id=user_id, project_id=tenant_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     def remove_user_from_project(self, tenant_id, user_id):
         """Remove user from a tenant.
@@ -258,6 +301,7 @@ class Manager(manager.Manager):
                 LOG.debug("Removing role %s failed because it does not exist.",
                           role_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     # TODO(henry-nash): We might want to consider list limiting this at some
     # point in the future.
@@ -318,6 +362,7 @@ class Manager(manager.Manager):
         self._remove_role_from_user_and_project_adapter(
             role_id, user_id=user_id, project_id=tenant_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     def _emit_invalidate_user_token_persistence(self, user_id):
         self.identity_api.emit_invalidate_user_token_persistence(user_id)
@@ -347,6 +392,7 @@ class Manager(manager.Manager):
         self.driver.create_grant(role_id, user_id, group_id, domain_id,
                                  project_id, inherited_to_projects)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     def get_grant(self, role_id, user_id=None, group_id=None,
                   domain_id=None, project_id=None,
@@ -425,6 +471,7 @@ class Manager(manager.Manager):
         self.driver.delete_grant(role_id, user_id, group_id, domain_id,
                                  project_id, inherited_to_projects)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     # The methods _expand_indirect_assignment, _list_direct_role_assignments
     # and _list_effective_role_assignments below are only used on
@@ -1218,6 +1265,7 @@ class RoleManager(manager.Manager):
         notifications.Audit.deleted(self._ROLE, role_id, initiator)
         self.get_role.invalidate(self, role_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     # TODO(ayoung): Add notification
     def create_implied_role(self, prior_role_id, implied_role_id):
@@ -1228,11 +1276,13 @@ class RoleManager(manager.Manager):
         response = self.driver.create_implied_role(
             prior_role_id, implied_role_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
         return response
 
     def delete_implied_role(self, prior_role_id, implied_role_id):
         self.driver.delete_implied_role(prior_role_id, implied_role_id)
         COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
 
 @versionutils.deprecated(
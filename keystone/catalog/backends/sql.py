@@ -13,8 +13,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import itertools
-
 import sqlalchemy
 from sqlalchemy.sql import true
 
@@ -30,6 +28,23 @@ from keystone.i18n import _
 CONF = keystone.conf.CONF
 
 
+def _get_url_substitutions():
+    """Return the configuration values endpoint URLs can refer to."""
+    substitutions = {}
+    for key in utils.WHITELISTED_PROPERTIES:
+        if key in utils.DYNAMIC_URL_PROPERTIES:
+            continue
+        # The [eventlet_server] options override the [DEFAULT] ones.
+        for group in (CONF.eventlet_server, CONF):
+            try:
+                substitutions[key] = getattr(group, key)
+                break
+            except AttributeError:  # nosec
+                # The option does not exist in this group.
+                continue
+    return substitutions
+
+
 class Region(sql.ModelBase, sql.DictBase):
     __tablename__ = 'region'
     attributes = ['id', 'description', 'parent_region_id']
@@ -82,6 +97,37 @@ class Endpoint(sql.ModelBase, sql.DictBase):
 
 
 class Catalog(base.CatalogDriverV8):
+
+    def __init__(self):
+        super(Catalog, self).__init__()
+        # The compiled templates of the endpoint URLs in the catalog, and the
+        # configuration values they were compiled with.
+        self._url_templates = {}
+        self._url_substitutions = None
+
+    def _get_url_templates(self, urls):
+        """Return the compiled templates of the given endpoint URLs.
+
+        Templates are only compiled for the URLs that were not in the catalog
+        the last time it was rendered, or when the configuration values they
+        refer to have changed. Templates of URLs no longer in the catalog are
+        dropped.
+
+        """
+        substitutions = _get_url_substitutions()
+        templates = self._url_templates
+        if substitutions != self._url_substitutions:
+            templates = {}
+        elif all(url in templates for url in urls):
+            return templates
+
+        templates = dict(
+            (url, templates.get(url) or utils.URLTemplate(url, substitutions))
+            for url in urls)
+        self._url_templates = templates
+        self._url_substitutions = substitutions
+        return templates
+
     # Regions
     def list_regions(self, hints):
         with sql.session_for_read() as session:
@@ -266,9 +312,7 @@ class Catalog(base.CatalogDriverV8):
                   empty dict.
 
         """
-        substitutions = dict(
-            itertools.chain(CONF.items(), CONF.eventlet_server.items()))
-        substitutions.update({'user_id': user_id})
+        substitutions = {'user_id': user_id}
         silent_keyerror_failures = []
         if tenant_id:
             substitutions.update({
@@ -282,22 +326,24 @@ class Catalog(base.CatalogDriverV8):
             endpoints = (session.query(Endpoint).
                          options(sql.joinedload(Endpoint.service)).
                          filter(Endpoint.enabled == true()).all())
+            endpoints = [endpoint for endpoint in endpoints
+                         if endpoint.service['enabled']]
+            url_templates = self._get_url_templates(
+                [endpoint['url'] for endpoint in endpoints])
 
             catalog = {}
 
             for endpoint in endpoints:
-                if not endpoint.service['enabled']:
-                    continue
                 try:
-                    formatted_url = utils.format_url(
-                        endpoint['url'], substitutions,
+                    formatted_url = url_templates[endpoint['url']].format(
+                        substitutions,
                         silent_keyerror_failures=silent_keyerror_failures)
                     if formatted_url is not None:
                         url = formatted_url
                     else:
                         continue
                 except exception.MalformedEndpoint:  # nosec(tkelsey)
-                    continue  # this failure is already logged in format_url()
+                    continue  # this failure has already been logged
 
                 region = endpoint['region_id']
                 service_type = endpoint.service['type']
@@ -326,9 +372,7 @@ class Catalog(base.CatalogDriverV8):
         :returns: A list representing the service catalog or an empty list
 
         """
-        d = dict(
-            itertools.chain(CONF.items(), CONF.eventlet_server.items()))
-        d.update({'user_id': user_id})
+        d = {'user_id': user_id}
         silent_keyerror_failures = []
         if tenant_id:
             d.update({
@@ -339,9 +383,13 @@ class Catalog(base.CatalogDriverV8):
             silent_keyerror_failures = ['tenant_id', 'project_id', ]
 
         with sql.session_for_read() as session:
-            services = (session.query(Service).filter(
+            query = sql.bakery(lambda session: session.query(Service).filter(
                 Service.enabled == true()).options(
-                    sql.joinedload(Service.endpoints)).all())
+                    sql.joinedload(Service.endpoints)))
+            services = query(session).all()
+            url_templates = self._get_url_templates(
+                [ep.url for svc in services for ep in svc.endpoints
+                 if ep.enabled])
 
             def make_v3_endpoints(endpoints):
                 for endpoint in (ep.to_dict()
@@ -351,15 +399,15 @@ class Catalog(base.CatalogDriverV8):
                     del endpoint['enabled']
                     endpoint['region'] = endpoint['region_id']
                     try:
-                        formatted_url = utils.format_url(
-                            endpoint['url'], d,
+                        formatted_url = url_templates[endpoint['url']].format(
+                            d,
                             silent_keyerror_failures=silent_keyerror_failures)
                         if formatted_url:
                             endpoint['url'] = formatted_url
                         else:
                             continue
                     except exception.MalformedEndpoint:  # nosec(tkelsey)
-                        # this failure is already logged in format_url()
+                        # this failure has already been logged
                         continue
 
                     yield endpoint
@@ -15,6 +15,10 @@
 
 """Main entry point into the Catalog service."""
 
+import collections
+import threading
+import uuid
+
 from oslo_log import versionutils
 
 from keystone.catalog.backends import base
@@ -43,6 +47,49 @@ MEMOIZE_COMPUTED_CATALOG = cache.get_memoization_decorator(
     group='catalog',
     region=COMPUTED_CATALOG_REGION)
 
+# The key, in the computed catalog region, of the generation of the catalog
+# shared by every keystone process. Since every change to the catalog
+# invalidates the region, a new generation is created on the first request for
+# a catalog after a change, telling every process to discard the catalogs it
+# has rendered.
+CATALOG_GENERATION_KEY = 'catalog_generation'
+
+
+class _RenderedCatalogs(object):
+    """The V3 catalogs rendered for one generation of the catalog.
+
+    The least recently used catalogs are discarded first.
+
+    """
+
+    __slots__ = ('generation', 'catalogs', '_lock')
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.catalogs = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            catalog = self.catalogs.pop(key, None)
+            if catalog is not None:
+                self.catalogs[key] = catalog
+            return catalog
+
+    def add(self, key, catalog, size):
+        with self._lock:
+            self.catalogs.pop(key, None)
+            while len(self.catalogs) >= size:
+                self.catalogs.popitem(last=False)
+            self.catalogs[key] = catalog
+
+
+def _copy_v3_catalog(catalog):
+    """Return a copy of a V3 catalog that a caller is free to mutate."""
+    return [dict(service, endpoints=[dict(endpoint)
+                                     for endpoint in service['endpoints']])
+            for service in catalog]
+
 
 @dependency.provider('catalog_api')
 @dependency.requires('resource_api')
@@ -62,6 +109,7 @@ class Manager(manager.Manager):
 
     def __init__(self):
         super(Manager, self).__init__(CONF.catalog.driver)
+        self._rendered_catalogs = None
 
     def create_region(self, region_ref, initiator=None):
         # Check duplicate ID
@@ -226,9 +274,52 @@ class Manager(manager.Manager):
             raise exception.NotFound('Catalog not found for user and tenant')
 
     @MEMOIZE_COMPUTED_CATALOG
-    def get_v3_catalog(self, user_id, tenant_id):
+    def _get_v3_catalog(self, user_id, tenant_id):
         return self.driver.get_v3_catalog(user_id, tenant_id)
 
+    def _get_catalog_generation(self):
+        """Return the generation of the catalog.
+
+        :returns: the generation of the catalog, or None if catalogs are not
+                  cached.
+
+        """
+        if not (CONF.cache.enabled and CONF.catalog.caching and
+                CONF.catalog.local_cache_size):
+            return None
+        # NOTE: The generation expires like any other computed catalog, which
+        # bounds how long changes that are not signalled stay unnoticed.
+        return COMPUTED_CATALOG_REGION.get_or_create(
+            CATALOG_GENERATION_KEY, lambda: uuid.uuid4().hex)
+
+    def get_v3_catalog(self, user_id, tenant_id):
+        """Return the V3 catalog for a user and project.
+
+        The rendered catalogs are kept in memory until the generation of the
+        catalog changes, so that issuing a scoped token does not query the
+        catalog (and, with endpoint filtering, the project's endpoint
+        associations) again. They are keyed by user as well as project, since
+        endpoint URLs may refer to the user ID.
+
+        """
+        # The generation must be read before rendering the catalog, so that a
+        # change made in the meantime discards it.
+        generation = self._get_catalog_generation()
+        if generation is None:
+            return self._get_v3_catalog(user_id, tenant_id)
+
+        rendered = self._rendered_catalogs
+        if rendered is None or rendered.generation != generation:
+            rendered = _RenderedCatalogs(generation)
+            self._rendered_catalogs = rendered
+
+        key = (user_id, tenant_id)
+        catalog = rendered.get(key)
+        if catalog is None:
+            catalog = self._get_v3_catalog(user_id, tenant_id)
+            rendered.add(key, catalog, CONF.catalog.local_cache_size)
+        return _copy_v3_catalog(catalog)
+
     def add_endpoint_to_project(self, endpoint_id, project_id):
         self.driver.add_endpoint_to_project(endpoint_id, project_id)
         COMPUTED_CATALOG_REGION.invalidate()
@@ -248,6 +339,16 @@ class Manager(manager.Manager):
             endpoint_group_id, project_id)
         COMPUTED_CATALOG_REGION.invalidate()
 
+    def update_endpoint_group(self, endpoint_group_id, endpoint_group):
+        ref = self.driver.update_endpoint_group(endpoint_group_id,
+                                                endpoint_group)
+        COMPUTED_CATALOG_REGION.invalidate()
+        return ref
+
+    def delete_endpoint_group(self, endpoint_group_id):
+        self.driver.delete_endpoint_group(endpoint_group_id)
+        COMPUTED_CATALOG_REGION.invalidate()
+
     def delete_endpoint_group_association_by_project(self, project_id):
         try:
             self.driver.delete_endpoint_group_association_by_project(
@@ -255,6 +356,8 @@ class Manager(manager.Manager):
         except exception.NotImplemented:
             # Some catalog drivers don't support this
             pass
+        else:
+            COMPUTED_CATALOG_REGION.invalidate()
 
     def get_endpoint_groups_for_project(self, project_id):
         # recover the project endpoint group memberships and for each
@@ -322,6 +425,8 @@ class Manager(manager.Manager):
         except exception.NotImplemented:
             # Some catalog drivers don't support this
             pass
+        else:
+            COMPUTED_CATALOG_REGION.invalidate()
 
     def delete_association_by_project(self, project_id):
         try:
@@ -329,6 +434,8 @@ class Manager(manager.Manager):
         except exception.NotImplemented:
             # Some catalog drivers don't support this
             pass
+        else:
+            COMPUTED_CATALOG_REGION.invalidate()
 
 
 @versionutils.deprecated(
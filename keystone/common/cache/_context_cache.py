@@ -11,15 +11,25 @@
 # under the License.
 
 """A dogpile.cache proxy that caches objects in the request local cache."""
+import copy
+import datetime
+
 from dogpile.cache import api
 from dogpile.cache import proxy
 from oslo_context import context as oslo_context
 from oslo_serialization import msgpackutils
+import six
 
 
 # Register our new handler.
 _registry = msgpackutils.default_registry
 
+# Types whose instances can be handed out without copying them.
+_IMMUTABLE_TYPES = frozenset(
+    six.string_types + six.integer_types +
+    (six.binary_type, six.text_type, float, bool, type(None),
+     datetime.datetime, datetime.date))
+
 
 def _register_model_handler(handler_class):
     """Register a new model handler."""
@@ -28,59 +38,111 @@ def _register_model_handler(handler_class):
     _registry.frozen = True
 
 
-class _ResponseCacheProxy(proxy.ProxyBackend):
+def _copy_payload(payload):
+    """Return a copy of a cached payload that a caller is free to mutate.
 
-    __key_pfx = '_request_cache_%s'
+    Dicts, lists, tuples and sets of plain values, which is what nearly
+    every cached payload is made of, are copied by hand as that is much
+    cheaper than a deepcopy. Immutable values are returned as is.
+    """
+    payload_type = type(payload)
+    if payload_type in _IMMUTABLE_TYPES:
+        return payload
+    if payload_type is dict:
+        return {k: _copy_payload(v) for k, v in payload.items()}
+    if payload_type is list:
+        return [_copy_payload(v) for v in payload]
+    if payload_type is tuple:
+        return tuple(_copy_payload(v) for v in payload)
+    if payload_type in (set, frozenset):
+        return payload_type(_copy_payload(v) for v in payload)
+    return copy.deepcopy(payload)
 
-    def _get_request_context(self):
-        # Return the current context or a new/empty context.
-        return oslo_context.get_current() or oslo_context.RequestContext()
 
-    def _get_request_key(self, key):
-        return self.__key_pfx % key
+class _RequestCache(object):
+    """The values cached for the lifetime of a single request."""
 
-    def _set_local_cache(self, key, value, ctx=None):
-        # Set a serialized version of the returned value in local cache for
-        # subsequent calls to the memoized method.
-        if not ctx:
-            ctx = self._get_request_context()
-        serialize = {'payload': value.payload, 'metadata': value.metadata}
-        setattr(ctx, self._get_request_key(key), msgpackutils.dumps(serialize))
-        ctx.update_store()
+    __slots__ = ('values', 'hits', 'misses')
+
+    def __init__(self):
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+
+
+def _get_request_cache_stats():
+    """Return the request local cache hits and misses of this request.
 
-    def _get_local_cache(self, key):
-        # Return the version from our local request cache if it exists.
-        ctx = self._get_request_context()
+    :returns: a dict with ``hits`` and ``misses`` counts, or None if there is
+              no request cache for the current context.
+    """
+    request_cache = getattr(oslo_context.get_current(),
+                            _ResponseCacheProxy.REQUEST_CACHE_ATTR, None)
+    if request_cache is None:
+        return None
+    return {'hits': request_cache.hits, 'misses': request_cache.misses}
+
+
+class _ResponseCacheProxy(proxy.ProxyBackend):
+
+    REQUEST_CACHE_ATTR = '_keystone_request_cache'
+
+    def _get_request_cache(self, create=False):
+        # Return the cache of the current context, if there is one. The
+        # values are kept as CachedValue objects rather than being serialized
+        # into the context, so a hit costs no more than copying the payload.
+        ctx = oslo_context.get_current()
+        if ctx is None:
+            if not create:
+                return None
+            ctx = oslo_context.RequestContext()
         try:
-            value = getattr(ctx, self._get_request_key(key))
+            return getattr(ctx, self.REQUEST_CACHE_ATTR)
         except AttributeError:
-            return api.NO_VALUE
-
-        value = msgpackutils.loads(value)
-        return api.CachedValue(payload=value['payload'],
-                               metadata=value['metadata'])
+            if not create:
+                return None
+        request_cache = _RequestCache()
+        setattr(ctx, self.REQUEST_CACHE_ATTR, request_cache)
+        # Make sure a newly created context is the current one.
+        ctx.update_store()
+        return request_cache
+
+    def _set_local_cache(self, key, value, request_cache):
+        # Keep a copy so that changes made by the caller to the value it
+        # cached don't leak into subsequent calls to the memoized method.
+        request_cache.values[key] = api.CachedValue(
+            payload=_copy_payload(value.payload), metadata=value.metadata)
+
+    def _get_local_cache(self, key, request_cache):
+        # Return a copy of the version from our local request cache if it
+        # exists; callers commonly mutate what they get back.
+        if request_cache is not None:
+            value = request_cache.values.get(key)
+            if value is not None:
+                request_cache.hits += 1
+                return api.CachedValue(payload=_copy_payload(value.payload),
+                                       metadata=value.metadata)
+            request_cache.misses += 1
+        return api.NO_VALUE
 
     def _delete_local_cache(self, key):
         # On invalidate/delete remove the value from the local request cache
-        ctx = self._get_request_context()
-        try:
-            delattr(ctx, self._get_request_key(key))
-            ctx.update_store()
-        except AttributeError:  # nosec
-            # NOTE(morganfainberg): We will simply pass here, this value has
-            # not been cached locally in the request.
-            pass
+        request_cache = self._get_request_cache()
+        if request_cache is not None:
+            request_cache.values.pop(key, None)
 
     def get(self, key):
-        value = self._get_local_cache(key)
+        request_cache = self._get_request_cache()
+        value = self._get_local_cache(key, request_cache)
         if value is api.NO_VALUE:
             value = self.proxied.get(key)
             if value is not api.NO_VALUE:
-                self._set_local_cache(key, value)
+                self._set_local_cache(
+                    key, value, request_cache or self._get_request_cache(True))
         return value
 
     def set(self, key, value):
-        self._set_local_cache(key, value)
+        self._set_local_cache(key, value, self._get_request_cache(True))
         self.proxied.set(key, value)
 
     def delete(self, key):
@@ -88,20 +150,27 @@ class _ResponseCacheProxy(proxy.ProxyBackend):
         self.proxied.delete(key)
 
     def get_multi(self, keys):
+        request_cache = self._get_request_cache()
         values = {}
         for key in keys:
-            v = self._get_local_cache(key)
+            v = self._get_local_cache(key, request_cache)
             if v is not api.NO_VALUE:
                 values[key] = v
-        query_keys = set(keys).difference(set(values.keys()))
-        values.update(dict(
-            zip(query_keys, self.proxied.get_multi(query_keys))))
+        query_keys = [k for k in set(keys) if k not in values]
+        if query_keys:
+            fetched = dict(zip(query_keys, self.proxied.get_multi(query_keys)))
+            for key, value in fetched.items():
+                if value is not api.NO_VALUE:
+                    if request_cache is None:
+                        request_cache = self._get_request_cache(True)
+                    self._set_local_cache(key, value, request_cache)
+            values.update(fetched)
         return [values[k] for k in keys]
 
     def set_multi(self, mapping):
-        ctx = self._get_request_context()
+        request_cache = self._get_request_cache(True)
         for k, v in mapping.items():
-            self._set_local_cache(k, v, ctx)
+            self._set_local_cache(k, v, request_cache)
         self.proxied.set_multi(mapping)
 
     def delete_multi(self, keys):
@@ -15,8 +15,11 @@
 """Keystone Caching Layer Implementation."""
 
 import os
+import time
+import weakref
 
 import dogpile.cache
+from dogpile.cache import api
 from dogpile.cache import region
 from dogpile.cache import util
 from oslo_cache import core as cache
@@ -28,6 +31,11 @@ import keystone.conf
 CONF = keystone.conf.CONF
 
 
+# Every live RegionInvalidationManager, so that the region IDs sharing an
+# invalidation region can be refreshed together.
+_REGION_MANAGERS = weakref.WeakSet()
+
+
 class RegionInvalidationManager(object):
 
     REGION_KEY_PREFIX = '<<<region>>>:'
@@ -35,18 +43,57 @@ class RegionInvalidationManager(object):
     def __init__(self, invalidation_region, region_name):
         self._invalidation_region = invalidation_region
         self._region_key = self.REGION_KEY_PREFIX + region_name
+        # A (region_id, fetched_at) tuple, see `cache_region_id_cache_time`.
+        self._local_region_id = None
+        _REGION_MANAGERS.add(self)
 
     def _generate_new_id(self):
         return os.urandom(10)
 
-    @property
-    def region_id(self):
+    def _fetch_region_id(self):
         return self._invalidation_region.get_or_create(
             self._region_key, self._generate_new_id, expiration_time=-1)
 
+    def _siblings(self):
+        return [m for m in list(_REGION_MANAGERS)
+                if m._invalidation_region is self._invalidation_region]
+
+    def _refresh_region_ids(self):
+        # Fetch the IDs of every region sharing our invalidation region in a
+        # single round trip; they are all used by the same requests and
+        # would otherwise go stale and be fetched one at a time.
+        managers = self._siblings()
+        keys = list(set(m._region_key for m in managers))
+        region_ids = dict(zip(keys, self._invalidation_region.get_multi(keys)))
+        now = time.time()
+        for manager in managers:
+            region_id = region_ids[manager._region_key]
+            if region_id is api.NO_VALUE:
+                region_id = region_ids[manager._region_key] = (
+                    manager._fetch_region_id())
+            manager._local_region_id = (region_id, now)
+
+    @property
+    def region_id(self):
+        cache_time = CONF.cache_region_id_cache_time
+        if not cache_time:
+            return self._fetch_region_id()
+
+        local_region_id = self._local_region_id
+        if (local_region_id is None or
+                time.time() - local_region_id[1] >= cache_time):
+            self._refresh_region_ids()
+            local_region_id = self._local_region_id
+        return local_region_id[0]
+
     def invalidate_region(self):
         new_region_id = self._generate_new_id()
         self._invalidation_region.set(self._region_key, new_region_id)
+        # Make the invalidation visible to this process right away.
+        now = time.time()
+        for manager in self._siblings():
+            if manager._region_key == self._region_key:
+                manager._local_region_id = (new_region_id, now)
         return new_region_id
 
     def is_region_key(self, key):
@@ -112,6 +159,7 @@ CACHE_REGION = create_region(name='shared default')
 CACHE_INVALIDATION_REGION = create_region(name='invalidation region')
 
 register_model_handler = _context_cache._register_model_handler
+get_request_cache_stats = _context_cache._get_request_cache_stats
 
 
 def configure_cache(region=None):
@@ -19,6 +19,7 @@ from oslo_log import log
 from oslo_log import versionutils
 from oslo_utils import strutils
 import six
+from six.moves.urllib import parse as urlparse
 
 from keystone.common import authorization
 from keystone.common import dependency
@@ -506,15 +507,32 @@ class V3Controller(wsgi.Application):
 
         if list_limited:
             container['truncated'] = True
+            # The rest of the collection can only be found from the last
+            # member if the list was truncated in the order of the IDs.
+            if refs and hints.limit.get('ordered', True):
+                container['links']['next'] = cls._next_page_url(
+                    context, refs[-1]['id'])
 
         return container
 
+    @classmethod
+    def _next_page_url(cls, context, marker):
+        """Return the URL of the page of a collection after the marker."""
+        query = [(k, v) for k, v in urlparse.parse_qsl(
+            context['environment'].get('QUERY_STRING', ''),
+            keep_blank_values=True) if k != 'marker']
+        query.append(('marker', marker))
+        return '%s?%s' % (cls.base_url(context, path=context['path']),
+                          urlparse.urlencode(query))
+
     @classmethod
     def limit(cls, refs, hints):
         """Limit a list of entities.
 
-        The underlying driver layer may have already truncated the collection
-        for us, but in case it was unable to handle truncation we check here.
+        The underlying driver layer may have already paged through and
+        truncated the collection for us, but in case it was unable to handle
+        the marker or truncation we check here. Pages list the entities in the
+        order of their IDs.
 
         :param refs: the list of members of the collection
         :param hints: hints, containing, among other things, the limit
@@ -527,7 +545,16 @@ class V3Controller(wsgi.Application):
         NOT_LIMITED = False
         LIMITED = True
 
-        if hints is None or hints.limit is None:
+        if hints is None:
+            return NOT_LIMITED, refs
+
+        if hints.marker is not None:
+            # The driver layer wasn't able to page through the list for us, so
+            # we must do it here
+            refs = sorted([ref for ref in refs if ref['id'] > hints.marker],
+                          key=lambda ref: ref['id'])
+
+        if hints.limit is None:
             # No truncation was requested
             return NOT_LIMITED, refs
 
@@ -538,6 +565,8 @@ class V3Controller(wsgi.Application):
         if len(refs) > hints.limit['limit']:
             # The driver layer wasn't able to truncate it for us, so we must
             # do it here
+            refs = sorted(refs, key=lambda ref: ref['id'])
+            hints.set_limit(hints.limit['limit'], truncated=True)
             return LIMITED, refs[:hints.limit['limit']]
 
         return NOT_LIMITED, refs
@@ -619,6 +648,14 @@ class V3Controller(wsgi.Application):
             return hints
 
         for key, value in request.params.items():
+            # Pull out the pagination directives
+            if key == 'marker':
+                hints.marker = value
+                continue
+            if key == 'limit':
+                hints.set_limit(cls._page_limit(value))
+                continue
+
             # Check if this is an exact filter
             if supported_filters is None or key in supported_filters:
                 hints.add_filter(key, value)
@@ -654,11 +691,19 @@ class V3Controller(wsgi.Application):
                                  comparator=comparator,
                                  case_sensitive=case_sensitive)
 
-        # NOTE(henry-nash): If we were to support pagination, we would pull any
-        # pagination directives out of the query_dict here, and add them into
-        # the hints list.
         return hints
 
+    @staticmethod
+    def _page_limit(value):
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            msg = _('Invalid limit value')
+            raise exception.ValidationError(message=msg)
+        return limit
+
     def _require_matching_id(self, value, ref):
         """Ensure the value matches the reference's ID, if any."""
         if 'id' in ref and ref['id'] != value:
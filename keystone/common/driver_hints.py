@@ -46,11 +46,18 @@ def truncated(f):
         hints.set_limit(list_limit + 1)
         ref_list = f(self, hints, *args, **kwargs)
 
+        if hints.marker is not None:
+            # The driver did not page through the entities, so the entities
+            # after the marker must be found by the caller before limiting.
+            hints.set_limit(list_limit)
+            return ref_list
+
         # If we got more than the original limit then trim back the list and
         # mark it truncated.  In both cases, make sure we set the limit back
         # to its original value.
         if len(ref_list) > list_limit:
-            hints.set_limit(list_limit, truncated=True)
+            hints.set_limit(list_limit, truncated=True,
+                            ordered=hints.limit.get('ordered', True))
             return ref_list[:list_limit]
         else:
             hints.set_limit(list_limit)
@@ -74,6 +81,14 @@ class Hints(object):
     accessed publicly. Also it contains a dict called limit, which will
     indicate the amount of data we want to limit our listing to.
 
+    A Hint object may also contain a marker, the ID of the last entity of the
+    previous page, in which case only the entities with a greater ID are to be
+    listed, in the order of their IDs. A driver which satisfies the marker must
+    also mark it as such by resetting it to None. A driver which truncates a
+    list in any other order than that of the IDs must say so by setting the
+    ``ordered`` entry of the limit to False, as the rest of such a list cannot
+    be found from a marker.
+
     If the filter is discovered to never match, then `cannot_match` can be set
     to indicate that there will not be any matches and the backend work can be
     short-circuited.
@@ -92,6 +107,7 @@ class Hints(object):
 
     def __init__(self):
         self.limit = None
+        self.marker = None
         self.filters = list()
         self.cannot_match = False
 
@@ -110,6 +126,12 @@ class Hints(object):
                     entry['comparator'] == 'equals'):
                 return entry
 
-    def set_limit(self, limit, truncated=False):
+    def set_limit(self, limit, truncated=False, ordered=True):
         """Set a limit to indicate the list should be truncated."""
-        self.limit = {'limit': limit, 'type': 'limit', 'truncated': truncated}
+        self.limit = {'limit': limit, 'type': 'limit', 'truncated': truncated,
+                      'ordered': ordered}
+
+    def set_list_limit(self, list_limit):
+        """Set the configured limit, unless a lower limit was requested."""
+        if self.limit is None or self.limit['limit'] > list_limit:
+            self.set_limit(list_limit)
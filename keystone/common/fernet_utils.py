@@ -10,8 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import hashlib
 import os
 import stat
+import threading
+import time
 
 from cryptography import fernet
 from oslo_log import log
@@ -24,6 +27,9 @@ LOG = log.getLogger(__name__)
 
 CONF = keystone.conf.CONF
 
+# The number of bytes of a key's digest used to identify the key in tokens.
+KEY_ID_LENGTH = 4
+
 
 class FernetUtils(object):
 
@@ -268,3 +274,147 @@ class FernetUtils(object):
 
         # return the encryption_keys, sorted by key number, descending
         return [keys[x] for x in sorted(keys.keys(), reverse=True)]
+
+
+def key_id(key):
+    """Return a short identifier of a Fernet key.
+
+    The identifier is a truncated digest of the key, so it does not disclose
+    anything about the key itself and it is the same on every node sharing the
+    key repository, regardless of the key's file name.
+
+    :type key: six.text_type
+    :rtype: six.binary_type
+
+    """
+    return hashlib.sha256(key.encode('utf-8')).digest()[:KEY_ID_LENGTH]
+
+
+class FernetKeyRing(object):
+    """An in-memory copy of the keys held in a Fernet key repository.
+
+    Reading a key repository means listing the directory and opening every key
+    file, which is far too expensive to repeat for every token that is issued
+    or validated. A key ring loads the repository once and only reloads it when
+    the repository directory changes, which is the case for every rotation and
+    for every atomic replacement of the repository as a whole. The directory is
+    inspected at most once every ``check_interval`` seconds.
+
+    The ``hits`` and ``reloads`` counters track how many times the keys were
+    served from memory and how many times they had to be read from disk.
+
+    """
+
+    def __init__(self, key_repository, max_active_keys, check_interval=0):
+        self.key_repository = key_repository
+        self.max_active_keys = max_active_keys
+        self.check_interval = check_interval
+        self.hits = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = None
+        self._keys = []
+        self._crypto = None
+        self._primary = None
+        self._fernets_by_key_id = {}
+
+    def _repository_signature(self):
+        """Return a value that changes whenever the repository changes."""
+        try:
+            stat_info = os.stat(self.key_repository)
+        except OSError:
+            return None
+        return (stat_info.st_ino, stat_info.st_mtime, stat_info.st_ctime)
+
+    def _refresh(self):
+        """Reload the keys if the repository changed since the last load.
+
+        :returns: True if the keys were reloaded from disk.
+
+        """
+        now = time.time()
+        if (self._signature is not None and
+                now - self._last_check < self.check_interval):
+            return False
+        self._last_check = now
+
+        signature = self._repository_signature()
+        if signature is not None and signature == self._signature:
+            return False
+
+        fernet_utils = FernetUtils(self.key_repository, self.max_active_keys)
+        keys = fernet_utils.load_keys()
+        fernets = [(key_id(key), fernet.Fernet(key)) for key in keys]
+        self._keys = keys
+        if fernets:
+            self._crypto = fernet.MultiFernet([f for _, f in fernets])
+            self._primary = fernets[0]
+        else:
+            self._crypto = None
+            self._primary = None
+        self._fernets_by_key_id = dict(fernets)
+        self.reloads += 1
+
+        # Directory timestamps may only have a granularity of one second, so a
+        # change landing in the same second as this load would go unnoticed.
+        # Don't trust a signature that recent; the repository will be read
+        # again until its timestamp has settled.
+        if signature is not None and now - signature[1] < 1:
+            signature = None
+        self._signature = signature
+        return True
+
+    def _get(self, attr):
+        with self._lock:
+            if not self._refresh():
+                self.hits += 1
+            return getattr(self, attr)
+
+    @property
+    def keys(self):
+        """Return the list of keys, primary key first.
+
+        :rtype: list of six.text_type
+
+        """
+        return list(self._get('_keys'))
+
+    @property
+    def crypto(self):
+        """Return a ``MultiFernet`` built from the keys, or None."""
+        return self._get('_crypto')
+
+    @property
+    def primary(self):
+        """Return a tuple of the primary key's ID and ``Fernet``, or None."""
+        return self._get('_primary')
+
+    @property
+    def fernets_by_key_id(self):
+        """Return a dictionary of ``Fernet`` instances keyed by key ID."""
+        return self._get('_fernets_by_key_id')
+
+
+_KEY_RINGS = {}
+_KEY_RINGS_LOCK = threading.Lock()
+
+
+def get_key_ring(key_repository, max_active_keys, check_interval=0):
+    """Return the process-wide key ring for a key repository.
+
+    :param key_repository: directory containing the keys
+    :param max_active_keys: the maximum number of keys in rotation
+    :param check_interval: minimum number of seconds between two checks of the
+                           key repository for changes
+    :rtype: :class:`FernetKeyRing`
+
+    """
+    ring_key = (key_repository, max_active_keys)
+    with _KEY_RINGS_LOCK:
+        key_ring = _KEY_RINGS.get(ring_key)
+        if key_ring is None:
+            key_ring = FernetKeyRing(key_repository, max_active_keys)
+            _KEY_RINGS[ring_key] = key_ring
+    key_ring.check_interval = check_interval
+    return key_ring
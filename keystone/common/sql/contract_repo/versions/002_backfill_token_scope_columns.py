@@ -0,0 +1,26 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib
+
+
+# The data migration is idempotent, so reuse it rather than duplicate it.
+_data_migration = importlib.import_module(
+    'keystone.common.sql.data_migration_repo.versions.'
+    '002_migrate_token_scope_columns')
+
+
+def upgrade(migrate_engine):
+    # Nodes still running the previous release kept issuing tokens without
+    # the scope columns between the migrate and contract phases. Every node
+    # is upgraded by now, so catch those rows up one last time.
+    _data_migration.upgrade(migrate_engine)
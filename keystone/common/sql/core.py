@@ -28,6 +28,7 @@ from oslo_log import log
 from oslo_serialization import jsonutils
 import six
 import sqlalchemy as sql
+from sqlalchemy.ext import baked
 from sqlalchemy.ext import declarative
 from sqlalchemy.orm.attributes import flag_modified, InstrumentedAttribute
 from sqlalchemy import types as sql_types
@@ -63,9 +64,63 @@ Text = sql.Text
 UniqueConstraint = sql.UniqueConstraint
 PrimaryKeyConstraint = sql.PrimaryKeyConstraint
 joinedload = sql.orm.joinedload
+bindparam = sql.bindparam
 # Suppress flake8's unused import warning for flag_modified:
 flag_modified = flag_modified
 
+# Queries which are built the same way on every call are baked: they are only
+# built, and compiled to SQL, the first time and then bound to the parameters
+# of each call.
+bakery = baked.bakery()
+
+
+# The largest number of values an IN clause of a baked query is padded for.
+# Longer lists would bind many more parameters than they need, up to past the
+# limit of some databases (999 for SQLite), so they are bound as they are and
+# the queries testing them are not baked.
+IN_SIZE_MAX = 256
+
+
+def in_size(values):
+    """Return the number of parameters of an IN clause for the values.
+
+    The number is rounded up to a power of two, so that a baked query testing
+    lists of any length only has a few variants. Lists of more than
+    ``IN_SIZE_MAX`` values are not padded, and the baked query testing them
+    should be spoiled.
+
+    """
+    if len(values) > IN_SIZE_MAX:
+        return len(values)
+    size = 1
+    while size < len(values):
+        size *= 2
+    return size
+
+
+def in_bindparams(column, name, size):
+    """Return an IN clause of a column over bound parameters.
+
+    :param column: the column to test
+    :param name: the prefix of the names of the parameters
+    :param size: the number of parameters, see :func:`in_size`
+
+    """
+    return column.in_([bindparam('%s_%d' % (name, i), type_=column.type)
+                       for i in range(size)])
+
+
+def in_params(name, values, size):
+    """Return the parameters binding values to an IN clause.
+
+    The last value is repeated to bind every parameter of the clause.
+
+    """
+    values = list(values)
+    values += values[-1:] * (size - len(values))
+    return dict(('%s_%d' % (name, i), value)
+                for i, value in enumerate(values))
+
 
 def initialize():
     """Initialize the module."""
@@ -358,40 +413,53 @@ def _filter(model, query, hints):
         return
 
 
-def _limit(query, hints):
-    """Apply a limit to a query.
+def _limit(model, query, hints):
+    """Apply the marker and limit of a page to a query.
 
-    :param query: query to apply filters to
-    :param hints: contains the list of filters and limit details.
+    Pages list the entities in the order of their IDs, starting after the
+    marker if there is one.
 
-    :returns: updated query
+    :param model: the table model in question
+    :param query: query to apply the marker and limit to
+    :param hints: contains the list of filters, marker and limit details.
+                  The marker is removed once it is satisfied.
+
+    :returns: updated query, or the list of entities of the page if a limit
+              is supplied
 
     """
-    # NOTE(henry-nash): If we were to implement pagination, then we
-    # we would expand this method to support pagination and limiting.
+    if hints.marker is not None or hints.limit:
+        query = query.order_by(model.id)
+
+    if hints.marker is not None:
+        query = query.filter(model.id > hints.marker)
+        hints.marker = None
 
     # If we satisfied all the filters, set an upper limit if supplied
     if hints.limit:
-        original_len = query.count()
-        limit_query = query.limit(hints.limit['limit'])
-        if limit_query.count() < original_len:
+        # Ask for one more entity than the limit, which tells whether the list
+        # is truncated without counting the rows of the whole query.
+        list_limit = hints.limit['limit']
+        refs = query.limit(list_limit + 1).all()
+        if len(refs) > list_limit:
             hints.limit['truncated'] = True
-            query = limit_query
+            refs = refs[:list_limit]
+        return refs
     return query
 
 
 def filter_limit_query(model, query, hints):
-    """Apply filtering and limit to a query.
+    """Apply filtering, pagination and limit to a query.
 
     :param model: table model
     :param query: query to apply filters to
-    :param hints: contains the list of filters and limit details.  This may
-                  be None, indicating that there are no filters or limits
-                  to be applied. If it's not None, then any filters
+    :param hints: contains the list of filters, marker and limit details.
+                  This may be None, indicating that there are no filters or
+                  limits to be applied. If it's not None, then any filters
                   satisfied here will be removed so that the caller will
                   know if any filters remain.
 
-    :returns: updated query
+    :returns: updated query, or the list of entities if a limit is applied
 
     """
     if hints is None:
@@ -412,7 +480,7 @@ def filter_limit_query(model, query, hints):
     # as well.
 
     if not hints.filters:
-        return _limit(query, hints)
+        return _limit(model, query, hints)
     else:
         return query
 
@@ -0,0 +1,50 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+
+from oslo_serialization import jsonutils
+import sqlalchemy as sql
+
+
+def _scope_of(extra):
+    tenant_id = consumer_id = None
+    tenant = extra.get('tenant')
+    if tenant:
+        tenant_id = tenant.get('id')
+    token_data = extra.get('token_data') or {}
+    oauth = token_data.get('token', {}).get('OS-OAUTH1')
+    if oauth:
+        consumer_id = oauth.get('consumer_id')
+    return tenant_id, consumer_id
+
+
+def upgrade(migrate_engine):
+    meta = sql.MetaData()
+    meta.bind = migrate_engine
+
+    token = sql.Table('token', meta, autoload=True)
+
+    # Only tokens that can still be used need their scope columns; expired
+    # rows are left for token_flush to remove.
+    query = sql.select([token.c.id, token.c.extra]).where(sql.and_(
+        token.c.valid == sql.true(),
+        token.c.expires > datetime.datetime.utcnow(),
+        token.c.tenant_id.is_(None),
+        token.c.consumer_id.is_(None)))
+    for row in query.execute().fetchall():
+        tenant_id, consumer_id = _scope_of(
+            jsonutils.loads(row['extra']) or {})
+        if tenant_id is None and consumer_id is None:
+            continue
+        token.update().where(token.c.id == row['id']).values(
+            tenant_id=tenant_id, consumer_id=consumer_id).execute()
@@ -48,6 +48,10 @@ WHITELISTED_PROPERTIES = [
     'compute_host', 'admin_port', 'public_port',
     'public_endpoint', 'admin_endpoint', ]
 
+# The whitelisted properties which depend on the user or project a URL is
+# formatted for, rather than on the configuration.
+DYNAMIC_URL_PROPERTIES = frozenset(['tenant_id', 'project_id', 'user_id'])
+
 
 # NOTE(stevermar): This UUID must stay the same, forever, across
 # all of keystone to preserve its value as a URN namespace, which is
@@ -644,6 +648,88 @@ def format_url(url, substitutions, silent_keyerror_failures=None):
     return result
 
 
+class _RecordingDict(dict):
+    """A dictionary which records the keys that have been looked up."""
+
+    def __init__(self, *args, **kwargs):
+        super(_RecordingDict, self).__init__(*args, **kwargs)
+        self.used_keys = set()
+
+    def __getitem__(self, name):
+        self.used_keys.add(name)
+        return super(_RecordingDict, self).__getitem__(name)
+
+
+class URLTemplate(object):
+    """A user-defined URL compiled once, to be formatted many times.
+
+    The substitutions that do not depend on the user or the project, such as
+    the configured ports, are resolved when the template is compiled. If the
+    URL refers to none of the user and project properties, it is formatted
+    once and for all; otherwise, formatting only substitutes those.
+
+    A malformed URL is logged once, when compiled, and raises
+    :class:`keystone.exception.MalformedEndpoint` whenever it is formatted.
+
+    :param string url: the URL to be compiled
+    :param dict substitutions: the dictionary used for substitution of the
+        properties which do not depend on the user or the project
+
+    """
+
+    def __init__(self, url, substitutions):
+        self.url = url
+        self._template = None
+        self._values = None
+        self._formatted = None
+        self._malformed = False
+
+        values = _RecordingDict(substitutions)
+        values.update((key, '') for key in DYNAMIC_URL_PROPERTIES)
+        try:
+            formatted = format_url(url, values)
+        except exception.MalformedEndpoint:
+            # The failure has already been logged by format_url().
+            self._malformed = True
+            return
+
+        dynamic_keys = values.used_keys.intersection(DYNAMIC_URL_PROPERTIES)
+        if not dynamic_keys:
+            self._formatted = formatted
+            return
+        self._template = url.replace('$(', '%(')
+        self._values = dict((key, substitutions[key])
+                            for key in values.used_keys - dynamic_keys)
+
+    def format(self, substitutions, silent_keyerror_failures=None):
+        """Format the URL with the user and project properties.
+
+        :param dict substitutions: the values of the user and project
+            properties (`user_id`, `project_id` and `tenant_id`)
+        :param list silent_keyerror_failures: keys for which we should be
+            silent if they are missing from the substitutions
+        :returns: a formatted URL, or None if a key for which we should be
+            silent is missing
+
+        """
+        if self._malformed:
+            raise exception.MalformedEndpoint(endpoint=self.url)
+        if self._formatted is not None:
+            return self._formatted
+
+        values = dict(self._values)
+        values.update(substitutions)
+        try:
+            return self._template % values
+        except KeyError as e:
+            if e.args and e.args[0] in (silent_keyerror_failures or []):
+                return None
+            msg = _LE("Malformed endpoint %(url)s - unknown key "
+                      "%(keyerror)s")
+            LOG.error(msg, {"url": self.url, "keyerror": e})
+            raise exception.MalformedEndpoint(endpoint=self.url)
+
+
 def check_endpoint_url(url):
     """Check substitution of url.
 
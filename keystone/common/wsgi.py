@@ -32,9 +32,11 @@ from oslo_utils import strutils
 import routes.middleware
 import six
 from six.moves import http_client
+from six.moves import range
 import webob.dec
 import webob.exc
 
+from keystone.common import cache
 from keystone.common import dependency
 from keystone.common import json_home
 from keystone.common import request as request_mod
@@ -57,6 +59,10 @@ PARAMS_ENV = 'openstack.params'
 JSON_ENCODE_CONTENT_TYPES = set(['application/json',
                                  'application/json-home'])
 
+# Collections of more members than this are rendered a chunk of members at a
+# time, rather than as a single JSON document.
+STREAMED_COLLECTION_SIZE = 1000
+
 
 def validate_token_bind(context, token_ref):
     bind_mode = CONF.token.enforce_token_bind
@@ -247,6 +253,11 @@ class Application(BaseApplication):
                                     context=req.context_dict,
                                     user_locale=best_match_language(req))
 
+        cache_stats = cache.get_request_cache_stats()
+        if cache_stats:
+            LOG.debug('Request cache: %(hits)d hits, %(misses)d misses',
+                      cache_stats)
+
         if result is None:
             return render_response(
                 status=(http_client.NO_CONTENT,
@@ -712,6 +723,7 @@ def render_response(body=None, status=None, headers=None, method=None):
         headers = list(headers)
     headers.append(('Vary', 'X-Auth-Token'))
 
+    app_iter = None
     if body is None:
         body = b''
         status = status or (http_client.NO_CONTENT,
@@ -724,7 +736,14 @@ def render_response(body=None, status=None, headers=None, method=None):
             content_type = None
 
         if content_type is None or content_type in JSON_ENCODE_CONTENT_TYPES:
-            body = jsonutils.dump_as_bytes(body, cls=utils.SmarterEncoder)
+            collection_name = None
+            if not method or method.upper() != 'HEAD':
+                collection_name = _get_streamed_collection_name(body)
+            if collection_name:
+                app_iter = _iter_json_collection(body, collection_name)
+                body = None
+            else:
+                body = jsonutils.dump_as_bytes(body, cls=utils.SmarterEncoder)
             if content_type is None:
                 headers.append(('Content-Type', 'application/json'))
         status = status or (http_client.OK,
@@ -760,9 +779,14 @@ def render_response(body=None, status=None, headers=None, method=None):
 
     headers = _convert_to_str(headers)
 
-    resp = webob.Response(body=body,
-                          status='%d %s' % status,
-                          headerlist=headers)
+    if app_iter is not None:
+        resp = webob.Response(app_iter=app_iter,
+                              status='%d %s' % status,
+                              headerlist=headers)
+    else:
+        resp = webob.Response(body=body,
+                              status='%d %s' % status,
+                              headerlist=headers)
 
     if method and method.upper() == 'HEAD':
         # NOTE(morganfainberg): HEAD requests should return the same status
@@ -781,6 +805,36 @@ def render_response(body=None, status=None, headers=None, method=None):
     return resp
 
 
+def _get_streamed_collection_name(body):
+    """Return the name of the collection to stream from a body, if any."""
+    if not isinstance(body, dict):
+        return None
+    names = [k for k, v in body.items() if isinstance(v, list)]
+    if (len(names) == 1 and
+            len(body[names[0]]) > STREAMED_COLLECTION_SIZE):
+        return names[0]
+
+
+def _iter_json_collection(body, collection_name):
+    """Encode a collection to JSON, a chunk of members at a time."""
+    attributes = dict((k, v) for k, v in body.items()
+                      if k != collection_name)
+    head = jsonutils.dumps(attributes, cls=utils.SmarterEncoder)[:-1]
+    if attributes:
+        head += ', '
+    yield (head + jsonutils.dumps(collection_name) + ': [').encode('utf-8')
+
+    members = body[collection_name]
+    for i in range(0, len(members), STREAMED_COLLECTION_SIZE):
+        chunk = ', '.join(
+            jsonutils.dumps(member, cls=utils.SmarterEncoder)
+            for member in members[i:i + STREAMED_COLLECTION_SIZE])
+        if i:
+            chunk = ', ' + chunk
+        yield chunk.encode('utf-8')
+    yield b']}'
+
+
 def render_exception(error, context=None, request=None, user_locale=None):
     """Form a WSGI response based on the current error."""
     error_message = error.args[0]
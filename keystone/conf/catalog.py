@@ -59,6 +59,18 @@ is typically no reason to set this, as it would be unusual for a deployment to
 have enough services or endpoints to exceed a reasonable limit.
 """))
 
+local_cache_size = cfg.IntOpt(
+    'local_cache_size',
+    default=1000,
+    min=0,
+    help=utils.fmt("""
+Maximum number of rendered V3 service catalogs each keystone process keeps in
+memory, one per user and project pair. They are discarded whenever services,
+endpoints, regions or project endpoint associations change. This has no effect
+unless global and catalog caching are both enabled. A value of 0 disables this
+in-memory cache.
+"""))
+
 
 GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
@@ -67,6 +79,7 @@ ALL_OPTS = [
     aching,
     cache_time,
     list_limit,
+    local_cache_size,
 ]
 
 
@@ -224,6 +224,21 @@ notification_opt_out=identity.user.create
 notification_opt_out=identity.authenticate.success
 """))
 
+cache_region_id_cache_time = cfg.IntOpt(
+    'cache_region_id_cache_time',
+    default=0,
+    min=0,
+    help=utils.fmt("""
+Every cached value is keyed with the current ID of its cache region, which
+lives in the distributed cache so that an invalidation in one keystone process
+is seen by all of them. By default, that ID is fetched from the cache backend
+for every cache lookup. Set this to a number of seconds to let each process
+reuse the region IDs it has already fetched for that long, refreshing all of
+them at once when they expire. Invalidations made by the same process are seen
+immediately, while invalidations made by other processes may go unnoticed for
+up to this many seconds. A value of 0 disables this local caching.
+"""))
+
 
 GROUP_NAME = 'DEFAULT'
 ALL_OPTS = [
@@ -244,6 +259,7 @@ ALL_OPTS = [
     default_publisher_id,
     notification_format,
     notification_opt_out,
+    cache_region_id_cache_time,
 ]
 
 
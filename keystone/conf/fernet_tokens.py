@@ -53,11 +53,38 @@ highest numerical index), and one secondary key (every other index). Increasing
 this value means that additional secondary keys will be kept in the rotation.
 """))
 
+key_repository_check_interval = cfg.IntOpt(
+    'key_repository_check_interval',
+    default=0,
+    min=0,
+    help=utils.fmt("""
+Keystone keeps the contents of the key repository in memory and only reads the
+key files again when the repository directory changes. This controls the
+minimum number of seconds between two checks of the repository for changes.
+The default value of 0 checks the repository (with a single `stat` call) every
+time a token is issued or validated. Higher values save that call at the cost
+of taking up to this many seconds to notice a key rotation.
+"""))
+
+key_id_hint = cfg.BoolOpt(
+    'key_id_hint',
+    default=False,
+    help=utils.fmt("""
+If set to true, new tokens are prefixed with a short, non-secret identifier of
+the key that encrypted them, so that validating a token only needs to try that
+one key instead of every active key in turn. Tokens grow by about seven
+characters. Tokens with and without the identifier are always accepted, so only
+enable this once every keystone node sharing the key repository has been
+upgraded.
+"""))
+
 
 GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
     key_repository,
     max_active_keys,
+    key_repository_check_interval,
+    key_id_hint,
 ]
 
 
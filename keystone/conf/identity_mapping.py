@@ -57,12 +57,42 @@ value to false is when configuring a fresh installation, although that is the
 recommended value.
 """))
 
+local_cache_size = cfg.IntOpt(
+    'local_cache_size',
+    default=10000,
+    min=0,
+    help=utils.fmt("""
+Maximum number of local to public ID mappings each keystone process keeps in
+memory when post-processing lists of users and groups. They are discarded
+whenever a mapping is deleted or mappings are purged. This has no effect unless
+global and identity caching are both enabled. A value of 0 disables this
+in-memory cache.
+"""))
+
+in_memory_index = cfg.BoolOpt(
+    'in_memory_index',
+    default=False,
+    help=utils.fmt("""
+If enabled, each keystone process loads every public ID mapping into memory the
+first time it needs one, and keeps it current as it creates, deletes and purges
+mappings. Public IDs of users and groups are then resolved to their local
+entities, and the public IDs of local entities are computed by the ID
+generator, without querying the database. This suits deployments whose
+mappings fit comfortably in memory. Mappings deleted or purged by another
+process, including `keystone-manage mapping_purge`, are only dropped from
+memory if caching is enabled in the `[cache]` section with a backend shared by
+all keystone processes; otherwise they remain in memory until this process is
+restarted.
+"""))
+
 
 GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
     driver,
     generator,
     backward_compatible_ids,
+    local_cache_size,
+    in_memory_index,
 ]
 
 
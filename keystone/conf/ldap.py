@@ -553,6 +553,30 @@ removed from the connection pool. This option has no effect unless `[ldap]
 use_auth_pool` is also enabled.
 """))
 
+entry_cache_size = cfg.IntOpt(
+    'entry_cache_size',
+    default=0,
+    min=0,
+    help=utils.fmt("""
+Maximum number of LDAP entries, looked up by ID or by name, which each keystone
+process keeps in memory, along with whether they are enabled when `[ldap]
+user_enabled_emulation` is used. Entries are shared by the objects using the
+same LDAP server, and are only discarded by the keystone process which modifies
+them. The other keystone processes may keep using the previous entries and
+enabled state until `[ldap] entry_cache_time` has passed, and so may every
+process after changes made to the directory by other means. A value of 0
+disables this in-memory cache.
+"""))
+
+entry_cache_time = cfg.IntOpt(
+    'entry_cache_time',
+    default=60,
+    min=1,
+    help=utils.fmt("""
+The number of seconds for which LDAP entries are kept in memory. This option
+has no effect unless `[ldap] entry_cache_size` is also set.
+"""))
+
 
 GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
@@ -615,6 +639,8 @@ ALL_OPTS = [
     use_auth_pool,
     auth_pool_size,
     auth_pool_connection_lifetime,
+    entry_cache_size,
+    entry_cache_time,
 ]
 
 
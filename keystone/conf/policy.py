@@ -31,11 +31,23 @@ list_limit = cfg.IntOpt(
 Maximum number of entities that will be returned in a policy collection.
 """))
 
+decision_cache_size = cfg.IntOpt(
+    'decision_cache_size',
+    default=0,
+    min=0,
+    help=utils.fmt("""
+Maximum number of policy decisions which each keystone process keeps in memory,
+so that repeating a policy check with the same credentials on the same target
+does not evaluate its rule again. Decisions are discarded when the policy files
+are reloaded. A value of 0 disables this in-memory cache.
+"""))
+
 
 GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
     driver,
     list_limit,
+    decision_cache_size,
 ]
 
 
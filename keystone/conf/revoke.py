@@ -51,6 +51,17 @@ Time to cache the revocation list and the revocation events (in seconds). This
 has no effect unless global and `[revoke] caching` are both enabled.
 """))
 
+event_fetch_overlap = cfg.IntOpt(
+    'event_fetch_overlap',
+    default=10,
+    min=0,
+    help=utils.fmt("""
+Keystone keeps the revocation events it has already seen in memory and only
+fetches the events recorded since. This is the number of seconds before the
+most recent event already seen to start that fetch from, which protects against
+missing events recorded by keystone nodes with slightly slower clocks or stored
+by databases that only keep timestamps to the second.
+"""))
 
 GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
@@ -58,6 +69,7 @@ ALL_OPTS = [
     expiration_buffer,
     caching,
     cache_time,
+    event_fetch_overlap,
 ]
 
 
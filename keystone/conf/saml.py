@@ -35,6 +35,19 @@ itself, you may need to install the appropriate package, use this option to
 specify an absolute path, or adjust keystone's PATH environment variable.
 """))
 
+signer = cfg.StrOpt(
+    'signer',
+    default='xmlsec1',
+    choices=['xmlsec1', 'python-xmlsec'],
+    help=utils.fmt("""
+The implementation used to sign SAML assertions. `xmlsec1` runs the binary set
+by `[saml] xmlsec1_binary` for every assertion. `python-xmlsec` signs
+assertions within the keystone process using the `xmlsec` Python bindings of
+the XML Security Library, and only loads `[saml] keyfile` and `[saml] certfile`
+again when they change. If the `xmlsec` module cannot be imported, keystone
+falls back to `xmlsec1`.
+"""))
+
 certfile = cfg.StrOpt(
     'certfile',
     default=constants._CERTFILE,
@@ -166,6 +179,7 @@ GROUP_NAME = __name__.split('.')[-1]
 ALL_OPTS = [
     assertion_expiration_time,
     xmlsec1_binary,
+    signer,
     certfile,
     keyfile,
     idp_entity_id,
@@ -30,11 +30,13 @@ from saml2 import sigver
 xmldsig = importutils.try_import("saml2.xmldsig")
 if not xmldsig:
     xmldsig = importutils.try_import("xmldsig")
+etree = importutils.try_import("lxml.etree")
+xmlsec = importutils.try_import("xmlsec")
 
 from keystone.common import utils
 import keystone.conf
 from keystone import exception
-from keystone.i18n import _, _LE
+from keystone.i18n import _, _LE, _LW
 
 
 LOG = log.getLogger(__name__)
@@ -382,19 +384,126 @@ class SAMLGenerator(object):
         return signature
 
 
+class _Xmlsec1Signer(object):
+    """Sign SAML assertions with the ``xmlsec1`` binary.
+
+    ``xmlsec1`` cannot read input data from stdin so the prepared assertion
+    needs to be stored in a temporary file. This file will be deleted
+    immediately after ``xmlsec1`` returns. The signed assertion is redirected
+    to a standard output and read using ``subprocess.PIPE`` redirection.
+
+    """
+
+    def __init__(self, keyfile, certfile):
+        # xmlsec1 --sign --privkey-pem privkey,cert --id-attr:ID <tag> <file>
+        certificates = '%(idp_private_key)s,%(idp_public_key)s' % {
+            'idp_public_key': certfile,
+            'idp_private_key': keyfile,
+        }
+        self.command_list = [
+            CONF.saml.xmlsec1_binary, '--sign', '--privkey-pem', certificates,
+            '--id-attr:ID', 'Assertion']
+
+    def sign(self, assertion_string):
+        file_path = None
+        try:
+            file_path = fileutils.write_to_tempfile(assertion_string)
+            command_list = self.command_list + [file_path]
+            return subprocess.check_output(command_list,  # nosec : The
+                                           # contents of the command list are
+                                           # coming from a trusted source
+                                           # because the executable and
+                                           # arguments all either come from
+                                           # the config file or are hardcoded.
+                                           # The command list is initialized
+                                           # in __init__ to a list and it's
+                                           # still a list at this point in the
+                                           # function. There is no opportunity
+                                           # for an attacker to attempt
+                                           # command injection via string
+                                           # parsing.
+                                           stderr=subprocess.STDOUT)
+        finally:
+            try:
+                if file_path:
+                    os.remove(file_path)
+            except OSError:  # nosec
+                # The file is already gone, good.
+                pass
+
+
+class _XmlsecSigner(object):
+    """Sign SAML assertions in process, with the ``xmlsec`` bindings.
+
+    The private key and certificate are loaded once, and the same signature
+    template as for ``xmlsec1`` is filled in.
+
+    """
+
+    def __init__(self, keyfile, certfile):
+        self.key = xmlsec.Key.from_file(keyfile, xmlsec.KeyFormat.PEM)
+        self.key.load_cert_from_file(certfile, xmlsec.KeyFormat.PEM)
+
+    def sign(self, assertion_string):
+        root = etree.fromstring(assertion_string)
+        xmlsec.tree.add_ids(root, ['ID'])
+        signature_node = xmlsec.tree.find_node(root,
+                                               xmlsec.constants.NodeSignature)
+        context = xmlsec.SignatureContext()
+        context.key = self.key
+        context.sign(signature_node)
+        return etree.tostring(root)
+
+
+# The signer in use, with the configuration and files it was created from.
+_signer = (None, None)
+
+
+def _get_signer():
+    """Return a signer for the configured implementation, key and certificate.
+
+    The signer is reused until the configuration or the files it loaded
+    change.
+
+    """
+    global _signer
+
+    in_process = CONF.saml.signer == 'python-xmlsec'
+    signature = [CONF.saml.signer, CONF.saml.xmlsec1_binary,
+                 CONF.saml.keyfile, CONF.saml.certfile]
+    if in_process:
+        for path in (CONF.saml.keyfile, CONF.saml.certfile):
+            try:
+                signature.append(os.stat(path).st_mtime)
+            except OSError:  # nosec
+                # Loading the file reports the error.
+                pass
+
+    signer, signer_signature = _signer
+    if signer is None or signer_signature != signature:
+        signer_class = _Xmlsec1Signer
+        if in_process:
+            if xmlsec and etree:
+                signer_class = _XmlsecSigner
+            else:
+                LOG.warning(_LW('The xmlsec module cannot be imported, '
+                                'signing SAML assertions with %s instead.'),
+                            CONF.saml.xmlsec1_binary)
+        signer = signer_class(CONF.saml.keyfile, CONF.saml.certfile)
+        _signer = (signer, signature)
+    return signer
+
+
 def _sign_assertion(assertion):
     """Sign a SAML assertion.
 
-    This method utilizes ``xmlsec1`` binary and signs SAML assertions in a
-    separate process. ``xmlsec1`` cannot read input data from stdin so the
-    prepared assertion needs to be serialized and stored in a temporary file.
-    This file will be deleted immediately after ``xmlsec1`` returns. The signed
-    assertion is redirected to a standard output and read using
-    ``subprocess.PIPE`` redirection. A ``saml.Assertion`` class is created from
-    the signed string again and returned.
+    The assertion is serialized and signed by the implementation set by the
+    ``[saml] signer`` option: either by the ``xmlsec1`` binary, in a separate
+    process, or in process. A ``saml.Assertion`` class is created from the
+    signed string again and returned.
 
     Parameters that are required in the CONF::
-    * xmlsec_binary
+    * xmlsec_binary, or the xmlsec module
     * private key file path
     * public key file path
     :returns: XML <Assertion> object
@@ -410,53 +519,22 @@ def _sign_assertion(assertion):
                 'contain a comma (`,`). Please fix your configuration.') %
                 option)
 
-    # xmlsec1 --sign --privkey-pem privkey,cert --id-attr:ID <tag> <file>
-    certificates = '%(idp_private_key)s,%(idp_public_key)s' % {
-        'idp_public_key': CONF.saml.certfile,
-        'idp_private_key': CONF.saml.keyfile,
-    }
-
-    command_list = [
-        CONF.saml.xmlsec1_binary, '--sign', '--privkey-pem', certificates,
-        '--id-attr:ID', 'Assertion']
-
-    file_path = None
     try:
+        signer = _get_signer()
         # NOTE(gyee): need to make the namespace prefixes explicit so
         # they won't get reassigned when we wrap the assertion into
         # SAML2 response
-        file_path = fileutils.write_to_tempfile(assertion.to_string(
+        signed = signer.sign(assertion.to_string(
             nspair={'saml': saml2.NAMESPACE,
                     'xmldsig': xmldsig.NAMESPACE}))
-        command_list.append(file_path)
-        stdout = subprocess.check_output(command_list,  # nosec : The contents
-                                         # of the command list are coming from
-                                         # a trusted source because the
-                                         # executable and arguments all either
-                                         # come from the config file or are
-                                         # hardcoded. The command list is
-                                         # initialized earlier in this function
-                                         # to a list and it's still a list at
-                                         # this point in the function. There is
-                                         # no opportunity for an attacker to
-                                         # attempt command injection via string
-                                         # parsing.
-                                         stderr=subprocess.STDOUT)
     except Exception as e:
         msg = _LE('Error when signing assertion, reason: %(reason)s%(output)s')
         LOG.error(msg,
                   {'reason': e,
                    'output': ' ' + e.output if hasattr(e, 'output') else ''})
         raise exception.SAMLSigningError(reason=e)
-    finally:
-        try:
-            if file_path:
-                os.remove(file_path)
-        except OSError:  # nosec
-            # The file is already gone, good.
-            pass
 
-    return saml2.create_class_from_xml_string(saml.Assertion, stdout)
+    return saml2.create_class_from_xml_string(saml.Assertion, signed)
 
 
 class MetadataGenerator(object):
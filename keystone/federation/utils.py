@@ -13,6 +13,8 @@
 """Utilities for Federation Extension."""
 
 import ast
+import copy
+import functools
 import re
 
 import jsonschema
@@ -324,10 +326,10 @@ def validate_groups_in_backend(group_ids, mapping_id, identity_api):
         mapping was not found in the backend.
 
     """
+    found_group_ids = set(group['id'] for group in
+                          identity_api.list_groups_by_id(group_ids))
     for group_id in group_ids:
-        try:
-            identity_api.get_group(group_id)
-        except exception.GroupNotFound:
+        if group_id not in found_group_ids:
             raise exception.MappedGroupNotFound(
                 group_id=group_id, mapping_id=mapping_id)
 
@@ -358,8 +360,6 @@ def validate_groups(group_ids, mapping_id, identity_api):
     validate_groups_in_backend(group_ids, mapping_id, identity_api)
 
 
-# TODO(marek-denis): Optimize this function, so the number of calls to the
-# backend are minimized.
 def transform_to_group_ids(group_names, mapping_id,
                            identity_api, resource_api):
     """Transform groups identified by name/domain to their ids.
@@ -400,30 +400,39 @@ def transform_to_group_ids(group_names, mapping_id,
         exist in the backend.
 
     """
+    domain_ids_by_name = {}
+
     def resolve_domain(domain):
         """Return domain id.
 
         Input is a dictionary with a domain identified either by a ``id`` or a
         ``name``. In the latter case system will attempt to fetch domain object
-        from the backend.
+        from the backend, once for each domain name.
 
         :returns: domain's id
         :rtype: str
 
         """
-        domain_id = (domain.get('id') or
-                     resource_api.get_domain_by_name(
-                     domain.get('name')).get('id'))
-        return domain_id
-
-    for group in group_names:
-        try:
-            group_dict = identity_api.get_group_by_name(
-                group['name'], resolve_domain(group['domain']))
-            yield group_dict['id']
-        except exception.GroupNotFound:
+        if domain.get('id'):
+            return domain['id']
+        domain_name = domain.get('name')
+        if domain_name not in domain_ids_by_name:
+            domain_ids_by_name[domain_name] = (
+                resource_api.get_domain_by_name(domain_name).get('id'))
+        return domain_ids_by_name[domain_name]
+
+    group_names = [(group['name'], resolve_domain(group['domain']))
+                   for group in group_names]
+    groups = identity_api.list_groups_by_name(group_names)
+    for group in groups:
+        yield group['id']
+
+    found_group_names = set((group['name'], group['domain_id'])
+                            for group in groups)
+    for group_name in group_names:
+        if group_name not in found_group_names:
             LOG.debug('Skip mapping group %s; has no entry in the backend',
-                      group['name'])
+                      group_name[0])
 
 
 def get_assertion_params_from_env(request):
@@ -440,8 +449,56 @@ def get_assertion_params_from_env(request):
         yield (k, v)
 
 
+def _compile_regex(pattern):
+    """Return a function searching strings for a regular expression."""
+    try:
+        return re.compile(pattern).search
+    except re.error:
+        # Report the invalid expression when the rule is evaluated, as if it
+        # was not compiled.
+        return functools.partial(re.search, pattern)
+
+
+class _Requirement(object):
+    """A remote requirement of a mapping rule, compiled for evaluation."""
+
+    __slots__ = ('type', 'regex', 'any_one_of', 'not_any_of', 'blacklist',
+                 'whitelist')
+
+    def __init__(self, requirement):
+        self.type = requirement['type']
+        self.regex = requirement.get('regex', False)
+        self.any_one_of = self._compile_values(
+            requirement.get(RuleProcessor._EvalType.ANY_ONE_OF))
+        self.not_any_of = self._compile_values(
+            requirement.get(RuleProcessor._EvalType.NOT_ANY_OF))
+        blacklist = requirement.get(RuleProcessor._EvalType.BLACKLIST)
+        self.blacklist = None if blacklist is None else frozenset(blacklist)
+        whitelist = requirement.get(RuleProcessor._EvalType.WHITELIST)
+        self.whitelist = None if whitelist is None else frozenset(whitelist)
+
+    def _compile_values(self, values):
+        if values is None:
+            return None
+        if self.regex:
+            return [_compile_regex(value) for value in values]
+        return frozenset(values)
+
+    def any_match(self, values, assertion_values):
+        """Return whether any assertion value matches any of the values."""
+        if self.regex:
+            return any(search(assertion_value) for search in values
+                       for assertion_value in assertion_values)
+        return not values.isdisjoint(assertion_values)
+
+
 class RuleProcessor(object):
-    """A class to process assertions and mapping rules."""
+    """A class to process assertions and mapping rules.
+
+    The rules are compiled once, so that a rule processor can be reused to
+    process any number of assertions.
+
+    """
 
     class _EvalType(object):
         """Mapping rule evaluation types."""
@@ -466,6 +523,23 @@ class RuleProcessor(object):
         self.mapping_id = mapping_id
         self.rules = rules
 
+        self._compiled_rules = []
+        # A rule can only apply to an assertion which has every attribute its
+        # requirements refer to, so the rules are indexed by those attributes.
+        self._rules_by_type = {}
+        self._unconditional_rules = []
+        for index, rule in enumerate(rules):
+            requirements = [_Requirement(requirement)
+                            for requirement in rule['remote']]
+            types = frozenset(requirement.type
+                              for requirement in requirements)
+            self._compiled_rules.append((requirements, types, rule['local']))
+            if not types:
+                self._unconditional_rules.append(index)
+            for requirement_type in types:
+                self._rules_by_type.setdefault(requirement_type,
+                                               []).append(index)
+
     def process(self, assertion_data):
         """Transform assertion to a dictionary.
 
@@ -529,8 +603,15 @@ class RuleProcessor(object):
         identity_values = []
 
         LOG.debug('rules: %s', self.rules)
-        for rule in self.rules:
-            direct_maps = self._verify_all_requirements(rule['remote'],
+        assertion_types = frozenset(assertion)
+        candidates = set(self._unconditional_rules)
+        for assertion_type in assertion_types:
+            candidates.update(self._rules_by_type.get(assertion_type, ()))
+        for index in sorted(candidates):
+            requirements, types, locals_ = self._compiled_rules[index]
+            if not types <= assertion_types:
+                continue
+            direct_maps = self._verify_all_requirements(requirements,
                                                         assertion)
 
             # If the compare comes back as None, then the rule did not apply
@@ -542,9 +623,10 @@ class RuleProcessor(object):
             # directly to the array of saved values. However, if there is
             # a direct mapping, then perform variable replacement.
             if not direct_maps:
-                identity_values += rule['local']
+                # The rules are reused, so they must not be modified.
+                identity_values += copy.deepcopy(locals_)
             else:
-                for local in rule['local']:
+                for local in locals_:
                     new_local = self._update_local_mapping(local, direct_maps)
                     identity_values.append(new_local)
 
@@ -731,10 +813,10 @@ class RuleProcessor(object):
         to blacklist or whitelist rules and finally return the values in
         order, to be directly mapped.
 
-        :param requirements: list of remote requirements from rules
-        :type requirements: list
+        :param requirements: compiled remote requirements of a rule
+        :type requirements: list of keystone.federation.utils._Requirement
 
-        Example requirements::
+        Example remote requirements::
 
             [
                 {
@@ -775,29 +857,21 @@ class RuleProcessor(object):
         direct_maps = DirectMaps()
 
         for requirement in requirements:
-            requirement_type = requirement['type']
-            direct_map_values = assertion.get(requirement_type)
-            regex = requirement.get('regex', False)
+            direct_map_values = assertion.get(requirement.type)
 
             if not direct_map_values:
                 return None
 
-            any_one_values = requirement.get(self._EvalType.ANY_ONE_OF)
-            if any_one_values is not None:
-                if self._evaluate_requirement(any_one_values,
-                                              direct_map_values,
-                                              self._EvalType.ANY_ONE_OF,
-                                              regex):
+            if requirement.any_one_of is not None:
+                if requirement.any_match(requirement.any_one_of,
+                                         direct_map_values):
                     continue
                 else:
                     return None
 
-            not_any_values = requirement.get(self._EvalType.NOT_ANY_OF)
-            if not_any_values is not None:
-                if self._evaluate_requirement(not_any_values,
-                                              direct_map_values,
-                                              self._EvalType.NOT_ANY_OF,
-                                              regex):
+            if requirement.not_any_of is not None:
+                if not requirement.any_match(requirement.not_any_of,
+                                             direct_map_values):
                     continue
                 else:
                     return None
@@ -805,17 +879,14 @@ class RuleProcessor(object):
             # If 'any_one_of' or 'not_any_of' are not found, then values are
             # within 'type'. Attempt to find that 'type' within the assertion,
             # and filter these values if 'whitelist' or 'blacklist' is set.
-            blacklisted_values = requirement.get(self._EvalType.BLACKLIST)
-            whitelisted_values = requirement.get(self._EvalType.WHITELIST)
-
             # If a blacklist or whitelist is used, we want to map to the
             # whole list instead of just its values separately.
-            if blacklisted_values is not None:
+            if requirement.blacklist is not None:
                 direct_map_values = [v for v in direct_map_values
-                                     if v not in blacklisted_values]
-            elif whitelisted_values is not None:
+                                     if v not in requirement.blacklist]
+            elif requirement.whitelist is not None:
                 direct_map_values = [v for v in direct_map_values
-                                     if v in whitelisted_values]
+                                     if v in requirement.whitelist]
 
             direct_maps.add(direct_map_values)
 
@@ -823,46 +894,6 @@ class RuleProcessor(object):
 
         return direct_maps
 
-    def _evaluate_values_by_regex(self, values, assertion_values):
-        for value in values:
-            for assertion_value in assertion_values:
-                if re.search(value, assertion_value):
-                    return True
-        return False
-
-    def _evaluate_requirement(self, values, assertion_values,
-                              eval_type, regex):
-        """Evaluate the incoming requirement and assertion.
-
-        If the requirement type does not exist in the assertion data, then
-        return False. If regex is specified, then compare the values and
-        assertion values. Otherwise, grab the intersection of the values
-        and use that to compare against the evaluation type.
-
-        :param values: list of allowed values, defined in the requirement
-        :type values: list
-        :param assertion_values: The values from the assertion to evaluate
-        :type assertion_values: list/string
-        :param eval_type: determine how to evaluate requirements
-        :type eval_type: string
-        :param regex: perform evaluation with regex
-        :type regex: boolean
-
-        :returns: boolean, whether requirement is valid or not.
-
-        """
-        if regex:
-            any_match = self._evaluate_values_by_regex(values,
-                                                       assertion_values)
-        else:
-            any_match = bool(set(values).intersection(set(assertion_values)))
-        if any_match and eval_type == self._EvalType.ANY_ONE_OF:
-            return True
-        if not any_match and eval_type == self._EvalType.NOT_ANY_OF:
-            return True
-
-        return False
-
 
 def assert_enabled_identity_provider(federation_api, idp_id):
     identity_provider = federation_api.get_idp(idp_id)
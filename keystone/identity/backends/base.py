@@ -420,6 +420,42 @@ class IdentityDriverV8(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def list_groups_by_id(self, group_ids):
+        """List the groups with any of the given IDs.
+
+        :param list group_ids: group IDs.
+
+        :returns: the groups which exist, in no particular order. See group
+                  schema in :class:`~.IdentityDriverV8`.
+        :rtype: list of dicts
+
+        """
+        refs = []
+        for group_id in group_ids:
+            try:
+                refs.append(self.get_group(group_id))
+            except exception.GroupNotFound:
+                pass
+        return refs
+
+    def list_groups_by_name(self, group_names):
+        """List the groups with any of the given names.
+
+        :param list group_names: tuples of a group name and domain ID.
+
+        :returns: the groups which exist, in no particular order. See group
+                  schema in :class:`~.IdentityDriverV8`.
+        :rtype: list of dicts
+
+        """
+        refs = []
+        for group_name, domain_id in group_names:
+            try:
+                refs.append(self.get_group_by_name(group_name, domain_id))
+            except exception.GroupNotFound:
+                pass
+        return refs
+
     @abc.abstractmethod
     def update_group(self, group_id, group):
         """Update an existing group.
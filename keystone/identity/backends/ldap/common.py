@@ -14,16 +14,20 @@
 
 import abc
 import codecs
+import collections
+import copy
 import functools
 import os.path
 import re
 import sys
-import weakref
+import threading
+import time
 
 import ldap.controls
 import ldap.filter
 import ldappool
 from oslo_log import log
+from oslo_utils import excutils
 from oslo_utils import reflection
 import six
 from six.moves import map, zip
@@ -781,7 +785,7 @@ class PooledLDAPHandler(LDAPHandler):
         connection is needed which originally provided the ``msgid``. So, this
         method wraps the existing connection and ``msgid`` in a new ``MsgId``
         instance. The connection associated with ``search_ext`` is released
-        once last hard reference to the ``MsgId`` instance is freed.
+        once ``result3()`` has collected the result.
 
         """
         conn_ctxt = self._get_pool_connection()
@@ -795,8 +799,7 @@ class PooledLDAPHandler(LDAPHandler):
             conn_ctxt.__exit__(*sys.exc_info())
             raise
         res = MsgId((conn, msgid))
-        weakref.ref(res, functools.partial(conn_ctxt.__exit__,
-                                           None, None, None))
+        res.conn_ctxt = conn_ctxt
         return res
 
     def result3(self, msgid, all=1, timeout=None,
@@ -811,13 +814,19 @@ class PooledLDAPHandler(LDAPHandler):
         Input msgid is expected to be instance of class MsgId which has LDAP
         session/connection used to execute search_ext and message idenfier.
 
-        The connection associated with search_ext is released once last hard
-        reference to MsgId object is freed. This will happen when function
-        which requested msgId and used it in result3 exits.
+        The connection associated with search_ext is released once the result
+        is returned, so that no other request is sent on it while the search
+        is in flight.
 
         """
         conn, msg_id = msgid
-        return conn.result3(msg_id, all, timeout)
+        try:
+            res = conn.result3(msg_id, all, timeout)
+        except Exception:
+            msgid.conn_ctxt.__exit__(*sys.exc_info())
+            raise
+        msgid.conn_ctxt.__exit__(None, None, None)
+        return res
 
     @use_conn_pool
     def modify_s(self, conn, dn, modlist):
@@ -967,6 +976,33 @@ class KeystoneLDAPHandler(LDAPHandler):
                                     serverctrls, clientctrls,
                                     timeout, sizelimit)
 
+    def search_async(self, base, scope,
+                     filterstr='(objectClass=*)', attrlist=None):
+        """Send a search without waiting for its result.
+
+        Several searches can be in flight at once this way, each on its own
+        connection when connections are pooled, and their results collected
+        together. The searches are not paged, so this suits searches which
+        return few entries.
+
+        :returns: a callable which waits for the result of the search and
+                  returns it as search_s() would.
+
+        """
+        if attrlist is not None:
+            attrlist = [attr for attr in attrlist if attr is not None]
+        LOG.debug('LDAP search_async: base=%s scope=%s filterstr=%s '
+                  'attrs=%s', base, scope, filterstr, attrlist)
+        base_utf8 = utf8_encode(base)
+        filterstr_utf8 = utf8_encode(filterstr)
+        if attrlist is None:
+            attrlist_utf8 = None
+        else:
+            attrlist_utf8 = list(map(utf8_encode, attrlist))
+        msgid = self.conn.search_ext(base_utf8, scope, filterstr_utf8,
+                                     attrlist_utf8)
+        return functools.partial(self.result3, msgid)
+
     def _paged_search_s(self, base, scope, filterstr, attrlist=None):
         res = []
         use_old_paging_api = False
@@ -1102,6 +1138,111 @@ def _get_connection(conn_url, use_pool=False, use_auth_pool=False):
         return PythonLDAPHandler()
 
 
+class EntryCache(object):
+    """A size and time bounded LRU cache of converted LDAP entries.
+
+    Each entry is tagged with the DNs and object IDs it was built from, so
+    that keystone's own writes can invalidate every entry derived from them.
+    The cache lives in the memory of a process, so the writes of the other
+    processes only show once the entries expire.
+
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._keys_by_tag = collections.defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return a copy of the cached value, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            # Move the entry to the end, as the most recently used.
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def set(self, key, value, tags):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = (time.time() + self.ttl,
+                                  copy.deepcopy(value), tags)
+            for tag in tags:
+                self._keys_by_tag[tag].add(key)
+
+    def invalidate(self, tags):
+        """Drop every entry tagged with any of the tags."""
+        with self._lock:
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self):
+        """Return the number of entries, hits, misses and evictions."""
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _remove(self, key):
+        expiry, value, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[tag]
+
+
+_ENTRY_CACHES = {}  # entry caches by LDAP URL
+
+
+def _get_entry_cache(url, size, ttl):
+    """Return the entry cache shared by the objects of an LDAP server.
+
+    :returns: an EntryCache, or None if `size` is 0.
+
+    """
+    if not size:
+        return None
+    try:
+        return _ENTRY_CACHES[url]
+    except KeyError:
+        return _ENTRY_CACHES.setdefault(url, EntryCache(size, ttl))
+
+
+def dn_cache_tag(dn):
+    """Return a normalized form of a DN, with which to tag cached entries."""
+    try:
+        rdns = ldap.dn.str2dn(utf8_encode(dn))
+    except ldap.DECODING_ERROR:
+        return prep_case_insensitive(dn)
+    return tuple(tuple((utf8_decode(attr).lower(),
+                        prep_case_insensitive(utf8_decode(value)))
+                       for attr, value, flags in rdn)
+                 for rdn in rdns)
+
+
 def filter_entity(entity_ref):
     """Filter out private items in an entity dict.
 
@@ -1214,6 +1355,37 @@ class BaseLdap(object):
 
         self.subtree_delete_enabled = conf.ldap.allow_subtree_delete
 
+        self.entry_cache = _get_entry_cache(self.LDAP_URL,
+                                            conf.ldap.entry_cache_size,
+                                            conf.ldap.entry_cache_time)
+
+    def _id_cache_tag(self, object_id):
+        return ('id', self.options_name, self.tree_dn,
+                prep_case_insensitive(six.text_type(object_id)))
+
+    def _cache_tags(self, dn, object_id):
+        return [dn_cache_tag(dn), self._id_cache_tag(object_id)]
+
+    def _get_cached(self, key):
+        if self.entry_cache is None:
+            return None
+        return self.entry_cache.get((self.options_name, self.tree_dn) + key)
+
+    def _set_cached(self, key, value, dn, object_id):
+        if self.entry_cache is not None:
+            self.entry_cache.set((self.options_name, self.tree_dn) + key,
+                                 value, self._cache_tags(dn, object_id))
+
+    def _invalidate_cached(self, dn=None, object_id=None):
+        if self.entry_cache is None:
+            return
+        tags = []
+        if dn is not None:
+            tags.append(dn_cache_tag(dn))
+        if object_id is not None:
+            tags.append(self._id_cache_tag(object_id))
+        self.entry_cache.invalidate(tags)
+
     def _not_found(self, object_id):
         if self.NotFound is None:
             return exception.NotFound(target=object_id)
@@ -1433,6 +1605,7 @@ class BaseLdap(object):
             attrs.append(('member', [self.dumb_member]))
         with self.get_connection() as conn:
             conn.add_s(self._id_to_dn(values['id']), attrs)
+        self._invalidate_cached(object_id=values['id'])
         return values
 
     def _ldap_get(self, object_id, ldap_filter=None):
@@ -1444,6 +1617,10 @@ class BaseLdap(object):
                         six.text_type(object_id)),
                     'filter': (ldap_filter or self.ldap_filter or ''),
                     'object_class': self.object_class})
+        cache_key = ('entry', query)
+        res = self._get_cached(cache_key)
+        if res is not None:
+            return res
         with self.get_connection() as conn:
             try:
                 attrs = list(set(([self.id_attr] +
@@ -1456,9 +1633,11 @@ class BaseLdap(object):
             except ldap.NO_SUCH_OBJECT:
                 return None
         try:
-            return res[0]
+            res = res[0]
         except IndexError:
             return None
+        self._set_cached(cache_key, res, res[0], object_id)
+        return res
 
     def _ldap_get_limited(self, base, scope, filterstr, attrlist, sizelimit):
         with self.get_connection() as conn:
@@ -1484,8 +1663,12 @@ class BaseLdap(object):
         attrs = list(set(([self.id_attr] +
                           list(self.attribute_mapping.values()) +
                           list(self.extra_attr_mapping.keys()))))
-        if hints.limit:
+        # NOTE: The marker of a page is a public ID, which cannot be searched
+        # for, so the entities after the marker are found by the caller.
+        if hints.limit and hints.marker is None:
             sizelimit = hints.limit['limit']
+            # The directory returns the entries in an order of its own.
+            hints.limit['ordered'] = False
             return self._ldap_get_limited(self.tree_dn,
                                           self.LDAP_SCOPE,
                                           query,
@@ -1526,11 +1709,18 @@ class BaseLdap(object):
         query = (u'(%s=%s)' % (self.attribute_mapping['name'],
                                ldap.filter.escape_filter_chars(
                                    six.text_type(name))))
+        cache_key = ('name', query)
+        ref = self._get_cached(cache_key)
+        if ref is not None:
+            return ref
         res = self.get_all(query)
         try:
-            return res[0]
+            ref = res[0]
         except IndexError:
             raise self._not_found(name)
+        if 'dn' in ref:
+            self._set_cached(cache_key, ref, ref['dn'], ref['id'])
+        return ref
 
     def get_all(self, ldap_filter=None, hints=None):
         hints = hints or driver_hints.Hints()
@@ -1587,6 +1777,8 @@ class BaseLdap(object):
                     conn.modify_s(self._id_to_dn(object_id), modlist)
                 except ldap.NO_SUCH_OBJECT:
                     raise self._not_found(object_id)
+                finally:
+                    self._invalidate_cached(object_id=object_id)
 
         return self.get(object_id)
 
@@ -1596,11 +1788,14 @@ class BaseLdap(object):
                 conn.delete_s(self._id_to_dn(object_id))
             except ldap.NO_SUCH_OBJECT:
                 raise self._not_found(object_id)
+            finally:
+                self._invalidate_cached(object_id=object_id)
 
     def delete_tree(self, object_id):
         tree_delete_control = ldap.controls.LDAPControl(CONTROL_TREEDELETE,
                                                         0,
                                                         None)
+        self._invalidate_cached(object_id=object_id)
         with self.get_connection() as conn:
             try:
                 conn.delete_ext_s(self._id_to_dn(object_id),
@@ -1656,6 +1851,8 @@ class BaseLdap(object):
                                          'group': member_list_dn})
             except ldap.NO_SUCH_OBJECT:
                 raise self._not_found(member_list_dn)
+            finally:
+                self._invalidate_cached(dn=member_list_dn)
 
     def remove_member(self, member_dn, member_list_dn):
         """Remove member from the member list.
@@ -1673,6 +1870,8 @@ class BaseLdap(object):
                 conn.modify_s(member_list_dn, [mod])
             except ldap.NO_SUCH_OBJECT:
                 raise self._not_found(member_list_dn)
+            finally:
+                self._invalidate_cached(dn=member_list_dn)
 
     def _delete_tree_nodes(self, search_base, scope, query_params=None):
         query = u'(objectClass=%s)' % self.object_class
@@ -1854,20 +2053,51 @@ class EnabledEmuMixIn(BaseLdap):
                            utf8_decode(naming_rdn[1]))
         self.enabled_emulation_naming_attr = naming_attr
 
-    def _get_enabled(self, object_id, conn):
+    def _get_enabled_query(self, object_id):
         dn = self._id_to_dn(object_id)
-        query = '(%s=%s)' % (self.member_attribute,
-                             ldap.filter.escape_filter_chars(dn))
-        try:
-            enabled_value = conn.search_s(self.enabled_emulation_dn,
-                                          ldap.SCOPE_BASE,
-                                          query, attrlist=DN_ONLY)
-        except ldap.NO_SUCH_OBJECT:
-            return False
-        else:
-            return bool(enabled_value)
+        return '(%s=%s)' % (self.member_attribute,
+                            ldap.filter.escape_filter_chars(dn))
+
+    def _cache_tags(self, dn, object_id):
+        tags = super(EnabledEmuMixIn, self)._cache_tags(dn, object_id)
+        if self.enabled_emulation:
+            # The entry may hold whether the object is enabled.
+            tags.append(dn_cache_tag(self.enabled_emulation_dn))
+        return tags
+
+    def _get_enabled(self, object_id, conn):
+        return self._get_enabled_async(object_id, conn)()
+
+    def _get_enabled_async(self, object_id, conn):
+        """Send the search for whether an object is enabled.
+
+        :returns: a callable which returns whether the object is enabled.
+
+        """
+        cache_key = ('enabled', six.text_type(object_id))
+        enabled = self._get_cached(cache_key)
+        if enabled is not None:
+            return lambda: enabled
+
+        get_result = conn.search_async(self.enabled_emulation_dn,
+                                       ldap.SCOPE_BASE,
+                                       self._get_enabled_query(object_id),
+                                       attrlist=DN_ONLY)
+
+        def get_enabled():
+            try:
+                enabled = bool(get_result())
+            except ldap.NO_SUCH_OBJECT:
+                enabled = False
+            self._set_cached(cache_key, enabled, self.enabled_emulation_dn,
+                             object_id)
+            return enabled
+
+        return get_enabled
 
     def _add_enabled(self, object_id):
+        # Check the directory itself, rather than a cached result.
+        self._invalidate_cached(dn=self.enabled_emulation_dn)
         with self.get_connection() as conn:
             if not self._get_enabled(object_id, conn):
                 modlist = [(ldap.MOD_ADD,
@@ -1883,6 +2113,8 @@ class EnabledEmuMixIn(BaseLdap):
                     if self.use_dumb_member:
                         attr_list[1][1].append(self.dumb_member)
                     conn.add_s(self.enabled_emulation_dn, attr_list)
+                finally:
+                    self._invalidate_cached(dn=self.enabled_emulation_dn)
 
     def _remove_enabled(self, object_id):
         modlist = [(ldap.MOD_DELETE,
@@ -1894,6 +2126,8 @@ class EnabledEmuMixIn(BaseLdap):
             except (ldap.NO_SUCH_OBJECT, ldap.NO_SUCH_ATTRIBUTE):  # nosec
                 # It's already gone, good.
                 pass
+            finally:
+                self._invalidate_cached(dn=self.enabled_emulation_dn)
 
     def create(self, values):
         if self.enabled_emulation:
@@ -1908,11 +2142,24 @@ class EnabledEmuMixIn(BaseLdap):
             return super(EnabledEmuMixIn, self).create(values)
 
     def get(self, object_id, ldap_filter=None):
+        if 'enabled' in self.attribute_ignore or not self.enabled_emulation:
+            return super(EnabledEmuMixIn, self).get(object_id, ldap_filter)
         with self.get_connection() as conn:
-            ref = super(EnabledEmuMixIn, self).get(object_id, ldap_filter)
-            if ('enabled' not in self.attribute_ignore and
-                    self.enabled_emulation):
-                ref['enabled'] = self._get_enabled(object_id, conn)
+            # The object is searched for while the search for whether it is
+            # enabled is in flight.
+            get_enabled = self._get_enabled_async(object_id, conn)
+            try:
+                ref = super(EnabledEmuMixIn, self).get(object_id, ldap_filter)
+            except Exception:
+                # Collect the search in flight whatever the error, so that its
+                # connection is released before the error is raised.
+                with excutils.save_and_reraise_exception():
+                    try:
+                        get_enabled()
+                    except Exception:  # nosec
+                        # The error of the lookup is the one to raise.
+                        pass
+            ref['enabled'] = get_enabled()
             return ref
 
     def get_all(self, ldap_filter=None, hints=None):
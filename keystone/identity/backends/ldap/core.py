@@ -18,8 +18,8 @@ import ldap.filter
 from oslo_log import log
 from oslo_log import versionutils
 import six
+from six.moves import range
 
-from keystone.common import driver_hints
 import keystone.conf
 from keystone import exception
 from keystone.i18n import _, _LW
@@ -31,6 +31,10 @@ from keystone.identity.backends.ldap import models
 CONF = keystone.conf.CONF
 LOG = log.getLogger(__name__)
 
+# The maximum number of IDs matched by a single search filter when fetching
+# many users at once, which keeps filters well within server limits.
+MAX_IDS_PER_SEARCH = 100
+
 _DEPRECATION_MSG = _('%s for the LDAP identity backend has been deprecated in '
                      'the Mitaka release in favor of read-only identity LDAP '
                      'access. It will be removed in the "O" release.')
@@ -195,16 +199,19 @@ class Identity(base.IdentityDriverV8):
         return self.group.get_all_filtered(hints)
 
     def list_users_in_group(self, group_id, hints):
-        users = []
+        user_keys = {}
         for user_key in self.group.list_group_users(group_id):
             if self.conf.ldap.group_members_are_ids:
                 user_id = user_key
             else:
                 user_id = self.user._dn_to_id(user_key)
+            user_keys.setdefault(user_id, user_key)
 
-            try:
-                users.append(self.user.get_filtered(user_id))
-            except exception.UserNotFound:
+        users = self.user.get_filtered_by_ids(list(user_keys))
+        found_ids = set(common_ldap.prep_case_insensitive(user['id'])
+                        for user in users)
+        for user_id, user_key in user_keys.items():
+            if common_ldap.prep_case_insensitive(user_id) not in found_ids:
                 LOG.debug(("Group member '%(user_key)s' not found in"
                            " '%(group_id)s'. The user should be removed"
                            " from the group. The user will be ignored."),
@@ -212,14 +219,15 @@ class Identity(base.IdentityDriverV8):
         return users
 
     def check_user_in_group(self, user_id, group_id):
-        user_refs = self.list_users_in_group(group_id, driver_hints.Hints())
-        for x in user_refs:
-            if x['id'] == user_id:
-                break
+        group_ref = self.group.get(group_id)
+        # Fetch the user to see if it even exists. This will raise a more
+        # accurate exception.
+        user_ref = self._get_user(user_id)
+        if self.conf.ldap.group_members_are_ids:
+            user_key = user_ref['id']
         else:
-            # Try to fetch the user to see if it even exists.  This
-            # will raise a more accurate exception.
-            self.get_user(user_id)
+            user_key = user_ref['dn']
+        if not self.group.has_member(user_key, group_ref['dn']):
             raise exception.NotFound(_("User '%(user_id)s' not found in"
                                        " group '%(group_id)s'") %
                                      {'user_id': user_id,
@@ -305,6 +313,25 @@ class UserApi(common_ldap.EnabledEmuMixIn, common_ldap.BaseLdap):
         return [self.filter_attributes(user)
                 for user in self.get_all(query, hints)]
 
+    def get_filtered_by_ids(self, user_ids):
+        """Return the users with the given IDs, ignoring those not found.
+
+        The users are fetched by searches matching up to
+        `MAX_IDS_PER_SEARCH` IDs each, rather than one search per user.
+
+        """
+        users = []
+        for i in range(0, len(user_ids), MAX_IDS_PER_SEARCH):
+            query = u'(|%s)%s' % (
+                ''.join(u'(%s=%s)' % (self.id_attr,
+                                      ldap.filter.escape_filter_chars(
+                                          six.text_type(user_id)))
+                        for user_id in user_ids[i:i + MAX_IDS_PER_SEARCH]),
+                self.ldap_filter or '')
+            users.extend(self.filter_attributes(user)
+                         for user in self.get_all(query))
+        return users
+
     def filter_attributes(self, user):
         return base.filter_user(common_ldap.filter_entity(user))
 
@@ -398,6 +425,23 @@ class GroupApi(common_ldap.BaseLdap):
                              user_dn_esc)
         return self.get_all_filtered(hints, query)
 
+    def has_member(self, member_key, group_dn):
+        """Return True if the member is listed in the group.
+
+        :param member_key: the DN of the member, or its ID if group members
+                           are IDs.
+        :param group_dn: the DN of the group.
+
+        """
+        query = '(%s=%s)' % (self.member_attribute,
+                             ldap.filter.escape_filter_chars(member_key))
+        with self.get_connection() as conn:
+            try:
+                return bool(conn.search_s(group_dn, ldap.SCOPE_BASE, query,
+                                          attrlist=common_ldap.DN_ONLY))
+            except ldap.NO_SUCH_OBJECT:
+                return False
+
     def list_group_users(self, group_id):
         """Return a list of user dns which are members of a group."""
         group_ref = self.get(group_id)
@@ -12,8 +12,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
 import datetime
 
+from six.moves import range
 import sqlalchemy
 
 from keystone.common import driver_hints
@@ -28,6 +30,10 @@ from keystone.identity.backends import sql_model as model
 
 CONF = keystone.conf.CONF
 
+# The maximum number of groups looked up by a single query, which keeps the
+# IN clauses within the limits of every supported database.
+MAX_GROUPS_PER_QUERY = 500
+
 
 class Identity(base.IdentityDriverV8):
     # NOTE(henry-nash): Override the __init__() method so as to take a
@@ -131,7 +137,8 @@ class Identity(base.IdentityDriverV8):
             return [base.filter_user(x.to_dict()) for x in user_refs]
 
     def _get_user(self, session, user_id):
-        user_ref = session.query(model.User).get(user_id)
+        query = sql.bakery(lambda session: session.query(model.User))
+        user_ref = query(session).get(user_id)
         if not user_ref:
             raise exception.UserNotFound(user_id=user_id)
         return user_ref
@@ -314,6 +321,36 @@ class Identity(base.IdentityDriverV8):
                 raise exception.GroupNotFound(group_id=group_name)
             return group_ref.to_dict()
 
+    def list_groups_by_id(self, group_ids):
+        group_ids = list(set(group_ids))
+        refs = []
+        with sql.session_for_read() as session:
+            for i in range(0, len(group_ids), MAX_GROUPS_PER_QUERY):
+                query = session.query(model.Group)
+                query = query.filter(model.Group.id.in_(
+                    group_ids[i:i + MAX_GROUPS_PER_QUERY]))
+                refs.extend(ref.to_dict() for ref in query)
+        return refs
+
+    def list_groups_by_name(self, group_names):
+        group_names = list(set(group_names))
+        refs = {}
+        with sql.session_for_read() as session:
+            for i in range(0, len(group_names), MAX_GROUPS_PER_QUERY):
+                names_by_domain = collections.defaultdict(set)
+                for group_name, domain_id in (
+                        group_names[i:i + MAX_GROUPS_PER_QUERY]):
+                    names_by_domain[domain_id].add(group_name)
+                query = session.query(model.Group)
+                query = query.filter(sqlalchemy.or_(*[
+                    sqlalchemy.and_(model.Group.domain_id == domain_id,
+                                    model.Group.name.in_(names))
+                    for domain_id, names in names_by_domain.items()]))
+                # Names may compare case insensitively, so a group can be
+                # found by the queries of different names.
+                refs.update((ref.id, ref.to_dict()) for ref in query)
+        return list(refs.values())
+
     @sql.handle_conflicts(conflict_type='group')
     def update_group(self, group_id, group):
         with sql.session_for_write() as session:
@@ -14,6 +14,7 @@
 
 """Main entry point into the Identity service."""
 
+import collections
 import functools
 import os
 import threading
@@ -38,6 +39,7 @@ from keystone.identity.mapping_backends import base as mapping_interface
 from keystone.identity.mapping_backends import mapping
 from keystone.identity.shadow_backends import base as shadow_interface
 from keystone import notifications
+from keystone.token import provider as token_provider
 
 
 CONF = keystone.conf.CONF
@@ -50,6 +52,12 @@ ID_MAPPING_REGION = cache.create_region(name='id mapping')
 MEMOIZE_ID_MAPPING = cache.get_memoization_decorator(group='identity',
                                                      region=ID_MAPPING_REGION)
 
+# The key, in the id mapping cache region, of the generation of the mappings
+# shared by every keystone process. Deleting or purging mappings removes it,
+# so a new generation is created on the next lookup, telling every process to
+# discard the mappings it keeps in memory.
+ID_MAPPING_GENERATION_KEY = 'id_mapping_generation'
+
 DOMAIN_CONF_FHEAD = 'keystone.'
 DOMAIN_CONF_FTAIL = '.conf'
 
@@ -572,8 +580,8 @@ class Manager(manager.Manager):
             return self._set_domain_id_and_mapping_for_single_ref(
                 ref, domain_id, driver, entity_type, conf)
         elif isinstance(ref, list):
-            return [self._set_domain_id_and_mapping(
-                    x, domain_id, driver, entity_type) for x in ref]
+            return self._set_domain_id_and_mapping_for_list(
+                ref, domain_id, driver, entity_type, conf)
         else:
             raise ValueError(_('Expected dict or list: %s') % type(ref))
 
@@ -609,6 +617,43 @@ class Manager(manager.Manager):
                           ref['id'])
         return ref
 
+    def _set_domain_id_and_mapping_for_list(self, ref_list, domain_id,
+                                            driver, entity_type, conf):
+        """Patch the domain_id/public_id into a list of entities.
+
+        The public IDs of all the entities are looked up at once, and the
+        mappings missing from them are then created at once.
+        """
+        ref_list = [ref.copy() for ref in ref_list]
+        for ref in ref_list:
+            self._insert_domain_id_if_needed(ref, driver, domain_id, conf)
+
+        if not self._is_mapping_needed(driver):
+            return ref_list
+
+        local_entities = [{'domain_id': ref['domain_id'],
+                           'local_id': ref['id'],
+                           'entity_type': entity_type}
+                          for ref in ref_list]
+        public_ids = self.id_mapping_api.get_public_ids(local_entities)
+
+        unmapped = [i for i, public_id in enumerate(public_ids)
+                    if not public_id]
+        if unmapped:
+            # Need to create mappings. If the driver generates UUIDs then
+            # pass the local UUIDs in as the public IDs to use.
+            created = self.id_mapping_api.create_id_mappings(
+                [local_entities[i] for i in unmapped],
+                [ref_list[i]['id'] if driver.generates_uuids() else None
+                 for i in unmapped])
+            for i, public_id in zip(unmapped, created):
+                public_ids[i] = public_id
+            LOG.debug('Created %d new mappings to public IDs', len(created))
+
+        for ref, public_id in zip(ref_list, public_ids):
+            ref['id'] = public_id
+        return ref_list
+
     def _insert_domain_id_if_needed(self, ref, driver, domain_id, conf):
         """Insert the domain ID into the ref, if required.
 
@@ -814,7 +859,7 @@ class Manager(manager.Manager):
 
         list_limit = driver._get_list_limit()
         if list_limit:
-            hints.set_limit(list_limit)
+            hints.set_list_limit(list_limit)
 
     # The actual driver calls - these are pre/post processed here as
     # part of the Manager layer to make sure we:
@@ -999,6 +1044,7 @@ class Manager(manager.Manager):
         # Invalidate user role assignments cache region, as it may be caching
         # role assignments where the actor is the specified user
         assignment.COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     @domains_configured
     @exception_translated('group')
@@ -1042,6 +1088,60 @@ class Manager(manager.Manager):
         return self._set_domain_id_and_mapping(
             ref, domain_id, driver, mapping.EntityType.GROUP)
 
+    def _list_groups_by_driver(self, entities_by_driver, list_groups):
+        """List groups with a single call to each driver.
+
+        :param entities_by_driver: the values identifying groups, keyed by
+                                   the driver and domain scope to use
+        :param list_groups: the name of the driver method listing groups
+        """
+        ref_list = []
+        for (driver, domain_id), entities in entities_by_driver.items():
+            refs = getattr(driver, list_groups)(entities)
+            ref_list.extend(self._set_domain_id_and_mapping(
+                refs, domain_id, driver, mapping.EntityType.GROUP))
+        return ref_list
+
+    @domains_configured
+    @exception_translated('group')
+    def list_groups_by_id(self, group_ids):
+        """List the groups with any of the given IDs.
+
+        Groups which don't exist are left out of the list.
+        """
+        entity_ids_by_driver = collections.OrderedDict()
+        for group_id in group_ids:
+            try:
+                domain_id, driver, entity_id = (
+                    self._get_domain_driver_and_entity_id(group_id))
+            except exception.PublicIDNotFound:
+                continue
+            scope = None if driver.is_domain_aware() else domain_id
+            entity_ids_by_driver.setdefault(
+                (driver, scope), []).append(entity_id)
+        return self._list_groups_by_driver(entity_ids_by_driver,
+                                           'list_groups_by_id')
+
+    @domains_configured
+    @exception_translated('group')
+    def list_groups_by_name(self, group_names):
+        """List the groups with any of the given names.
+
+        :param group_names: tuples of a group name and domain ID
+
+        Groups which don't exist are left out of the list.
+        """
+        names_by_driver = collections.OrderedDict()
+        for group_name, domain_id in group_names:
+            driver = self._select_identity_driver(domain_id)
+            # A driver which isn't domain aware needs to be told the domain of
+            # the groups it returns.
+            scope = None if driver.is_domain_aware() else domain_id
+            names_by_driver.setdefault((driver, scope), []).append(
+                (group_name, domain_id))
+        return self._list_groups_by_driver(names_by_driver,
+                                           'list_groups_by_name')
+
     @domains_configured
     @exception_translated('group')
     def update_group(self, group_id, group, initiator=None):
@@ -1080,6 +1180,7 @@ class Manager(manager.Manager):
         # Invalidate user role assignments cache region, as it may be caching
         # role assignments expanded from the specified group to its users
         assignment.COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
 
     @domains_configured
     @exception_translated('group')
@@ -1103,6 +1204,7 @@ class Manager(manager.Manager):
         # Invalidate user role assignments cache region, as it may now need to
         # include role assignments from the specified group to its users
         assignment.COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
         notifications.Audit.added_to(self._GROUP, group_id, self._USER,
                                      user_id, initiator)
 
@@ -1129,6 +1231,7 @@ class Manager(manager.Manager):
         # Invalidate user role assignments cache region, as it may be caching
         # role assignments expanded from this group to this user
         assignment.COMPUTED_ASSIGNMENTS_REGION.invalidate()
+        token_provider.TOKEN_DATA_REGION.invalidate()
         notifications.Audit.removed_from(self._GROUP, group_id, self._USER,
                                          user_id, initiator)
 
@@ -1292,6 +1395,7 @@ Driver = manager.create_legacy_driver(identity_interface.IdentityDriverV8)
 
 
 @dependency.provider('id_mapping_api')
+@dependency.requires('id_generator_api')
 class MappingManager(manager.Manager):
     """Default pivot point for the ID Mapping backend."""
 
@@ -1299,6 +1403,97 @@ class MappingManager(manager.Manager):
 
     def __init__(self):
         super(MappingManager, self).__init__(CONF.identity_mapping.driver)
+        self._local_public_ids = None
+        self._local_public_ids_generation = None
+        self._reverse_index = None
+        self._reverse_index_generation = None
+        self._reverse_index_lock = threading.Lock()
+
+    def _get_local_public_ids(self):
+        """Return the public IDs kept in memory for the current generation.
+
+        :returns: an ordered dict of public IDs keyed by domain ID, local ID
+                  and entity type, or None if they are not kept in memory.
+
+        """
+        if not (CONF.cache.enabled and CONF.identity.caching and
+                CONF.identity_mapping.local_cache_size):
+            return None
+        generation = ID_MAPPING_REGION.get_or_create(
+            ID_MAPPING_GENERATION_KEY, lambda: uuid.uuid4().hex)
+        if (self._local_public_ids is None or
+                self._local_public_ids_generation != generation):
+            self._local_public_ids = collections.OrderedDict()
+            self._local_public_ids_generation = generation
+        return self._local_public_ids
+
+    def _invalidate_local_public_ids(self):
+        self._local_public_ids = None
+        ID_MAPPING_REGION.delete(ID_MAPPING_GENERATION_KEY)
+
+    def _set_local_public_ids(self, local_public_ids, public_ids):
+        local_cache_size = CONF.identity_mapping.local_cache_size
+        for key, public_id in public_ids.items():
+            if public_id is None:
+                continue
+            while len(local_public_ids) >= local_cache_size:
+                local_public_ids.popitem(last=False)
+            local_public_ids[key] = public_id
+
+    def _get_reverse_index(self):
+        """Return the in-memory index of the mappings by public ID.
+
+        The index is loaded from the mapping table the first time it is
+        needed, and is then kept current by the mappings this process looks
+        up and creates. When caching is enabled, it is reloaded whenever any
+        process deletes or purges mappings, as they bump the generation of
+        the mappings kept in the cache.
+
+        :returns: a dict of (domain ID, local ID, entity type) tuples keyed by
+                  public ID, or None if `[identity_mapping] in_memory_index`
+                  is disabled.
+
+        """
+        if not CONF.identity_mapping.in_memory_index:
+            return None
+        generation = None
+        if CONF.cache.enabled:
+            generation = ID_MAPPING_REGION.get_or_create(
+                ID_MAPPING_GENERATION_KEY, lambda: uuid.uuid4().hex)
+        with self._reverse_index_lock:
+            if (self._reverse_index is None or
+                    self._reverse_index_generation != generation):
+                try:
+                    mappings = self.driver.list_id_mappings()
+                except exception.NotImplemented:
+                    # The index will only hold the mappings looked up from
+                    # now on.
+                    mappings = []
+                self._reverse_index = dict(
+                    (ref['public_id'], (ref['domain_id'], ref['local_id'],
+                                        ref['entity_type']))
+                    for ref in mappings)
+                self._reverse_index_generation = generation
+            return self._reverse_index
+
+    def _get_indexed_public_id(self, reverse_index, local_entity):
+        """Return the public ID of a local entity from the reverse index.
+
+        Since public IDs are either generated from the local entity or, for
+        drivers that generate UUIDs, the local ID itself, they are computed
+        rather than looked up, and confirmed against the index.
+
+        :returns: the public ID, or None if it is not in the index.
+
+        """
+        key = (local_entity['domain_id'], local_entity['local_id'],
+               local_entity['entity_type'])
+        for public_id in (
+                self.id_generator_api.generate_public_ID(local_entity),
+                local_entity['local_id']):
+            if reverse_index.get(public_id) == key:
+                return public_id
+        return None
 
     @MEMOIZE_ID_MAPPING
     def _get_public_id(self, domain_id, local_id, entity_type):
@@ -1307,14 +1502,88 @@ class MappingManager(manager.Manager):
                                           'entity_type': entity_type})
 
     def get_public_id(self, local_entity):
-        return self._get_public_id(local_entity['domain_id'],
-                                   local_entity['local_id'],
-                                   local_entity['entity_type'])
+        reverse_index = self._get_reverse_index()
+        if reverse_index is not None:
+            public_id = self._get_indexed_public_id(reverse_index,
+                                                    local_entity)
+            if public_id is not None:
+                return public_id
+
+        public_id = self._get_public_id(local_entity['domain_id'],
+                                        local_entity['local_id'],
+                                        local_entity['entity_type'])
+        if public_id is not None and reverse_index is not None:
+            reverse_index[public_id] = (local_entity['domain_id'],
+                                        local_entity['local_id'],
+                                        local_entity['entity_type'])
+        return public_id
 
     @MEMOIZE_ID_MAPPING
-    def get_id_mapping(self, public_id):
+    def _get_id_mapping(self, public_id):
         return self.driver.get_id_mapping(public_id)
 
+    def get_id_mapping(self, public_id):
+        reverse_index = self._get_reverse_index()
+        if reverse_index is not None and public_id in reverse_index:
+            domain_id, local_id, entity_type = reverse_index[public_id]
+            return {'public_id': public_id,
+                    'domain_id': domain_id,
+                    'local_id': local_id,
+                    'entity_type': entity_type}
+
+        local_entity = self._get_id_mapping(public_id)
+        if local_entity and reverse_index is not None:
+            reverse_index[public_id] = (local_entity['domain_id'],
+                                        local_entity['local_id'],
+                                        local_entity['entity_type'])
+        return local_entity
+
+    def get_public_ids(self, local_entities):
+        """Return the public IDs for many local entities at once.
+
+        The public IDs which are not kept in memory are fetched from the
+        driver in bulk.
+
+        :param list local_entities: dicts containing the entity domain, local
+                                    ID and type ('user' or 'group').
+        :returns: a list of public IDs, in the same order as the local
+                  entities, with None for those that have no mapping.
+
+        """
+        keys = [(local_entity['domain_id'], local_entity['local_id'],
+                 local_entity['entity_type'])
+                for local_entity in local_entities]
+        public_ids = {}
+        reverse_index = self._get_reverse_index()
+        if reverse_index is not None:
+            for key, local_entity in zip(keys, local_entities):
+                public_id = self._get_indexed_public_id(reverse_index,
+                                                        local_entity)
+                if public_id is not None:
+                    public_ids[key] = public_id
+        local_public_ids = self._get_local_public_ids()
+        if local_public_ids is not None:
+            public_ids.update((key, local_public_ids[key]) for key in keys
+                              if key in local_public_ids and
+                              key not in public_ids)
+
+        missing = [(key, local_entity)
+                   for key, local_entity in zip(keys, local_entities)
+                   if key not in public_ids]
+        if missing:
+            fetched = dict(zip(
+                (key for key, local_entity in missing),
+                self.driver.get_public_ids(
+                    [local_entity for key, local_entity in missing])))
+            if local_public_ids is not None:
+                self._set_local_public_ids(local_public_ids, fetched)
+            if reverse_index is not None:
+                reverse_index.update((public_id, key)
+                                     for key, public_id in fetched.items()
+                                     if public_id is not None)
+            public_ids.update(fetched)
+        return [public_ids[key] for key in keys]
+
     def create_id_mapping(self, local_entity, public_id=None):
         public_id = self.driver.create_id_mapping(local_entity, public_id)
         if MEMOIZE_ID_MAPPING.should_cache(public_id):
@@ -1322,25 +1591,65 @@ class MappingManager(manager.Manager):
                                     local_entity['domain_id'],
                                     local_entity['local_id'],
                                     local_entity['entity_type'])
-            self.get_id_mapping.set(local_entity, self, public_id)
+            self._get_id_mapping.set(local_entity, self, public_id)
+        reverse_index = self._get_reverse_index()
+        if reverse_index is not None:
+            reverse_index[public_id] = (local_entity['domain_id'],
+                                        local_entity['local_id'],
+                                        local_entity['entity_type'])
         return public_id
 
+    def create_id_mappings(self, local_entities, public_ids):
+        """Create mappings for many local entities at once.
+
+        :param list local_entities: dicts containing the entity domain, local
+                                    ID and type ('user' or 'group').
+        :param list public_ids: the public ID of each local entity, in the
+                                same order, or None for those whose public ID
+                                is to be generated.
+        :returns: a list of the public IDs, in the same order as the local
+                  entities.
+
+        """
+        public_ids = self.driver.create_id_mappings(local_entities,
+                                                    public_ids)
+        created = dict(
+            ((local_entity['domain_id'], local_entity['local_id'],
+              local_entity['entity_type']), public_id)
+            for local_entity, public_id in zip(local_entities, public_ids))
+        local_public_ids = self._get_local_public_ids()
+        if local_public_ids is not None:
+            self._set_local_public_ids(local_public_ids, created)
+        reverse_index = self._get_reverse_index()
+        if reverse_index is not None:
+            reverse_index.update((public_id, key)
+                                 for key, public_id in created.items())
+        return public_ids
+
     def delete_id_mapping(self, public_id):
-        local_entity = self.get_id_mapping.get(self, public_id)
+        local_entity = self._get_id_mapping.get(self, public_id)
         self.driver.delete_id_mapping(public_id)
         # Delete the key of entity from cache
         if local_entity:
             self._get_public_id.invalidate(self, local_entity['domain_id'],
                                            local_entity['local_id'],
                                            local_entity['entity_type'])
-        self.get_id_mapping.invalidate(self, public_id)
+        self._get_id_mapping.invalidate(self, public_id)
+        self._invalidate_local_public_ids()
+        if self._reverse_index is not None:
+            self._reverse_index.pop(public_id, None)
 
     def purge_mappings(self, purge_filter):
         # Purge mapping is rarely used and only used by the command client,
         # it's quite complex to invalidate part of the cache based on the purge
         # filters, so here invalidate the whole cache when purging mappings.
         self.driver.purge_mappings(purge_filter)
+        # The region is invalidated for every process sharing the cache, and
+        # the generation of the mappings is kept in it, so they also drop the
+        # mappings they keep in memory once they see the new region.
         ID_MAPPING_REGION.invalidate()
+        self._local_public_ids = None
+        self._reverse_index = None
 
 
 @versionutils.deprecated(
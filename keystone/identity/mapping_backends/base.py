@@ -34,6 +34,18 @@ class MappingDriverV8(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def get_public_ids(self, local_entities):
+        """Return the public IDs for many local entities at once.
+
+        :param list local_entities: dicts containing the entity domain, local
+                                    ID and type ('user' or 'group').
+        :returns: a list of public IDs, in the same order as the local
+                  entities, with None for those that have no mapping.
+
+        """
+        return [self.get_public_id(local_entity)
+                for local_entity in local_entities]
+
     @abc.abstractmethod
     def get_id_mapping(self, public_id):
         """Return the local mapping.
@@ -45,6 +57,17 @@ class MappingDriverV8(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def list_id_mappings(self):
+        """List every mapping.
+
+        :returns: a list of dicts containing the public ID, and the entity
+                  domain, local ID and type of each mapping.
+        :raises keystone.exception.NotImplemented: If the driver cannot list
+                                                   its mappings.
+
+        """
+        raise exception.NotImplemented()  # pragma: no cover
+
     @abc.abstractmethod
     def create_id_mapping(self, local_entity, public_id=None):
         """Create and store a mapping to a public_id.
@@ -58,6 +81,22 @@ class MappingDriverV8(object):
         """
         raise exception.NotImplemented()  # pragma: no cover
 
+    def create_id_mappings(self, local_entities, public_ids):
+        """Create and store mappings for many local entities at once.
+
+        :param list local_entities: dicts containing the entity domain, local
+                                    ID and type ('user' or 'group').
+        :param list public_ids: the public ID of each local entity, in the
+                                same order, or None for those whose public ID
+                                is to be generated.
+        :returns: a list of the public IDs, in the same order as the local
+                  entities.
+
+        """
+        return [self.create_id_mapping(local_entity, public_id)
+                for local_entity, public_id in zip(local_entities,
+                                                   public_ids)]
+
     @abc.abstractmethod
     def delete_id_mapping(self, public_id):
         """Delete an entry for the given public_id.
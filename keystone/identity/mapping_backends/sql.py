@@ -12,12 +12,21 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+
+from six.moves import range
+
 from keystone.common import dependency
 from keystone.common import sql
 from keystone.identity.mapping_backends import base
 from keystone.identity.mapping_backends import mapping as identity_mapping
 
 
+# The maximum number of local IDs looked up by a single query, which keeps the
+# IN clause within the limits of every supported database.
+MAX_LOCAL_IDS_PER_QUERY = 500
+
+
 class IDMapping(sql.ModelBase, sql.ModelDictMixin):
     __tablename__ = 'id_mapping'
     public_id = sql.Column(sql.String(64), primary_key=True)
@@ -57,12 +66,49 @@ class Mapping(base.MappingDriverV8):
             except sql.NotFound:
                 return None
 
+    def get_public_ids(self, local_entities):
+        local_ids_by_scope = collections.defaultdict(set)
+        for local_entity in local_entities:
+            scope = (local_entity['domain_id'], local_entity['entity_type'])
+            local_ids_by_scope[scope].add(local_entity['local_id'])
+
+        public_ids = {}
+        with sql.session_for_read() as session:
+            for (domain_id, entity_type), local_ids in (
+                    local_ids_by_scope.items()):
+                local_ids = list(local_ids)
+                for i in range(0, len(local_ids), MAX_LOCAL_IDS_PER_QUERY):
+                    query = session.query(IDMapping.local_id,
+                                          IDMapping.public_id)
+                    query = query.filter_by(domain_id=domain_id)
+                    query = query.filter_by(entity_type=entity_type)
+                    query = query.filter(IDMapping.local_id.in_(
+                        local_ids[i:i + MAX_LOCAL_IDS_PER_QUERY]))
+                    for local_id, public_id in query:
+                        public_ids[domain_id, local_id, entity_type] = (
+                            public_id)
+
+        return [public_ids.get((local_entity['domain_id'],
+                                local_entity['local_id'],
+                                local_entity['entity_type']))
+                for local_entity in local_entities]
+
     def get_id_mapping(self, public_id):
         with sql.session_for_read() as session:
             mapping_ref = session.query(IDMapping).get(public_id)
             if mapping_ref:
                 return mapping_ref.to_dict()
 
+    def list_id_mappings(self):
+        with sql.session_for_read() as session:
+            query = session.query(IDMapping.public_id, IDMapping.domain_id,
+                                  IDMapping.local_id, IDMapping.entity_type)
+            return [{'public_id': public_id,
+                     'domain_id': domain_id,
+                     'local_id': local_id,
+                     'entity_type': entity_type}
+                    for public_id, domain_id, local_id, entity_type in query]
+
     def create_id_mapping(self, local_entity, public_id=None):
         entity = local_entity.copy()
         try:
@@ -78,6 +124,27 @@ class Mapping(base.MappingDriverV8):
             public_id = self.get_public_id(local_entity)
         return public_id
 
+    def create_id_mappings(self, local_entities, public_ids):
+        entities = []
+        for local_entity, public_id in zip(local_entities, public_ids):
+            entity = local_entity.copy()
+            if public_id is None:
+                public_id = self.id_generator_api.generate_public_ID(entity)
+            entity['public_id'] = public_id
+            entities.append(entity)
+        if not entities:
+            return []
+
+        try:
+            with sql.session_for_write() as session:
+                session.execute(IDMapping.__table__.insert(), entities)
+        except sql.DBDuplicateEntry:
+            # something else created some of the mappings already. Create
+            # them one at a time, using those that exist.
+            return super(Mapping, self).create_id_mappings(local_entities,
+                                                           public_ids)
+        return [entity['public_id'] for entity in entities]
+
     def delete_id_mapping(self, public_id):
         with sql.session_for_write() as session:
             try:
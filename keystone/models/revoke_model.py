@@ -10,6 +10,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+import datetime
+import operator
+
 from oslo_log import log
 from oslo_serialization import msgpackutils
 from oslo_utils import timeutils
@@ -62,6 +66,71 @@ ALTERNATIVES = {
 
 REVOKE_KEYS = _NAMES + _EVENT_ARGS
 
+# Names of the event attributes compared against a token, in the order they
+# are compared. Each of them has a bit in the mask of the attributes an event
+# sets.
+_MATCH_NAMES = ['user_id',
+                'domain_id',
+                'domain_scope_id',
+                'project_id',
+                'expires_at',
+                'trust_id',
+                'consumer_id',
+                'access_token_id',
+                'audit_id',
+                'audit_chain_id',
+                'role_id']
+
+_MATCH_BITS = dict((name, 1 << i) for i, name in enumerate(_MATCH_NAMES))
+
+# The compact, serialized form of an event is a tuple of these attributes.
+# Timestamps are stored as integer microseconds since the epoch.
+_TUPLE_NAMES = ['trust_id',
+                'consumer_id',
+                'access_token_id',
+                'audit_id',
+                'audit_chain_id',
+                'domain_id',
+                'domain_scope_id',
+                'project_id',
+                'user_id',
+                'role_id',
+                '_expires_at',
+                '_issued_before',
+                '_revoked_at']
+
+_event_tuple = operator.attrgetter(*_TUPLE_NAMES)
+
+# Event attributes used to index revocation events, most selective first. An
+# event is indexed by the first of these attributes that it sets.
+_INDEX_NAMES = ['audit_id',
+                'audit_chain_id',
+                'access_token_id',
+                'trust_id',
+                'consumer_id',
+                'user_id',
+                'project_id',
+                'domain_scope_id',
+                'domain_id',
+                'role_id']
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _datetime_to_int(value):
+    """Convert a datetime to integer microseconds since the epoch."""
+    if value is None:
+        return None
+    delta = timeutils.normalize_time(value) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _int_to_datetime(value):
+    """Convert integer microseconds since the epoch to a datetime."""
+    if value is None:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=value)
+
 
 def blank_token_data(issued_at):
     token_data = dict()
@@ -75,10 +144,22 @@ def blank_token_data(issued_at):
 
 
 class RevokeEvent(object):
+    """A revocation event.
+
+    Events are held in memory by every keystone process in large numbers, so
+    they are kept compact: the timestamps are stored as integers, and the
+    ``mask`` of the attributes compared against tokens that the event sets is
+    computed once, so that matching only looks at those attributes.
+
+    """
+
+    __slots__ = _TUPLE_NAMES + ['mask']
+
     def __init__(self, **kwargs):
-        for k in REVOKE_KEYS:
-            v = kwargs.get(k)
-            setattr(self, k, v)
+        for k in _NAMES:
+            setattr(self, k, kwargs.get(k))
+        self.issued_before = kwargs.get('issued_before')
+        self.revoked_at = kwargs.get('revoked_at')
 
         if self.domain_id and self.expires_at:
             # This is revoking a domain-scoped token.
@@ -98,6 +179,52 @@ class RevokeEvent(object):
         if self.issued_before is None:
             self.issued_before = self.revoked_at
 
+        self._compute_mask()
+
+    def _compute_mask(self):
+        mask = 0
+        for name in _MATCH_NAMES:
+            if getattr(self, name) is not None:
+                mask |= _MATCH_BITS[name]
+        self.mask = mask
+
+    @property
+    def expires_at(self):
+        return _int_to_datetime(self._expires_at)
+
+    @expires_at.setter
+    def expires_at(self, value):
+        self._expires_at = _datetime_to_int(value)
+
+    @property
+    def issued_before(self):
+        return _int_to_datetime(self._issued_before)
+
+    @issued_before.setter
+    def issued_before(self, value):
+        self._issued_before = _datetime_to_int(value)
+
+    @property
+    def revoked_at(self):
+        return _int_to_datetime(self._revoked_at)
+
+    @revoked_at.setter
+    def revoked_at(self, value):
+        self._revoked_at = _datetime_to_int(value)
+
+    def to_tuple(self):
+        """Return the compact form of the event, see :meth:`from_tuple`."""
+        return _event_tuple(self)
+
+    @classmethod
+    def from_tuple(cls, values):
+        """Rebuild an event from its compact form."""
+        event = cls.__new__(cls)
+        for name, value in zip(_TUPLE_NAMES, values):
+            setattr(event, name, value)
+        event._compute_mask()
+        return event
+
     def to_dict(self):
         keys = ['user_id',
                 'role_id',
@@ -107,8 +234,8 @@ class RevokeEvent(object):
                 'audit_id',
                 'audit_chain_id',
                 ]
-        event = {key: self.__dict__[key] for key in keys
-                 if self.__dict__[key] is not None}
+        event = {key: getattr(self, key) for key in keys
+                 if getattr(self, key) is not None}
         if self.trust_id is not None:
             event['OS-TRUST:trust_id'] = self.trust_id
         if self.consumer_id is not None:
@@ -145,85 +272,206 @@ def is_revoked(events, token_data):
               match any revocation events, meaning the token is considered
               valid by the revocation API.
     """
-    return any([matches(e, token_data) for e in events])
+    match_values = _token_match_values(token_data)
+    return any(_matches(e, match_values) for e in events)
 
 
-def matches(event, token_values):
-    """See if the token matches the revocation event.
+class RevokeIndex(object):
+    """A collection of revocation events indexed by attribute value.
 
-    A brute force approach to checking.
-    Compare each attribute from the event with the corresponding
-    value from the token.  If the event does not have a value for
-    the attribute, a match is still possible.  If the event has a
-    value for the attribute, and it does not match the token, no match
-    is possible, so skip the remaining checks.
+    Each event is filed under the value of the most selective attribute it
+    sets, so checking a token only compares it against the events filed under
+    one of the token's own values, along with the few events that set none of
+    the indexed attributes. Events can be added as they are fetched; adding an
+    event that is already indexed has no effect. Events are kept in the order
+    they were added, so that the oldest events can be removed cheaply.
 
-    :param event: a RevokeEvent instance
-    :param token_values: dictionary with set of values taken from the
-                         token
-    :returns: True if the token matches the revocation event, indicating the
-              token has been revoked
     """
-    # If any one check does not match, the whole token does
-    # not match the event. The numerous return False indicate
-    # that the token is still valid and short-circuits the
-    # rest of the logic.
 
-    # The token has three attributes that can match the user_id.
-    if event.user_id is not None and event.user_id not in (
-            token_values['user_id'],
-            token_values['trustor_id'],
-            token_values['trustee_id'],):
-        return False
+    def __init__(self, events=None):
+        self._index = {}
+        self._unindexed = []
+        self._signatures = set()
+        self._events = collections.deque()
+        self.last_fetch = None
+        if events:
+            self.add_events(events)
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @staticmethod
+    def _signature(event):
+        return event.to_tuple()
+
+    @staticmethod
+    def _index_key(event):
+        """Return the attribute name and value the event is indexed by."""
+        for name in _INDEX_NAMES:
+            value = getattr(event, name)
+            if value is not None:
+                return name, value
+
+    def add_event(self, event):
+        """Add a revocation event to the index.
+
+        :param event: a RevokeEvent instance
+        :returns: False if the event was already indexed, True otherwise
+
+        """
+        signature = self._signature(event)
+        if signature in self._signatures:
+            return False
+        self._signatures.add(signature)
+        self._events.append(event)
+        index_key = self._index_key(event)
+        if index_key is None:
+            self._unindexed.append(event)
+        else:
+            self._index.setdefault(index_key, []).append(event)
+
+        if self.last_fetch is None or event.revoked_at > self.last_fetch:
+            self.last_fetch = event.revoked_at
+        return True
+
+    def remove_events_before(self, cutoff):
+        """Remove the oldest events, revoked before the cutoff time.
+
+        Removal stops at the first event revoked after the cutoff time, in the
+        order the events were added.
+
+        :param cutoff: a datetime
+        :returns: the number of events removed
+
+        """
+        count = 0
+        cutoff = _datetime_to_int(cutoff)
+        while self._events and self._events[0]._revoked_at < cutoff:
+            event = self._events.popleft()
+            self._signatures.discard(self._signature(event))
+            index_key = self._index_key(event)
+            if index_key is None:
+                self._unindexed.remove(event)
+            else:
+                bucket = self._index[index_key]
+                bucket.remove(event)
+                if not bucket:
+                    del self._index[index_key]
+            count += 1
+        return count
+
+    def add_events(self, events):
+        """Add revocation events to the index.
+
+        :param events: an iterable of RevokeEvent instances
+        :returns: the number of events that were not already indexed
+
+        """
+        return len([e for e in events if self.add_event(e)])
+
+    def _candidates(self, match_values):
+        """Yield the events that could possibly match the token."""
+        for event in self._unindexed:
+            yield event
+
+        for name in _INDEX_NAMES:
+            for value in match_values[name]:
+                for event in self._index.get((name, value), []):
+                    yield event
+
+    def is_revoked(self, token_values):
+        """Check if a token matches any of the indexed revocation events.
+
+        :param token_values: map based on a flattened view of the token, see
+                             :func:`is_revoked`
+        :returns: True if the token is revoked
+
+        """
+        match_values = _token_match_values(token_values)
+        return any(_matches(e, match_values)
+                   for e in self._candidates(match_values))
+
+
+def _token_match_values(token_values):
+    """Collect the token values each event attribute may match.
+
+    :param token_values: dictionary with set of values taken from the token
+    :returns: a dictionary of the values of the token that match each event
+              attribute, along with the token's ``issued_at`` timestamp
+    """
+    def _values(*names):
+        return frozenset(token_values.get(name) for name in names).difference(
+            [None])
+
+    match_values = {
+        'user_id': _values(*ALTERNATIVES['user_id']),
+        'domain_id': _values(*ALTERNATIVES['domain_id']),
+        'domain_scope_id': _values(*ALTERNATIVES['domain_scope_id']),
+        'project_id': _values('project_id'),
+        'trust_id': _values('trust_id'),
+        'consumer_id': _values('consumer_id'),
+        'access_token_id': _values('access_token_id'),
+        'audit_id': _values('audit_id'),
+        'audit_chain_id': _values('audit_chain_id'),
+        'role_id': frozenset(token_values.get('roles') or []),
+        'issued_at': _datetime_to_int(token_values['issued_at']),
+    }
+    # Only a datetime can ever equal an event's expires_at.
+    expires_at = token_values.get('expires_at')
+    match_values['_expires_at'] = frozenset(
+        [_datetime_to_int(expires_at)]
+        if isinstance(expires_at, datetime.datetime) else [])
+    return match_values
 
-    # The token has two attributes that can match the domain_id.
-    if event.domain_id is not None and event.domain_id not in(
-            token_values['identity_domain_id'],
-            token_values['assignment_domain_id'],):
-        return False
 
-    if event.domain_scope_id is not None and event.domain_scope_id not in (
-            token_values['assignment_domain_id'],):
-        return False
+# The attributes to compare for each mask value, built as masks are seen.
+_MASK_ATTRIBUTES = {}
 
-    # If an event specifies an attribute name, but it does not match, the token
-    # is not revoked.
-    if event.project_id is not None and event.project_id not in (
-            token_values['project_id'],):
-        return False
 
-    if event.expires_at is not None and event.expires_at not in (
-            token_values['expires_at'],):
-        return False
+def _mask_attributes(mask):
+    try:
+        return _MASK_ATTRIBUTES[mask]
+    except KeyError:
+        attributes = tuple(
+            '_expires_at' if name == 'expires_at' else name
+            for name in _MATCH_NAMES if mask & _MATCH_BITS[name])
+        _MASK_ATTRIBUTES[mask] = attributes
+        return attributes
 
-    if event.trust_id is not None and event.trust_id not in (
-            token_values['trust_id'],):
-        return False
 
-    if event.consumer_id is not None and event.consumer_id not in (
-            token_values['consumer_id'],):
-        return False
+def _matches(event, match_values):
+    """See if the token matches the revocation event.
 
-    if event.access_token_id is not None and event.access_token_id not in (
-            token_values['access_token_id'],):
-        return False
+    :param event: a RevokeEvent instance
+    :param match_values: the token values each event attribute may match, as
+                         returned by :func:`_token_match_values`
+    :returns: True if the token matches the revocation event
+    """
+    # Only the attributes set on the event need to be compared. If any one
+    # of them does not match, the token does not match the event.
+    for attribute in _mask_attributes(event.mask):
+        if getattr(event, attribute) not in match_values[attribute]:
+            return False
 
-    if event.audit_id is not None and event.audit_id not in (
-            token_values['audit_id'],):
-        return False
+    return match_values['issued_at'] <= event._issued_before
 
-    if event.audit_chain_id is not None and event.audit_chain_id not in (
-            token_values['audit_chain_id'],):
-        return False
 
-    if event.role_id is not None and event.role_id not in (
-            token_values['roles']):
-        return False
+def matches(event, token_values):
+    """See if the token matches the revocation event.
 
-    if token_values['issued_at'] > event.issued_before:
-        return False
+    Compare each attribute set on the event with the corresponding values
+    from the token. If the event does not have a value for the attribute, a
+    match is still possible. If the event has a value for the attribute, and
+    it does not match the token, no match is possible, so skip the remaining
+    checks.
 
-    return True
+    :param event: a RevokeEvent instance
+    :param token_values: dictionary with set of values taken from the
+                         token
+    :returns: True if the token matches the revocation event, indicating the
+              token has been revoked
+    """
+    return _matches(event, _token_match_values(token_values))
 
 
 def build_token_values_v2(access, default_domain_id):
@@ -355,12 +603,16 @@ class _RevokeEventHandler(object):
         self._registry = registry
 
     def serialize(self, obj):
-        return msgpackutils.dumps(obj.__dict__, registry=self._registry)
+        return msgpackutils.dumps(obj.to_tuple(), registry=self._registry)
 
     def deserialize(self, data):
         revoke_event_data = msgpackutils.loads(data, registry=self._registry)
         try:
-            revoke_event = RevokeEvent(**revoke_event_data)
+            if isinstance(revoke_event_data, dict):
+                # Events cached before the compact form was introduced.
+                revoke_event = RevokeEvent(**revoke_event_data)
+            else:
+                revoke_event = RevokeEvent.from_tuple(revoke_event_data)
         except Exception:
             LOG.debug("Failed to deserialize RevokeEvent. Data is %s",
                       revoke_event_data)
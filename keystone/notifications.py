@@ -76,6 +76,9 @@ CONF = keystone.conf.CONF
 INVALIDATE_USER_TOKEN_PERSISTENCE = 'invalidate_user_tokens'
 INVALIDATE_USER_PROJECT_TOKEN_PERSISTENCE = 'invalidate_user_project_tokens'
 INVALIDATE_USER_OAUTH_CONSUMER_TOKENS = 'invalidate_user_consumer_tokens'
+# Sent after each batch of projects whose tokens are invalidated when a domain
+# is disabled or deleted, to report the progress of the revocation.
+DOMAIN_TOKEN_PERSISTENCE_PROGRESS = 'domain_token_persistence_progress'
 
 
 class Audit(object):
@@ -15,20 +15,198 @@
 
 """Policy engine for keystone."""
 
+import ast
+import collections
+import re
+import threading
+
 from oslo_log import log
 from oslo_policy import policy as common_policy
+from oslo_serialization import jsonutils
 
 import keystone.conf
 from keystone import exception
 from keystone.policy.backends import base
 
 
+# NOTE: The role and generic check classes are not exported by
+# oslo_policy.policy, and are needed to tell which credentials and target
+# attributes a rule reads. Should a release of oslo.policy move them, no
+# decision is cached.
+try:
+    from oslo_policy import _checks
+except ImportError:  # pragma: no cover
+    _checks = None
+
+
 CONF = keystone.conf.CONF
 LOG = log.getLogger(__name__)
 
 
 _ENFORCER = None
 
+# Matches the target attributes interpolated into a check, as in
+# `project_id:%(target.project.id)s`.
+_TARGET_ATTRIBUTE_RE = re.compile(r'%\(([^)]+)\)')
+
+
+class DecisionCache(object):
+    """A size bounded LRU cache of policy decisions.
+
+    A decision is keyed by the action, and by the credentials and target
+    attributes that the rule of the action reads, so that it is shared by the
+    checks which differ only in attributes the rule ignores.
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._decisions = collections.OrderedDict()
+        self._references = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, rules, action, credentials, target):
+        """Return the key of a decision, or None if it cannot be cached."""
+        with self._lock:
+            generation = self.generation
+            references = self._references.get(action, False)
+        if references is False:
+            references = _get_rule_references(rules, action)
+            with self._lock:
+                if generation == self.generation:
+                    self._references[action] = references
+        if references is None:
+            return None
+        credential_fields, target_attributes = references
+        return (action,
+                jsonutils.dumps([(field in credentials, credentials.get(field))
+                                 for field in credential_fields]),
+                jsonutils.dumps(
+                    dict((attribute, '%s' % (target[attribute],))
+                         for attribute in target_attributes
+                         if attribute in target),
+                    sort_keys=True))
+
+    def get(self, key):
+        """Return the cached decision, or None if it is not cached."""
+        with self._lock:
+            result = self._decisions.pop(key, None)
+            if result is None:
+                self.misses += 1
+                return None
+            # Put the decision back at the end, as the most recently used.
+            self._decisions[key] = result
+            self.hits += 1
+            return result
+
+    def set(self, key, result, generation):
+        with self._lock:
+            # The rules were reloaded while the decision was made.
+            if generation != self.generation:
+                return
+            self._decisions.pop(key, None)
+            while len(self._decisions) >= self.size:
+                self._decisions.popitem(last=False)
+                self.evictions += 1
+            self._decisions[key] = result
+
+    def clear(self):
+        with self._lock:
+            if self._decisions:
+                LOG.debug('Discarding %(entries)d policy decisions, after '
+                          '%(hits)d hits and %(misses)d misses.',
+                          self._stats())
+            self._decisions.clear()
+            self._references.clear()
+            self.generation += 1
+
+    def stats(self):
+        """Return the number of decisions, hits, misses and evictions."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        return {'entries': len(self._decisions),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+def _get_rule_references(rules, action):
+    """Return the credential fields and target attributes a rule reads.
+
+    :returns: a tuple of the sorted credential fields and target attributes,
+              or None if the rule uses checks whose inputs are not known, such
+              as `http` checks.
+    """
+    credential_fields = set()
+    target_attributes = set()
+    seen_rules = set()
+
+    def walk(check):
+        if isinstance(check, (_checks.AndCheck, _checks.OrCheck)):
+            return all(walk(rule) for rule in check.rules)
+        if isinstance(check, _checks.NotCheck):
+            return walk(check.rule)
+        if isinstance(check, (_checks.TrueCheck, _checks.FalseCheck)):
+            return True
+        if isinstance(check, _checks.RuleCheck):
+            if check.match in seen_rules:
+                return True
+            seen_rules.add(check.match)
+            # NOTE: A reference to an unknown rule always fails.
+            return check.match not in rules or walk(rules[check.match])
+        if type(check) is _checks.RoleCheck:
+            credential_fields.add('roles')
+        elif type(check) is _checks.GenericCheck:
+            try:
+                ast.literal_eval(check.kind)
+            except ValueError:
+                credential_fields.add(check.kind.split('.')[0])
+        else:
+            return False
+        target_attributes.update(_TARGET_ATTRIBUTE_RE.findall(check.match))
+        return True
+
+    if _checks is None:
+        return None
+    try:
+        check = rules[action]
+    except KeyError:
+        # There is neither a rule for the action nor a default rule.
+        return None
+    try:
+        if not walk(check):
+            return None
+    except (AttributeError, TypeError):
+        # The check classes of oslo.policy are not the ones this knows.
+        LOG.debug('Decisions on %s are not cached, as the checks of its rule '
+                  'are not understood.', action)
+        return None
+    return sorted(credential_fields), sorted(target_attributes)
+
+
+class _Enforcer(common_policy.Enforcer):
+    """A policy enforcer which may keep the decisions it makes."""
+
+    def __init__(self, conf, decision_cache_size=0):
+        self.decisions = None
+        if decision_cache_size:
+            self.decisions = DecisionCache(decision_cache_size)
+        super(_Enforcer, self).__init__(conf)
+
+    def set_rules(self, rules, overwrite=True, use_conf=False):
+        # NOTE: This is called whenever the policy files are reloaded, which
+        # makes the decisions taken so far stale.
+        super(_Enforcer, self).set_rules(rules, overwrite=overwrite,
+                                         use_conf=use_conf)
+        if self.decisions is not None:
+            self.decisions.clear()
+
 
 def reset():
     global _ENFORCER
@@ -38,7 +216,19 @@ def reset():
 def init():
     global _ENFORCER
     if not _ENFORCER:
-        _ENFORCER = common_policy.Enforcer(CONF)
+        _ENFORCER = _Enforcer(CONF, CONF.policy.decision_cache_size)
+
+
+def decision_cache_stats():
+    """Return the statistics of the policy decision cache.
+
+    :returns: a dict of the number of decisions, hits, misses and evictions,
+              or None if the cache is disabled.
+    """
+    init()
+    if _ENFORCER.decisions is None:
+        return None
+    return _ENFORCER.decisions.stats()
 
 
 def enforce(credentials, action, target, do_raise=True):
@@ -60,6 +250,10 @@ def enforce(credentials, action, target, do_raise=True):
     """
     init()
 
+    if _ENFORCER.decisions is not None:
+        return _enforce_with_decision_cache(credentials, action, target,
+                                            do_raise)
+
     # Add the exception arguments if asked to do a raise
     extra = {}
     if do_raise:
@@ -69,6 +263,23 @@ def enforce(credentials, action, target, do_raise=True):
     return _ENFORCER.enforce(action, target, credentials, **extra)
 
 
+def _enforce_with_decision_cache(credentials, action, target, do_raise):
+    decisions = _ENFORCER.decisions
+    # Reload the policy files if they changed, which discards the decisions
+    # made with the previous rules.
+    _ENFORCER.load_rules()
+    generation = decisions.generation
+    key = decisions.make_key(_ENFORCER.rules, action, credentials, target)
+    result = None if key is None else decisions.get(key)
+    if result is None:
+        result = _ENFORCER.enforce(action, target, credentials)
+        if key is not None:
+            decisions.set(key, result, generation)
+    if do_raise and not result:
+        raise exception.ForbiddenAction(action=action)
+    return result
+
+
 class Policy(base.PolicyDriverV8):
     def enforce(self, credentials, action, target):
         LOG.debug('enforce %(action)s: %(credentials)s', {
@@ -10,7 +10,12 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+import functools
+
 from oslo_log import log
+import six
+import sqlalchemy
 
 from keystone.common import driver_hints
 from keystone.common import sql
@@ -21,6 +26,18 @@ from keystone.resource.backends import base
 
 LOG = log.getLogger(__name__)
 
+# The oldest version of each database which runs recursive common table
+# expressions, used to walk the projects hierarchy with a single query.
+RECURSIVE_CTE_VERSIONS = {
+    'mysql': (8, 0),
+    'postgresql': (8, 4),
+    'sqlite': (3, 8, 3),
+}
+
+# The sqlite3 module of Python 2 returns no rows for statements which start
+# with WITH, whatever the version of SQLite it is linked against.
+NO_RECURSIVE_CTE_DRIVERS = set(['pysqlite']) if six.PY2 else set()
+
 
 class Resource(base.ResourceDriverV9):
 
@@ -39,7 +56,8 @@ class Resource(base.ResourceDriverV9):
         return ref.id == base.NULL_DOMAIN_ID
 
     def _get_project(self, session, project_id):
-        project_ref = session.query(Project).get(project_id)
+        query = sql.bakery(lambda session: session.query(Project))
+        project_ref = query(session).get(project_id)
         if project_ref is None or self._is_hidden_ref(project_ref):
             raise exception.ProjectNotFound(project_id=project_id)
         return project_ref
@@ -124,9 +142,61 @@ class Resource(base.ResourceDriverV9):
         project_refs = query.all()
         return [project_ref.to_dict() for project_ref in project_refs]
 
+    def _supports_recursive_queries(self, session):
+        dialect = session.get_bind().dialect
+        min_version = RECURSIVE_CTE_VERSIONS.get(dialect.name)
+        if (min_version is None or dialect.server_version_info is None or
+                dialect.driver in NO_RECURSIVE_CTE_DRIVERS):
+            return False
+        return tuple(dialect.server_version_info[:len(min_version)]) >= (
+            min_version)
+
+    def _get_descendants(self, session, project_id):
+        """Return the projects below a project, with a single query."""
+        project = Project.__table__
+        # UNION discards the rows found again, so the query ends even if the
+        # hierarchy has a circular reference.
+        descendants = sqlalchemy.select([project.c.id]).where(
+            project.c.parent_id == project_id).cte(
+                'descendants', recursive=True)
+        descendants = descendants.union(
+            sqlalchemy.select([project.c.id]).where(
+                project.c.parent_id == descendants.c.id))
+        query = session.query(Project).join(
+            descendants, Project.id == descendants.c.id)
+        return [project_ref.to_dict() for project_ref in query]
+
+    def _get_ancestors(self, session, project_id):
+        """Return the projects above a project, with a single query."""
+        project = Project.__table__
+        ancestors = sqlalchemy.select([project.c.parent_id.label('id')]).where(
+            sqlalchemy.and_(project.c.id == project_id,
+                            project.c.parent_id.isnot(None))).cte(
+                'ancestors', recursive=True)
+        ancestors = ancestors.union(
+            sqlalchemy.select([project.c.parent_id]).where(
+                sqlalchemy.and_(project.c.id == ancestors.c.id,
+                                project.c.parent_id.isnot(None))))
+        query = session.query(Project).join(
+            ancestors, Project.id == ancestors.c.id)
+        return query.all()
+
     def list_projects_in_subtree(self, project_id):
         with sql.session_for_read() as session:
-            children = self._get_children(session, [project_id])
+            if self._supports_recursive_queries(session):
+                # Fetch the whole subtree at once, and then walk it one level
+                # at a time as below.
+                children_by_parent = collections.defaultdict(list)
+                for ref in self._get_descendants(session, project_id):
+                    children_by_parent[ref['parent_id']].append(ref)
+
+                def get_children(project_ids):
+                    return [ref for parent_id in project_ids
+                            for ref in children_by_parent[parent_id]]
+            else:
+                get_children = functools.partial(self._get_children, session)
+
+            children = get_children([project_id])
             subtree = []
             examined = set([project_id])
             while children:
@@ -142,12 +212,26 @@ class Resource(base.ResourceDriverV9):
 
                 examined.update(children_ids)
                 subtree += children
-                children = self._get_children(session, children_ids)
+                children = get_children(children_ids)
             return subtree
 
     def list_project_parents(self, project_id):
         with sql.session_for_read() as session:
             project = self._get_project(session, project_id).to_dict()
+            if self._supports_recursive_queries(session):
+                # Fetch all the parents at once, and then walk them up as
+                # below.
+                ancestors = dict((ref.id, ref) for ref in
+                                 self._get_ancestors(session, project_id))
+
+                def get_project(parent_id):
+                    ref = ancestors.get(parent_id)
+                    if ref is None or self._is_hidden_ref(ref):
+                        raise exception.ProjectNotFound(project_id=parent_id)
+                    return ref
+            else:
+                get_project = functools.partial(self._get_project, session)
+
             parents = []
             examined = set()
             while project.get('parent_id') is not None:
@@ -159,16 +243,16 @@ class Resource(base.ResourceDriverV9):
                     return
 
                 examined.add(project['id'])
-                parent_project = self._get_project(
-                    session, project['parent_id']).to_dict()
+                parent_project = get_project(project['parent_id']).to_dict()
                 parents.append(parent_project)
                 project = parent_project
             return parents
 
     def is_leaf_project(self, project_id):
         with sql.session_for_read() as session:
-            project_refs = self._get_children(session, [project_id])
-            return not project_refs
+            query = session.query(Project.id)
+            query = query.filter_by(parent_id=project_id)
+            return query.first() is None
 
     # CRUD
     @sql.handle_conflicts(conflict_type='project')
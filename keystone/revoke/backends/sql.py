@@ -82,13 +82,17 @@ class Revoke(base.RevokeDriverV8):
 
     def list_events(self, last_fetch=None):
         with sql.session_for_read() as session:
-            query = session.query(RevocationEvent).order_by(
-                RevocationEvent.revoked_at)
+            query = sql.bakery(lambda session: session.query(
+                RevocationEvent).order_by(RevocationEvent.revoked_at))
 
+            params = {}
             if last_fetch:
-                query = query.filter(RevocationEvent.revoked_at > last_fetch)
+                query += lambda q: q.filter(
+                    RevocationEvent.revoked_at > sql.bindparam('last_fetch'))
+                params['last_fetch'] = last_fetch
 
-            events = [revoke_model.RevokeEvent(**e.to_dict()) for e in query]
+            events = [revoke_model.RevokeEvent(**e.to_dict())
+                      for e in query(session).params(**params)]
 
             return events
 
@@ -12,6 +12,10 @@
 
 """Main entry point into the Revoke service."""
 
+import datetime
+import threading
+import uuid
+
 from oslo_log import versionutils
 
 from keystone.common import cache
@@ -55,6 +59,13 @@ MEMOIZE = cache.get_memoization_decorator(
     group='revoke',
     region=REVOKE_REGION)
 
+# The key, in the revoke cache region, of the state of the revocation events
+# shared by every keystone process: a tuple of a generation and a revision.
+# The revision changes whenever an event is recorded, telling every process to
+# fetch the events recorded since its last fetch. The generation changes when
+# the state is lost from the cache, telling every process to reload all events.
+REVOKE_STATE_KEY = 'revoke_state'
+
 
 @dependency.provider('revoke_api')
 class Manager(manager.Manager):
@@ -73,13 +84,30 @@ class Manager(manager.Manager):
         super(Manager, self).__init__(CONF.revoke.driver)
         self._register_listeners()
         self.model = revoke_model
+        self._revoke_index = revoke_model.RevokeIndex()
+        self._revoke_index_lock = threading.Lock()
+        self._revoke_state = None
 
     @MEMOIZE
-    def _list_events(self, last_fetch):
+    def _list_events(self, last_fetch, revoke_state):
         return self.driver.list_events(last_fetch)
 
     def list_events(self, last_fetch=None):
-        return self._list_events(last_fetch)
+        return self._list_events(last_fetch, self._get_revoke_state())
+
+    def _get_revoke_state(self):
+        """Return the shared state of the revocation events.
+
+        :returns: a tuple of the generation and the revision of the events, or
+                  None if revocation events are not cached.
+
+        """
+        if not (CONF.cache.enabled and CONF.revoke.caching):
+            return None
+        # The state may come back from the cache as a list.
+        return tuple(REVOKE_REGION.get_or_create(
+            REVOKE_STATE_KEY, lambda: (uuid.uuid4().hex, None),
+            expiration_time=-1))
 
     def _user_callback(self, service, resource_type, operation,
                        payload):
@@ -203,12 +231,51 @@ class Manager(manager.Manager):
         :raises keystone.exception.TokenNotFound: If the token is invalid.
 
         """
-        if revoke_model.is_revoked(self.list_events(), token_values):
+        if self._get_revoke_index().is_revoked(token_values):
             raise exception.TokenNotFound(_('Failed to validate token'))
 
+    def _get_revoke_index(self):
+        """Return the index of revocation events, brought up to date.
+
+        The index is only refreshed when the shared state of the revocation
+        events says it is out of date (or on every call, if revocation events
+        are not cached). A new generation reloads every event; otherwise, only
+        the events recorded since the last fetch are listed. That fetch starts
+        `[revoke] event_fetch_overlap` seconds early, so that events recorded
+        by a node with a slightly slow clock, or stored with a precision of
+        one second, are not missed; the index ignores the events it already
+        holds. Events that can no longer match a valid token are then dropped.
+
+        """
+        with self._revoke_index_lock:
+            # The state must be read before listing the events, so that any
+            # event recorded in the meantime triggers another fetch.
+            revoke_state = self._get_revoke_state()
+            if revoke_state is None or revoke_state != self._revoke_state:
+                if (revoke_state is not None and
+                        self._revoke_state is not None and
+                        revoke_state[0] != self._revoke_state[0]):
+                    self._revoke_index = revoke_model.RevokeIndex(
+                        self.driver.list_events())
+                else:
+                    last_fetch = self._revoke_index.last_fetch
+                    if last_fetch is not None:
+                        last_fetch -= datetime.timedelta(
+                            seconds=CONF.revoke.event_fetch_overlap)
+                    self._revoke_index.add_events(
+                        self.driver.list_events(last_fetch))
+                self._revoke_state = revoke_state
+
+            self._revoke_index.remove_events_before(
+                base.revoked_before_cutoff_time())
+            return self._revoke_index
+
     def revoke(self, event):
         self.driver.revoke(event)
-        REVOKE_REGION.invalidate()
+        revoke_state = self._get_revoke_state()
+        if revoke_state is not None:
+            REVOKE_REGION.set(REVOKE_STATE_KEY,
+                              (revoke_state[0], uuid.uuid4().hex))
 
 
 @versionutils.deprecated(
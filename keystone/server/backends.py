@@ -34,6 +34,7 @@ def load_backends():
     cache.configure_cache(region=assignment.COMPUTED_ASSIGNMENTS_REGION)
     cache.configure_cache(region=revoke.REVOKE_REGION)
     cache.configure_cache(region=token.provider.TOKENS_REGION)
+    cache.configure_cache(region=token.provider.TOKEN_DATA_REGION)
     cache.configure_cache(region=identity.ID_MAPPING_REGION)
     cache.configure_invalidation_region()
 
@@ -508,6 +508,35 @@ class AssignmentTests(AssignmentTestHelperMixin):
         # Ensure the user is only returned once
         self.assertEqual(1, len(user_ids))
 
+    def test_list_user_ids_for_domain(self):
+        domain = self._get_domain_fixture()
+        project = unit.new_project_ref(domain_id=domain['id'])
+        self.resource_api.create_project(project['id'], project)
+        # The last user has no role in the domain.
+        project_user, domain_user, group_user, spoiler = [
+            self.identity_api.create_user(unit.new_user_ref(
+                domain_id=CONF.identity.default_domain_id))
+            for i in range(4)]
+        group = self.identity_api.create_group(unit.new_group_ref(
+            domain_id=CONF.identity.default_domain_id))
+        self.identity_api.add_user_to_group(group_user['id'], group['id'])
+
+        self.assignment_api.create_grant(
+            self.role_member['id'], user_id=project_user['id'],
+            project_id=project['id'])
+        self.assignment_api.create_grant(
+            self.role_member['id'], user_id=domain_user['id'],
+            domain_id=domain['id'], inherited_to_projects=True)
+        self.assignment_api.create_grant(
+            self.role_member['id'], group_id=group['id'],
+            project_id=project['id'])
+
+        user_ids = self.assignment_api.list_user_ids_for_domain(
+            domain['id'], [project['id']])
+        self.assertEqual(
+            {project_user['id'], domain_user['id'], group_user['id']},
+            user_ids)
+
     def test_get_project_user_ids_returns_not_found(self):
         self.assertRaises(exception.ProjectNotFound,
                           self.assignment_api.list_user_ids_for_project,
@@ -98,3 +98,62 @@ class FormatUrlTests(unit.BaseTestCase):
                   'user_id': 'B'}
         self.assertIsNone(utils.format_url(url_template, values,
                           silent_keyerror_failures=['project_id']))
+
+
+class URLTemplateTests(unit.BaseTestCase):
+
+    def setUp(self):
+        super(URLTemplateTests, self).setUp()
+        self.substitutions = {'public_bind_host': 'server',
+                              'admin_port': 9090}
+
+    def test_successful_formatting(self):
+        template = utils.URLTemplate(
+            'http://$(public_bind_host)s:$(admin_port)d/'
+            '$(tenant_id)s/$(user_id)s/$(project_id)s', self.substitutions)
+        project_id = uuid.uuid4().hex
+        actual_url = template.format({'tenant_id': 'A', 'user_id': 'B',
+                                      'project_id': project_id})
+
+        expected_url = 'http://server:9090/A/B/%s' % (project_id,)
+        self.assertEqual(expected_url, actual_url)
+
+    def test_formatting_without_user_or_project(self):
+        template = utils.URLTemplate(
+            'http://$(public_bind_host)s:$(admin_port)d/v3',
+            self.substitutions)
+        # The substitutions are ignored, since the URL does not refer to them.
+        self.assertEqual('http://server:9090/v3', template.format({}))
+        self.assertEqual('http://server:9090/v3',
+                         template.format({'user_id': 'B'}))
+
+    def test_substitutions_are_resolved_when_compiled(self):
+        template = utils.URLTemplate(
+            'http://$(public_bind_host)s/$(project_id)s', self.substitutions)
+        self.substitutions['public_bind_host'] = 'other'
+        self.assertEqual('http://server/A',
+                         template.format({'project_id': 'A'}))
+
+    def test_raises_malformed_when_formatted(self):
+        def _test(url_template):
+            template = utils.URLTemplate(url_template, self.substitutions)
+            self.assertRaises(exception.MalformedEndpoint,
+                              template.format,
+                              {'tenant_id': 'A', 'user_id': 'B',
+                               'project_id': 'A'})
+
+        _test('http://$(public_bind_host)s/$(public_port)d')
+        _test('http://$(public_bind_host)s/$(admin_token)s')
+        _test('http://$(public_bind_host)d')
+        _test('http://$(public_bind_host)')
+        _test('http://$(public_bind_host)s/$(project_id)d')
+        _test(None)
+
+    def test_substitution_with_allowed_project_keyerror(self):
+        template = utils.URLTemplate(
+            'http://$(public_bind_host)s/$(project_id)s/$(user_id)s',
+            self.substitutions)
+        self.assertIsNone(template.format(
+            {'user_id': 'B'}, silent_keyerror_failures=['project_id']))
+        self.assertRaises(exception.MalformedEndpoint,
+                          template.format, {'user_id': 'B'})
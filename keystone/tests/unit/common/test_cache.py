@@ -10,11 +10,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
+import time
 import uuid
 
 from dogpile.cache import api as dogpile
 from dogpile.cache.backends import memory
+import mock
 from oslo_config import fixture as config_fixture
+from oslo_context import context as oslo_context
 
 from keystone.common import cache
 import keystone.conf
@@ -195,3 +199,140 @@ class TestCacheRegion(unit.BaseTestCase):
         # test invalidation
         cache.CACHE_INVALIDATION_REGION.delete(region_key)
         self.assertIsInstance(self.region0.get(key), dogpile.NoValue)
+
+
+class TestCachedRegionId(TestCacheRegion):
+    """Run the region tests again with the region IDs cached locally."""
+
+    def setUp(self):
+        super(TestCachedRegionId, self).setUp()
+        self.config_fixture.config(cache_region_id_cache_time=600)
+
+    def test_direct_region_key_invalidation(self):
+        region_key = cache.RegionInvalidationManager(
+            None, self.region0.name)._region_key
+        key = uuid.uuid4().hex
+        value = uuid.uuid4().hex
+        self.region0.set(key, value)
+
+        # another process invalidating the region is only noticed once the
+        # locally cached region ID expires
+        cache.CACHE_INVALIDATION_REGION.delete(region_key)
+        self.assertEqual(value, self.region0.get(key))
+
+        self.config_fixture.config(cache_region_id_cache_time=1)
+        with mock.patch.object(cache.core.time, 'time',
+                               return_value=time.time() + 2):
+            self.assertIsInstance(self.region0.get(key), dogpile.NoValue)
+
+    def test_region_id_is_not_fetched_for_every_key(self):
+        keys = [uuid.uuid4().hex for _ in range(4)]
+        self.region0.get(keys[0])
+
+        with mock.patch.object(cache.CACHE_INVALIDATION_REGION,
+                               'get_or_create') as get_or_create:
+            with mock.patch.object(cache.CACHE_INVALIDATION_REGION,
+                                   'get_multi') as get_multi:
+                for key in keys:
+                    self.region0.set(key, key)
+                    self.region1.get(key)
+        get_or_create.assert_not_called()
+        get_multi.assert_not_called()
+
+    def test_region_ids_are_refreshed_together(self):
+        other_region = cache.create_region(uuid.uuid4().hex)
+        cache.configure_cache(region=other_region)
+        other_region.backend = self.backend
+
+        self.config_fixture.config(cache_region_id_cache_time=1)
+        self.region0.get(uuid.uuid4().hex)
+        other_region.get(uuid.uuid4().hex)
+
+        get_multi = cache.CACHE_INVALIDATION_REGION.get_multi
+        with mock.patch.object(cache.CACHE_INVALIDATION_REGION, 'get_multi',
+                               side_effect=get_multi) as mocked_get_multi:
+            with mock.patch.object(cache.core.time, 'time',
+                                   return_value=time.time() + 2):
+                self.region0.get(uuid.uuid4().hex)
+                other_region.get(uuid.uuid4().hex)
+                self.region1.get(uuid.uuid4().hex)
+        self.assertEqual(1, mocked_get_multi.call_count)
+
+
+class TestRequestLocalCache(unit.BaseTestCase):
+
+    def setUp(self):
+        super(TestRequestLocalCache, self).setUp()
+        self.config_fixture = self.useFixture(config_fixture.Config(CONF))
+        self.config_fixture.config(group='cache',
+                                   backend='dogpile.cache.memory')
+        cache.CACHE_INVALIDATION_REGION.configure(
+            backend='dogpile.cache.memory',
+            expiration_time=None,
+            replace_existing_backend=True)
+
+        self.region = cache.create_region(uuid.uuid4().hex)
+        cache.configure_cache(region=self.region)
+        # replace the backend behind the request local cache proxy
+        self.cache_dict = {}
+        self.region.backend.proxied = memory.MemoryBackend(
+            {'cache_dict': self.cache_dict})
+        self.context = oslo_context.RequestContext()
+
+    def test_values_are_served_from_the_request(self):
+        key = uuid.uuid4().hex
+        value = {'id': uuid.uuid4().hex, 'roles': [uuid.uuid4().hex]}
+        self.region.set(key, value)
+
+        # the backend is not consulted again during the same request
+        self.cache_dict.clear()
+        self.assertEqual(value, self.region.get(key))
+        self.assertEqual(value, self.region.get_multi([key])[0])
+
+        # a new request only sees the backend
+        oslo_context.RequestContext()
+        self.assertIsInstance(self.region.get(key), dogpile.NoValue)
+
+    def test_callers_cannot_change_cached_values(self):
+        key = uuid.uuid4().hex
+        value = {'id': uuid.uuid4().hex, 'roles': [uuid.uuid4().hex]}
+        expected = copy.deepcopy(value)
+
+        self.region.set(key, value)
+        value['roles'].append(uuid.uuid4().hex)
+        self.assertEqual(expected, self.region.get(key))
+
+        self.region.get(key)['roles'].append(uuid.uuid4().hex)
+        self.assertEqual(expected, self.region.get(key))
+
+    def test_get_multi_caches_values_in_the_request(self):
+        mapping = {uuid.uuid4().hex: uuid.uuid4().hex for _ in range(4)}
+        keys = list(mapping.keys())
+        self.region.set_multi(mapping)
+        oslo_context.RequestContext()
+
+        self.assertEqual([mapping[k] for k in keys],
+                         self.region.get_multi(keys))
+        self.cache_dict.clear()
+        self.assertEqual([mapping[k] for k in keys],
+                         self.region.get_multi(keys))
+
+    def test_delete_removes_value_from_the_request(self):
+        key = uuid.uuid4().hex
+        self.region.set(key, uuid.uuid4().hex)
+        self.region.delete(key)
+        self.assertIsInstance(self.region.get(key), dogpile.NoValue)
+
+    def test_request_cache_stats(self):
+        self.assertIsNone(cache.get_request_cache_stats())
+
+        key = uuid.uuid4().hex
+        self.region.get(key)
+        # nothing is cached yet, so there is nothing to report
+        self.assertIsNone(cache.get_request_cache_stats())
+
+        self.region.set(key, uuid.uuid4().hex)
+        self.region.get(key)
+        self.region.get_multi([key, uuid.uuid4().hex])
+        self.assertEqual({'hits': 2, 'misses': 1},
+                         cache.get_request_cache_stats())
@@ -50,3 +50,26 @@ class TestModelDictMixin(unit.BaseTestCase):
         m = TestModel(id=expected['id'], text=expected['text'])
         m.extra = 'this should not be in the dictionary'
         self.assertEqual(expected, m.to_dict())
+
+
+class TestBakedInClause(unit.BaseTestCase):
+
+    def test_in_size_is_a_power_of_two(self):
+        self.assertEqual(1, sql.in_size(['a']))
+        self.assertEqual(2, sql.in_size(['a', 'b']))
+        self.assertEqual(4, sql.in_size(['a', 'b', 'c']))
+        self.assertEqual(8, sql.in_size(range(5)))
+
+    def test_in_size_does_not_pad_long_lists(self):
+        self.assertEqual(sql.IN_SIZE_MAX, sql.in_size(range(sql.IN_SIZE_MAX)))
+        self.assertEqual(sql.IN_SIZE_MAX + 1,
+                         sql.in_size(range(sql.IN_SIZE_MAX + 1)))
+
+    def test_in_params_repeat_the_last_value(self):
+        self.assertEqual({'id_0': 'a', 'id_1': 'b', 'id_2': 'c', 'id_3': 'c'},
+                         sql.in_params('id', ['a', 'b', 'c'], 4))
+
+    def test_in_bindparams(self):
+        clause = sql.in_bindparams(TestModel.id, 'id', 4)
+        self.assertEqual(
+            'testmodel.id IN (:id_0, :id_1, :id_2, :id_3)', str(clause))
@@ -10,8 +10,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
 import uuid
 
+import mock
 from oslo_config import fixture as config_fixture
 from oslo_serialization import jsonutils
 import webob
@@ -731,6 +733,40 @@ class MappingRuleEngineTests(unit.BaseTestCase):
         self.assertItemsEqual(['210mlk', '321cba'],
                               mapped_properties['group_ids'])
 
+    def test_rule_processor_is_reusable(self):
+        """Test a rule processor maps several assertions from its rules.
+
+        Processing assertions must neither change the rules nor let the
+        result of an assertion leak into the next one.
+
+        """
+        mapping = copy.deepcopy(mapping_fixtures.MAPPING_LARGE)
+        rp = mapping_utils.RuleProcessor(FAKE_MAPPING_ID, mapping['rules'])
+        assertions = [mapping_fixtures.ADMIN_ASSERTION,
+                      mapping_fixtures.CUSTOMER_ASSERTION,
+                      mapping_fixtures.TESTER_ASSERTION]
+
+        for assertion in assertions:
+            expected = mapping_utils.RuleProcessor(
+                FAKE_MAPPING_ID,
+                copy.deepcopy(mapping_fixtures.MAPPING_LARGE['rules'])
+            ).process(assertion)
+            self.assertEqual(expected, rp.process(assertion))
+            self.assertEqual(expected, rp.process(assertion))
+        self.assertEqual(mapping_fixtures.MAPPING_LARGE, mapping)
+
+    def test_rule_not_evaluated_without_its_types(self):
+        """Test a rule is skipped if the assertion lacks its remote types."""
+        mapping = mapping_fixtures.MAPPING_LARGE
+        rp = mapping_utils.RuleProcessor(FAKE_MAPPING_ID, mapping['rules'])
+        assertion = {'Email': 'tim@example.com'}
+        with mock.patch.object(rp, '_verify_all_requirements') as verify:
+            self.assertRaises(exception.ValidationError,
+                              rp.process,
+                              assertion)
+        # Every rule of the mapping also requires other attributes.
+        self.assertFalse(verify.called)
+
 
 class TestUnicodeAssertionData(unit.BaseTestCase):
     """Ensure that unicode data in the assertion headers works.
@@ -781,3 +817,32 @@ class TestUnicodeAssertionData(unit.BaseTestCase):
         full_name = '%s %s' % (fn, ln)
         user_name = values.get('user', {}).get('name')
         self.assertEqual(full_name, user_name)
+
+
+class TransformToGroupIdsTests(unit.BaseTestCase):
+
+    def test_groups_resolved_in_bulk(self):
+        domain_id = uuid.uuid4().hex
+        domain_name = uuid.uuid4().hex
+        group_names = [{'name': uuid.uuid4().hex,
+                        'domain': {'name': domain_name}}
+                       for _ in range(3)]
+        group_names.append({'name': uuid.uuid4().hex,
+                            'domain': {'id': domain_id}})
+        group_ids = [uuid.uuid4().hex for _ in group_names]
+
+        identity_api = mock.Mock()
+        identity_api.list_groups_by_name.return_value = [
+            {'id': group_id, 'name': group['name'], 'domain_id': domain_id}
+            for group_id, group in zip(group_ids, group_names)
+        ][1:]
+        resource_api = mock.Mock()
+        resource_api.get_domain_by_name.return_value = {'id': domain_id}
+
+        self.assertItemsEqual(
+            group_ids[1:],
+            mapping_utils.transform_to_group_ids(
+                group_names, FAKE_MAPPING_ID, identity_api, resource_api))
+        identity_api.list_groups_by_name.assert_called_once_with(
+            [(group['name'], domain_id) for group in group_names])
+        resource_api.get_domain_by_name.assert_called_once_with(domain_name)
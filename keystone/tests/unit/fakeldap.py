@@ -554,7 +554,7 @@ class FakeLdap(common.LDAPHandler):
             raise exception.NotImplemented()
 
         # only passing a single server control is supported by this fake ldap
-        if len(serverctrls) > 1:
+        if serverctrls is not None and len(serverctrls) > 1:
             raise exception.NotImplemented()
 
         # search_ext is async and returns an identifier used for
@@ -562,6 +562,8 @@ class FakeLdap(common.LDAPHandler):
         # storing the request in a variable with random integer key and
         # performing the real lookup in result3()
         msgid = random.randint(0, 1000)
+        while msgid in PendingRequests:
+            msgid = random.randint(0, 1000)
         PendingRequests[msgid] = (base, scope, filterstr, attrlist, attrsonly,
                                   serverctrls)
         return msgid
@@ -577,17 +579,15 @@ class FakeLdap(common.LDAPHandler):
         if all != 1 or timeout is not None or resp_ctrl_classes is not None:
             raise exception.NotImplemented()
 
-        params = PendingRequests[msgid]
+        params = PendingRequests.pop(msgid)
         # search_s accepts a subset of parameters of search_ext,
         # that's why we use only the first 5.
         results = self.search_s(*params[:5])
 
         # extract limit from serverctrl
         serverctrls = params[5]
-        ctrl = serverctrls[0]
-
-        if ctrl.size:
-            rdata = results[:ctrl.size]
+        if serverctrls and serverctrls[0].size:
+            rdata = results[:serverctrls[0].size]
         else:
             rdata = results
 
@@ -334,6 +334,28 @@ class IdentityDriverV8Tests(object):
             exception.GroupNotFound, self.driver.get_group_by_name,
             group_name=uuid.uuid4().hex, domain_id=uuid.uuid4().hex)
 
+    def test_list_groups_by_id(self):
+        group1 = self.create_group()
+        group2 = self.create_group()
+        self.create_group()
+
+        groups = self.driver.list_groups_by_id(
+            [group1['id'], uuid.uuid4().hex, group2['id']])
+        self.assertItemsEqual([group1['id'], group2['id']],
+                              [group['id'] for group in groups])
+
+    def test_list_groups_by_name(self):
+        domain_id = uuid.uuid4().hex
+        group1 = self.create_group(domain_id=domain_id)
+        group2 = self.create_group(domain_id=domain_id)
+        self.create_group(domain_id=domain_id)
+
+        groups = self.driver.list_groups_by_name(
+            [(group1['name'], domain_id), (uuid.uuid4().hex, domain_id),
+             (group2['name'], domain_id)])
+        self.assertItemsEqual([group1['id'], group2['id']],
+                              [group['id'] for group in groups])
+
     def test_update_group(self):
         group = self.create_group()
 
@@ -22,6 +22,7 @@ from testtools import matchers
 
 from keystone.common import driver_hints
 import keystone.conf
+from keystone import exception
 from keystone.identity.backends.ldap import common as common_ldap
 from keystone.tests import unit
 from keystone.tests.unit import default_fixtures
@@ -569,3 +570,112 @@ class LDAPFilterQueryCompositionTest(unit.TestCase):
             self.filter_attribute_name, username)
         self.assertEqual(expected_ldap_filter,
                          self.base_ldap.filter_query(hints=hints, query=None))
+
+
+class EntryCacheTest(unit.BaseTestCase):
+
+    def setUp(self):
+        super(EntryCacheTest, self).setUp()
+        self.cache = common_ldap.EntryCache(size=2, ttl=60)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', {'id': 'a'}, ['tag-a'])
+        self.cache.set('b', {'id': 'b'}, ['tag-b'])
+        self.assertEqual({'id': 'a'}, self.cache.get('a'))
+        self.cache.set('c', {'id': 'c'}, ['tag-c'])
+
+        self.assertEqual({'id': 'a'}, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual({'id': 'c'}, self.cache.get('c'))
+        self.assertEqual({'entries': 2, 'hits': 3, 'misses': 1,
+                          'evictions': 1},
+                         self.cache.stats())
+
+    def test_entry_expires(self):
+        with mock.patch('time.time', return_value=1000):
+            self.cache.set('a', {'id': 'a'}, ['tag-a'])
+        with mock.patch('time.time', return_value=1059):
+            self.assertEqual({'id': 'a'}, self.cache.get('a'))
+        with mock.patch('time.time', return_value=1060):
+            self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(0, self.cache.stats()['entries'])
+
+    def test_entries_invalidated_by_tag(self):
+        self.cache.set('a', {'id': 'a'}, ['tag-a', 'tag-shared'])
+        self.cache.set('b', {'id': 'b'}, ['tag-b', 'tag-shared'])
+        self.cache.invalidate(['tag-a'])
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual({'id': 'b'}, self.cache.get('b'))
+
+        self.cache.invalidate(['tag-shared'])
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_cached_value_is_copied(self):
+        value = {'id': 'a'}
+        self.cache.set('a', value, ['tag-a'])
+        value['id'] = 'b'
+        self.cache.get('a')['id'] = 'c'
+        self.assertEqual({'id': 'a'}, self.cache.get('a'))
+
+    def test_dn_cache_tag_is_normalized(self):
+        self.assertEqual(
+            common_ldap.dn_cache_tag('cn=Foo  Bar,ou=Users,dc=example'),
+            common_ldap.dn_cache_tag('CN=foo bar,OU=users,DC=Example'))
+
+
+class LDAPEntryCacheTest(unit.TestCase):
+
+    def setUp(self):
+        super(LDAPEntryCacheTest, self).setUp()
+
+        self.useFixture(ldapdb.LDAPDatabase())
+        self.useFixture(database.Database(self.sql_driver_version_overrides))
+        self.addCleanup(common_ldap._ENTRY_CACHES.clear)
+
+        self.load_backends()
+        self.load_fixtures(default_fixtures)
+
+    def config_overrides(self):
+        super(LDAPEntryCacheTest, self).config_overrides()
+        self.config_fixture.config(group='identity', driver='ldap')
+        self.config_fixture.config(group='ldap', entry_cache_size=100)
+
+    def config_files(self):
+        config_files = super(LDAPEntryCacheTest, self).config_files()
+        config_files.append(unit.dirs.tests_conf('backend_ldap.conf'))
+        return config_files
+
+    def test_entry_cached_until_updated(self):
+        user_api = self.identity_api.driver.user
+        user_id = self.user_foo['id']
+
+        with mock.patch.object(common_ldap.KeystoneLDAPHandler, 'search_s',
+                               autospec=True,
+                               side_effect=common_ldap.KeystoneLDAPHandler.
+                               search_s) as search_s:
+            user_api.get(user_id)
+            user_api.get(user_id)
+            self.assertEqual(1, search_s.call_count)
+
+            user_api.update(user_id, {'email': 'foo@example.com'})
+            self.assertEqual('foo@example.com',
+                             user_api.get(user_id)['email'])
+
+        # The update itself fetches the entry before modifying it.
+        self.assertEqual(3, user_api.entry_cache.stats()['hits'])
+
+    def test_entry_by_name_cached_until_deleted(self):
+        user_api = self.identity_api.driver.user
+        name = self.user_foo['name']
+
+        self.assertEqual(self.user_foo['id'],
+                         user_api.get_by_name(name)['id'])
+        with mock.patch.object(common_ldap.KeystoneLDAPHandler,
+                               'search_s') as search_s:
+            self.assertEqual(self.user_foo['id'],
+                             user_api.get_by_name(name)['id'])
+        self.assertFalse(search_s.called)
+
+        user_api.delete(self.user_foo['id'])
+        self.assertRaises(exception.UserNotFound,
+                          user_api.get_by_name, name)
@@ -808,6 +808,24 @@ class IdentityTests(object):
                           uuid.uuid4().hex,
                           CONF.identity.default_domain_id)
 
+    def test_list_groups_by_id(self):
+        groups = [self.identity_api.create_group(unit.new_group_ref(
+            domain_id=CONF.identity.default_domain_id)) for _ in range(3)]
+
+        group_refs = self.identity_api.list_groups_by_id(
+            [groups[0]['id'], uuid.uuid4().hex, groups[2]['id']])
+        self.assertItemsEqual([groups[0], groups[2]], group_refs)
+
+    def test_list_groups_by_name(self):
+        groups = [self.identity_api.create_group(unit.new_group_ref(
+            domain_id=CONF.identity.default_domain_id)) for _ in range(3)]
+
+        group_refs = self.identity_api.list_groups_by_name(
+            [(groups[0]['name'], CONF.identity.default_domain_id),
+             (uuid.uuid4().hex, CONF.identity.default_domain_id),
+             (groups[2]['name'], CONF.identity.default_domain_id)])
+        self.assertItemsEqual([groups[0], groups[2]], group_refs)
+
     @unit.skip_if_cache_disabled('identity')
     def test_cache_layer_group_crud(self):
         group = unit.new_group_ref(domain_id=CONF.identity.default_domain_id)
@@ -16,10 +16,11 @@ import fixtures
 from keystone import catalog
 from keystone.common import cache
 from keystone import revoke
+from keystone import token
 
 
 CACHE_REGIONS = (cache.CACHE_REGION, catalog.COMPUTED_CATALOG_REGION,
-                 revoke.REVOKE_REGION)
+                 revoke.REVOKE_REGION, token.provider.TOKEN_DATA_REGION)
 
 
 class Cache(fixtures.Fixture):
@@ -15,9 +15,11 @@
 
 import uuid
 
+import mock
 from testtools import matchers
 
 from keystone.common import sql
+from keystone import identity
 from keystone.identity.mapping_backends import mapping
 from keystone.tests import unit
 from keystone.tests.unit import identity_mapping as mapping_sql
@@ -215,6 +217,139 @@ class SqlIDMapping(test_backend_sql.SqlTests):
             local_entity, public_id=uuid.uuid4().hex)
         self.assertEqual(public_id1, public_id3)
 
+    def test_bulk_id_mapping(self):
+        local_entities = [
+            {'domain_id': self.domainA['id'],
+             'local_id': uuid.uuid4().hex,
+             'entity_type': mapping.EntityType.USER},
+            {'domain_id': self.domainB['id'],
+             'local_id': uuid.uuid4().hex,
+             'entity_type': mapping.EntityType.GROUP},
+            {'domain_id': self.domainA['id'],
+             'local_id': uuid.uuid4().hex,
+             'entity_type': mapping.EntityType.USER}]
+        self.assertEqual([None, None, None],
+                         self.id_mapping_api.get_public_ids(local_entities))
+
+        # Only map the first local entity
+        public_id1 = self.id_mapping_api.create_id_mapping(local_entities[0])
+        self.assertEqual([public_id1, None, None],
+                         self.id_mapping_api.get_public_ids(local_entities))
+
+        # Map the others at once, one of them with a given public ID
+        public_id3 = uuid.uuid4().hex
+        public_ids = self.id_mapping_api.create_id_mappings(
+            local_entities[1:], [None, public_id3])
+        self.assertEqual(public_id3, public_ids[1])
+        self.assertEqual([public_id1] + public_ids,
+                         self.id_mapping_api.get_public_ids(local_entities))
+        for local_entity, public_id in zip(local_entities[1:], public_ids):
+            self.assertDictContainsSubset(
+                local_entity, self.id_mapping_api.get_id_mapping(public_id))
+
+    def test_create_duplicate_mappings(self):
+        local_entities = [
+            {'domain_id': self.domainA['id'],
+             'local_id': uuid.uuid4().hex,
+             'entity_type': mapping.EntityType.USER},
+            {'domain_id': self.domainA['id'],
+             'local_id': uuid.uuid4().hex,
+             'entity_type': mapping.EntityType.USER}]
+        public_id1 = self.id_mapping_api.create_id_mapping(local_entities[0])
+
+        # The existing mapping is used, and the other one is still created
+        public_ids = self.id_mapping_api.create_id_mappings(
+            local_entities, [uuid.uuid4().hex, None])
+        self.assertEqual(public_id1, public_ids[0])
+        self.assertEqual(public_ids,
+                         self.id_mapping_api.get_public_ids(local_entities))
+
+    @unit.skip_if_cache_disabled('identity')
+    def test_bulk_id_mapping_kept_in_memory_until_deleted(self):
+        local_entity = {'domain_id': self.domainA['id'],
+                        'local_id': uuid.uuid4().hex,
+                        'entity_type': mapping.EntityType.USER}
+        public_id = self.id_mapping_api.create_id_mappings(
+            [local_entity], [None])[0]
+
+        with mock.patch.object(self.id_mapping_api.driver,
+                               'get_public_ids') as get_public_ids:
+            self.assertEqual(
+                [public_id],
+                self.id_mapping_api.get_public_ids([local_entity]))
+        self.assertFalse(get_public_ids.called)
+
+        self.id_mapping_api.delete_id_mapping(public_id)
+        self.assertEqual([None],
+                         self.id_mapping_api.get_public_ids([local_entity]))
+
+    def test_id_mapping_in_memory_index(self):
+        self.config_fixture.config(group='identity_mapping',
+                                   in_memory_index=True)
+        local_entity = {'domain_id': self.domainA['id'],
+                        'local_id': uuid.uuid4().hex,
+                        'entity_type': mapping.EntityType.USER}
+        # This mapping is loaded into the index from the table.
+        public_id = self.id_mapping_api.driver.create_id_mapping(local_entity)
+        new_entity = {'domain_id': self.domainB['id'],
+                      'local_id': uuid.uuid4().hex,
+                      'entity_type': mapping.EntityType.GROUP}
+        new_public_id = self.id_mapping_api.create_id_mapping(new_entity)
+
+        with mock.patch.object(self.id_mapping_api, 'driver') as driver:
+            self.assertEqual(public_id,
+                             self.id_mapping_api.get_public_id(local_entity))
+            self.assertEqual(
+                [public_id, new_public_id],
+                self.id_mapping_api.get_public_ids([local_entity,
+                                                    new_entity]))
+            self.assertDictContainsSubset(
+                new_entity, self.id_mapping_api.get_id_mapping(new_public_id))
+        self.assertFalse(driver.mock_calls)
+
+        self.id_mapping_api.delete_id_mapping(new_public_id)
+        self.assertIsNone(self.id_mapping_api.get_public_id(new_entity))
+        self.assertIsNone(self.id_mapping_api.get_id_mapping(new_public_id))
+
+        self.id_mapping_api.purge_mappings({})
+        self.assertIsNone(self.id_mapping_api.get_public_id(local_entity))
+        self.assertIsNone(self.id_mapping_api.get_id_mapping(public_id))
+
+    @unit.skip_if_cache_disabled('identity')
+    def test_id_mapping_in_memory_index_purged_by_another_process(self):
+        self.config_fixture.config(group='identity_mapping',
+                                   in_memory_index=True)
+        local_entity = {'domain_id': self.domainA['id'],
+                        'local_id': uuid.uuid4().hex,
+                        'entity_type': mapping.EntityType.USER}
+        public_id = self.id_mapping_api.create_id_mapping(local_entity)
+        self.assertEqual(public_id,
+                         self.id_mapping_api.get_public_id(local_entity))
+
+        # Purge the mappings the way keystone-manage does from its own
+        # process, which only shares the cache with this one.
+        self.id_mapping_api.driver.purge_mappings({})
+        identity.ID_MAPPING_REGION.invalidate()
+
+        self.assertIsNone(self.id_mapping_api.get_public_id(local_entity))
+        self.assertIsNone(self.id_mapping_api.get_id_mapping(public_id))
+
+    def test_id_mapping_in_memory_index_with_given_public_id(self):
+        self.config_fixture.config(group='identity_mapping',
+                                   in_memory_index=True)
+        local_entity = {'domain_id': self.domainA['id'],
+                        'local_id': uuid.uuid4().hex,
+                        'entity_type': mapping.EntityType.USER}
+        public_id = uuid.uuid4().hex
+        self.id_mapping_api.driver.create_id_mapping(local_entity, public_id)
+
+        # A public ID that is not generated from the local entity is still
+        # found in the table.
+        self.assertEqual(public_id,
+                         self.id_mapping_api.get_public_id(local_entity))
+        self.assertDictContainsSubset(
+            local_entity, self.id_mapping_api.get_id_mapping(public_id))
+
     @unit.skip_if_cache_disabled('identity')
     def test_cache_when_id_mapping_crud(self):
         local_id = uuid.uuid4().hex
@@ -14,6 +14,7 @@
 import datetime
 import uuid
 
+import mock
 from oslo_utils import timeutils
 import six
 
@@ -38,70 +39,106 @@ class KvsToken(unit.TestCase, token_tests.TokenTests):
             exception.NotImplemented,
             self.token_provider_api._persistence.flush_expired_tokens)
 
-    def _update_user_token_index_direct(self, user_key, token_id, new_data):
-        persistence = self.token_provider_api._persistence
-        token_list = persistence.driver._get_user_token_list_with_expiry(
-            user_key)
-        # Update the user-index so that the expires time is _actually_ expired
-        # since we do not do an explicit get on the token, we only reference
-        # the data in the user index (to save extra round-trips to the kvs
-        # backend).
-        for i, data in enumerate(token_list):
-            if data[0] == token_id:
-                token_list[i] = new_data
-                break
-        self.token_provider_api._persistence.driver._store.set(user_key,
-                                                               token_list)
-
-    def test_cleanup_user_index_on_create(self):
+    def _get_user_shard(self, user_id, expires):
+        driver = self.token_provider_api._persistence.driver
+        shard_start = expires.replace(minute=0, second=0, microsecond=0)
+        return driver._store.get(driver._prefix_user_shard(user_id,
+                                                           shard_start))
+
+    def test_user_index_is_sharded_by_expiry_hour(self):
+        self.config_fixture.config(group='token', expiration=7200)
         user_id = six.text_type(uuid.uuid4().hex)
-        valid_token_id, data = self.create_token_sample_data(user_id=user_id)
-        expired_token_id, expired_data = self.create_token_sample_data(
-            user_id=user_id)
+        now = timeutils.utcnow()
+        expires = now + datetime.timedelta(minutes=5)
+        later_expires = now + datetime.timedelta(minutes=65)
+        token_id, data = self.create_token_sample_data(user_id=user_id,
+                                                       expires=expires)
+        later_token_id, data = self.create_token_sample_data(
+            user_id=user_id, expires=later_expires)
+
+        self.assertEqual(
+            [(token_id, utils.isotime(expires, subsecond=True))],
+            self._get_user_shard(user_id, expires))
+        self.assertEqual(
+            [(later_token_id, utils.isotime(later_expires, subsecond=True))],
+            self._get_user_shard(user_id, later_expires))
+        tokens = self.token_provider_api._persistence._list_tokens(user_id)
+        self.assertEqual(set([token_id, later_token_id]), set(tokens))
+
+    def test_user_shards_are_listed_after_expiration_is_lowered(self):
+        self.config_fixture.config(group='token', expiration=7200)
+        user_id = six.text_type(uuid.uuid4().hex)
+        later_expires = timeutils.utcnow() + datetime.timedelta(minutes=110)
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+        later_token_id, data = self.create_token_sample_data(
+            user_id=user_id, expires=later_expires)
+
+        self.config_fixture.config(group='token', expiration=600)
+        driver = self.token_provider_api._persistence.driver
+        with mock.patch.object(driver._store, 'get_multi',
+                               wraps=driver._store.get_multi) as get_multi:
+            tokens = driver._list_tokens(user_id)
+        self.assertEqual(set([token_id, later_token_id]), set(tokens))
+        self.assertEqual(1, get_multi.call_count)
 
-        expire_delta = datetime.timedelta(seconds=86400)
-
-        # NOTE(morganfainberg): Directly access the data cache since we need to
-        # get expired tokens as well as valid tokens.
-        token_persistence = self.token_provider_api._persistence
-        user_key = token_persistence.driver._prefix_user_id(user_id)
-        user_token_list = token_persistence.driver._store.get(user_key)
-        valid_token_ref = token_persistence.get_token(valid_token_id)
-        expired_token_ref = token_persistence.get_token(expired_token_id)
-        expected_user_token_list = [
-            (valid_token_id, utils.isotime(valid_token_ref['expires'],
-                                           subsecond=True)),
-            (expired_token_id, utils.isotime(expired_token_ref['expires'],
-                                             subsecond=True))]
-        self.assertEqual(expected_user_token_list, user_token_list)
-        new_expired_data = (expired_token_id,
-                            utils.isotime(
-                                (timeutils.utcnow() - expire_delta),
-                                subsecond=True))
-        self._update_user_token_index_direct(user_key, expired_token_id,
-                                             new_expired_data)
-        valid_token_id_2, valid_data_2 = self.create_token_sample_data(
+    def test_create_token_does_not_read_revocation_list(self):
+        driver = self.token_provider_api._persistence.driver
+        user_id = six.text_type(uuid.uuid4().hex)
+        revoked_token_id, data = self.create_token_sample_data(
             user_id=user_id)
-        valid_token_ref_2 = token_persistence.get_token(valid_token_id_2)
-        expected_user_token_list = [
-            (valid_token_id, utils.isotime(valid_token_ref['expires'],
-                                           subsecond=True)),
-            (valid_token_id_2, utils.isotime(valid_token_ref_2['expires'],
-                                             subsecond=True))]
-        user_token_list = token_persistence.driver._store.get(user_key)
-        self.assertEqual(expected_user_token_list, user_token_list)
-
-        # Test that revoked tokens are removed from the list on create.
-        token_persistence.delete_token(valid_token_id_2)
-        new_token_id, data = self.create_token_sample_data(user_id=user_id)
-        new_token_ref = token_persistence.get_token(new_token_id)
-        expected_user_token_list = [
-            (valid_token_id, utils.isotime(valid_token_ref['expires'],
-                                           subsecond=True)),
-            (new_token_id, utils.isotime(new_token_ref['expires'],
-                                         subsecond=True))]
-        user_token_list = token_persistence.driver._store.get(user_key)
-        self.assertEqual(expected_user_token_list, user_token_list)
+        self.token_provider_api._persistence.delete_token(revoked_token_id)
+
+        with mock.patch.object(driver, 'list_revoked_tokens') as revoked:
+            token_id, data = self.create_token_sample_data(user_id=user_id)
+        self.assertFalse(revoked.called)
+        tokens = self.token_provider_api._persistence._list_tokens(user_id)
+        self.assertEqual([token_id], tokens)
+
+    def test_expired_user_shards_are_dropped(self):
+        driver = self.token_provider_api._persistence.driver
+        user_id = six.text_type(uuid.uuid4().hex)
+        expired = timeutils.utcnow() - datetime.timedelta(hours=1)
+        expired_key = driver._prefix_user_shard(
+            user_id, expired.replace(minute=0, second=0, microsecond=0))
+        driver._store.set(expired_key, [
+            (uuid.uuid4().hex, utils.isotime(expired, subsecond=True))])
+
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+        self.assertRaises(exception.NotFound, driver._store.get, expired_key)
+
+    def test_tokens_in_legacy_user_index_are_listed(self):
+        driver = self.token_provider_api._persistence.driver
+        user_id = six.text_type(uuid.uuid4().hex)
+        token_id, data = self.create_token_sample_data(user_id=user_id)
+        token_ref = driver.get_token(token_id)
+        # Move the token to the single list index of earlier releases.
+        driver._store.delete(driver._prefix_user_shard(
+            user_id, timeutils.normalize_time(token_ref['expires']).replace(
+                minute=0, second=0, microsecond=0)))
+        driver._store.set(driver._prefix_user_id(user_id), [
+            (token_id, utils.isotime(token_ref['expires'], subsecond=True))])
+
+        self.assertEqual([token_id], driver._list_tokens(user_id))
+        driver.delete_tokens(user_id)
+        self.assertRaises(exception.TokenNotFound, driver.get_token, token_id)
+
+    def test_delete_tokens_in_bulk_lists_each_user_once(self):
+        driver = self.token_provider_api._persistence.driver
+        user_ids = [six.text_type(uuid.uuid4().hex) for i in range(2)]
+        project_ids = [uuid.uuid4().hex for i in range(3)]
+        deleted = [self.create_token_sample_data(user_id=user_id,
+                                                 tenant_id=project_id)[0]
+                   for user_id in user_ids for project_id in project_ids[:2]]
+        kept_token_id, data = self.create_token_sample_data(
+            user_id=user_ids[0])
+
+        with mock.patch.object(driver, '_list_tokens',
+                               wraps=driver._list_tokens) as list_tokens:
+            token_list = driver.delete_tokens_in_bulk(
+                user_ids, project_ids=project_ids)
+        self.assertItemsEqual(deleted, token_list)
+        self.assertEqual(len(user_ids), list_tokens.call_count)
+        self.assertEqual([kept_token_id], driver._list_tokens(user_ids[0]))
 
 
 class KvsTokenCacheInvalidation(unit.TestCase,
@@ -32,6 +32,7 @@ import keystone.conf
 from keystone import exception
 from keystone import identity
 from keystone.identity.backends.ldap import common as common_ldap
+from keystone.identity.backends.ldap import core as ldap_identity
 from keystone.identity.mapping_backends import mapping as map
 from keystone.tests import unit
 from keystone.tests.unit.assignment import test_backends as assignment_tests
@@ -785,6 +786,40 @@ class BaseLDAPIdentity(IdentityTests, AssignmentTests, ResourceTests):
         self.assertEqual(1, len(res), "Expected 1 entry (user_1)")
         self.assertEqual(user_1_id, res[0]['id'], "Expected user 1 id")
 
+    def test_list_group_members_in_bulk(self):
+        group = unit.new_group_ref(domain_id=CONF.identity.default_domain_id)
+        group_id = self.identity_api.create_group(group)['id']
+        user_ids = []
+        for x in range(3):
+            user = unit.new_user_ref(
+                domain_id=CONF.identity.default_domain_id)
+            user_id = self.identity_api.create_user(user)['id']
+            self.identity_api.add_user_to_group(user_id, group_id)
+            user_ids.append(user_id)
+
+        # The members are fetched two at a time, rather than one by one.
+        with mock.patch.object(ldap_identity, 'MAX_IDS_PER_SEARCH', 2), \
+                mock.patch.object(ldap_identity.UserApi,
+                                  'get_filtered') as get_filtered:
+            users = self.identity_api.list_users_in_group(group_id)
+        self.assertItemsEqual(user_ids, [user['id'] for user in users])
+        self.assertFalse(get_filtered.called)
+
+    def test_check_user_in_group_does_not_list_members(self):
+        group = unit.new_group_ref(domain_id=CONF.identity.default_domain_id)
+        group_id = self.identity_api.create_group(group)['id']
+        user = unit.new_user_ref(domain_id=CONF.identity.default_domain_id)
+        user_id = self.identity_api.create_user(user)['id']
+
+        with mock.patch.object(ldap_identity.GroupApi,
+                               'list_group_users') as list_group_users:
+            self.assertRaises(exception.NotFound,
+                              self.identity_api.check_user_in_group,
+                              user_id, group_id)
+            self.identity_api.add_user_to_group(user_id, group_id)
+            self.identity_api.check_user_in_group(user_id, group_id)
+        self.assertFalse(list_group_users.called)
+
     def test_list_group_members_when_no_members(self):
         # List group members when there is no member in the group.
         # No exception should be raised.
@@ -1966,6 +2001,13 @@ class LDAPLimitTests(unit.TestCase, identity_tests.LimitTests):
         config_files.append(unit.dirs.tests_conf('backend_ldap.conf'))
         return config_files
 
+    def test_list_truncated_by_directory_is_not_ordered(self):
+        hints = driver_hints.Hints()
+        users = self.identity_api.list_users(hints=hints)
+        self.assertEqual(len(default_fixtures.USERS) - 1, len(users))
+        self.assertTrue(hints.limit['truncated'])
+        self.assertFalse(hints.limit['ordered'])
+
 
 class LDAPIdentityEnabledEmulation(LDAPIdentity):
     def setUp(self):
@@ -2087,6 +2129,41 @@ class LDAPIdentityEnabledEmulation(LDAPIdentity):
             user_id=self.user_foo['id'],
             password=self.user_foo['password'])
 
+    def test_get_user_searches_enabled_asynchronously(self):
+        driver = self.identity_api._select_identity_driver(
+            CONF.identity.default_domain_id)
+        user = unit.new_user_ref(domain_id=CONF.identity.default_domain_id,
+                                 enabled=False)
+        user = self.identity_api.create_user(user)
+
+        with mock.patch.object(driver.user, '_get_enabled') as get_enabled:
+            self.assertTrue(driver.user.get(self.user_foo['id'])['enabled'])
+            self.assertFalse(driver.user.get(user['id'])['enabled'])
+        self.assertFalse(get_enabled.called)
+
+    def test_get_missing_user_collects_enabled_search(self):
+        driver = self.identity_api._select_identity_driver(
+            CONF.identity.default_domain_id)
+
+        with mock.patch.object(driver.user,
+                               '_get_enabled_async') as get_enabled_async:
+            self.assertRaises(exception.UserNotFound,
+                              driver.user.get, uuid.uuid4().hex)
+        get_enabled_async.return_value.assert_called_once_with()
+
+    def test_get_user_error_collects_enabled_search(self):
+        driver = self.identity_api._select_identity_driver(
+            CONF.identity.default_domain_id)
+
+        with mock.patch.object(driver.user,
+                               '_get_enabled_async') as get_enabled_async:
+            get_enabled_async.return_value.side_effect = ldap.SERVER_DOWN
+            with mock.patch.object(common_ldap.BaseLdap, 'get',
+                                   side_effect=ldap.SERVER_DOWN):
+                self.assertRaises(ldap.SERVER_DOWN,
+                                  driver.user.get, self.user_foo['id'])
+        get_enabled_async.return_value.assert_called_once_with()
+
     def test_user_enable_attribute_mask(self):
         self.skip_test_overrides(
             "Enabled emulation conflicts with enabled mask")
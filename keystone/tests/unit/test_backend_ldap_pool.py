@@ -169,6 +169,29 @@ class LdapPoolCommonTestMixin(object):
                     _.unbind_ext_s()
                     self.assertEqual(3, len(ldappool_cm))
 
+    def test_search_async_in_flight_together(self):
+        user_api = ldap.UserApi(CONF)
+        ldappool_cm = self.conn_pools[CONF.ldap.url]
+        with user_api.get_connection() as conn:
+            get_results = [
+                conn.search_async(user_api.tree_dn, user_api.LDAP_SCOPE,
+                                  '(%s=%s)' % (user_api.id_attr, user['id']),
+                                  [user_api.id_attr])
+                for user in (self.user_foo, self.user_two)]
+            # Each search holds its own connection until its result is
+            # collected.
+            self.assertEqual(2, len([c for c in ldappool_cm._pool
+                                     if c.active]))
+            results = [get_result() for get_result in get_results]
+            # And releases it once the result is collected.
+            self.assertEqual(0, len([c for c in ldappool_cm._pool
+                                     if c.active]))
+
+        self.assertEqual(
+            [[self.user_foo['id']], [self.user_two['id']]],
+            [attrs[user_api.id_attr] for dn, attrs in
+             (result[0] for result in results)])
+
     def test_password_change_with_pool(self):
         old_password = self.user_sna['password']
         self.cleanup_pools()
@@ -29,7 +29,9 @@ from keystone.common import sql
 import keystone.conf
 from keystone import exception
 from keystone.identity.backends import sql_model as identity_sql
+from keystone import notifications
 from keystone.resource.backends import base as resource
+from keystone.resource.backends import sql as resource_sql
 from keystone.tests import unit
 from keystone.tests.unit.assignment import test_backends as assignment_tests
 from keystone.tests.unit.catalog import test_backends as catalog_tests
@@ -40,6 +42,7 @@ from keystone.tests.unit.policy import test_backends as policy_tests
 from keystone.tests.unit.resource import test_backends as resource_tests
 from keystone.tests.unit.token import test_backends as token_tests
 from keystone.tests.unit.trust import test_backends as trust_tests
+from keystone.token import persistence
 from keystone.token.persistence.backends import sql as token_sql
 
 
@@ -627,6 +630,147 @@ class SqlIdentity(SqlTests,
         self.assertNotEqual(len(first_call_users), len(second_call_users))
         self.assertEqual(first_call_counter, counter.calls)
 
+    def test_list_role_assignments_query_is_baked(self):
+        projects = []
+        for i in range(6):
+            project = unit.new_project_ref(
+                domain_id=CONF.identity.default_domain_id)
+            self.resource_api.create_project(project['id'], project)
+            projects.append(project)
+            if i % 2:
+                self.assignment_api.add_role_to_user_and_project(
+                    self.user_foo['id'], project['id'],
+                    self.role_member['id'])
+
+        compiled = []
+        # Each lookup of compiled.append makes a new method, so the listener
+        # is bound once to be removed with the same object.
+        on_compile = compiled.append
+        sqlalchemy.event.listen(sqlalchemy.orm.query.Query, 'before_compile',
+                                on_compile)
+        self.addCleanup(sqlalchemy.event.remove, sqlalchemy.orm.query.Query,
+                        'before_compile', on_compile)
+
+        # The IN clause of three project IDs binds four parameters.
+        refs = self.assignment_api.driver.list_role_assignments(
+            user_id=self.user_foo['id'],
+            project_ids=[project['id'] for project in projects[:3]])
+        self.assertEqual([projects[1]['id']],
+                         [ref['project_id'] for ref in refs])
+        # Unless an earlier test baked it already, the query was compiled.
+        self.assertLessEqual(len(compiled), 1)
+        compiled_calls = len(compiled)
+
+        # A query built the same way isn't compiled again.
+        refs = self.assignment_api.driver.list_role_assignments(
+            user_id=self.user_foo['id'],
+            project_ids=[project['id'] for project in projects[2:]])
+        self.assertItemsEqual([projects[3]['id'], projects[5]['id']],
+                              [ref['project_id'] for ref in refs])
+        self.assertEqual(compiled_calls, len(compiled))
+
+    def test_list_role_assignments_of_many_projects(self):
+        project = unit.new_project_ref(
+            domain_id=CONF.identity.default_domain_id)
+        self.resource_api.create_project(project['id'], project)
+        self.assignment_api.add_role_to_user_and_project(
+            self.user_foo['id'], project['id'], self.role_member['id'])
+
+        # The IN clause of more project IDs than are padded binds one
+        # parameter per project.
+        project_ids = [uuid.uuid4().hex for i in range(sql.IN_SIZE_MAX)]
+        project_ids.append(project['id'])
+        refs = self.assignment_api.driver.list_role_assignments(
+            user_id=self.user_foo['id'], project_ids=project_ids)
+        self.assertEqual([project['id']],
+                         [ref['project_id'] for ref in refs])
+
+    def _create_project_tree(self, depth, width):
+        """Create a tree of projects and return their IDs, level by level."""
+        root = unit.new_project_ref(domain_id=CONF.identity.default_domain_id)
+        self.resource_api.create_project(root['id'], root)
+        levels = [[root['id']]]
+        for _ in range(depth - 1):
+            children = []
+            for parent_id in levels[-1]:
+                for _ in range(width):
+                    project = unit.new_project_ref(
+                        domain_id=CONF.identity.default_domain_id,
+                        parent_id=parent_id)
+                    self.resource_api.create_project(project['id'], project)
+                    children.append(project['id'])
+            levels.append(children)
+        return levels
+
+    def test_project_hierarchy_recursive_queries(self):
+        driver = self.resource_api.driver
+        with sql.session_for_read() as session:
+            if not driver._supports_recursive_queries(session):
+                self.skipTest('The database driver does not run recursive '
+                              'queries.')
+
+        levels = self._create_project_tree(depth=4, width=2)
+        root_id = levels[0][0]
+        leaf_id = levels[-1][-1]
+
+        with mock.patch.object(driver, '_get_children') as get_children:
+            subtree = driver.list_projects_in_subtree(root_id)
+            parents = driver.list_project_parents(leaf_id)
+            self.assertFalse(driver.is_leaf_project(root_id))
+            self.assertTrue(driver.is_leaf_project(leaf_id))
+        self.assertFalse(get_children.called)
+
+        with mock.patch.object(driver, '_supports_recursive_queries',
+                               return_value=False):
+            self.assertItemsEqual(
+                driver.list_projects_in_subtree(root_id), subtree)
+            self.assertEqual(driver.list_project_parents(leaf_id), parents)
+
+        self.assertItemsEqual(levels[1] + levels[2] + levels[3],
+                              [project['id'] for project in subtree])
+        # The root project is itself below its domain.
+        self.assertEqual([levels[2][-1], levels[1][-1], root_id],
+                         [project['id'] for project in parents[:3]])
+
+    def test_project_hierarchy_without_recursive_queries(self):
+        driver = self.resource_api.driver
+        levels = self._create_project_tree(depth=3, width=1)
+        with mock.patch.object(driver, '_supports_recursive_queries',
+                               return_value=False):
+            with mock.patch.object(driver, '_get_descendants') as descendants:
+                subtree = driver.list_projects_in_subtree(levels[0][0])
+            with mock.patch.object(driver, '_get_ancestors') as ancestors:
+                parents = driver.list_project_parents(levels[-1][0])
+        self.assertFalse(descendants.called)
+        self.assertFalse(ancestors.called)
+        self.assertEqual([levels[1][0], levels[2][0]],
+                         [project['id'] for project in subtree])
+        self.assertEqual([levels[1][0], levels[0][0]],
+                         [project['id'] for project in parents[:2]])
+
+    def test_recursive_queries_not_used_with_excluded_driver(self):
+        driver = self.resource_api.driver
+        with sql.session_for_read() as session:
+            dialect = session.get_bind().dialect
+            with mock.patch.object(resource_sql, 'NO_RECURSIVE_CTE_DRIVERS',
+                                   set([dialect.driver])):
+                self.assertFalse(driver._supports_recursive_queries(session))
+
+    def test_list_project_parents_with_circular_reference(self):
+        project1 = unit.new_project_ref(
+            domain_id=CONF.identity.default_domain_id)
+        project1 = self.resource_api.create_project(project1['id'], project1)
+        project2 = unit.new_project_ref(
+            domain_id=CONF.identity.default_domain_id,
+            parent_id=project1['id'])
+        self.resource_api.create_project(project2['id'], project2)
+
+        project1['parent_id'] = project2['id']
+        self.resource_api.driver.update_project(project1['id'], project1)
+
+        self.assertIsNone(
+            self.resource_api.driver.list_project_parents(project2['id']))
+
 
 class SqlTrust(SqlTests, trust_tests.TrustTests):
     pass
@@ -733,6 +877,181 @@ class SqlToken(SqlTests, token_tests.TokenTests):
         self.assertEqual(token_sql._expiry_range_batched, mysql_strategy.func)
         self.assertEqual({'batch_size': 1000}, mysql_strategy.keywords)
 
+    def test_create_token_stores_scope_columns(self):
+        consumer_id = uuid.uuid4().hex
+        token_id, data = self.create_token_sample_data(tenant_id='tenant')
+        data['token_data'] = {'token': {
+            'OS-OAUTH1': {'consumer_id': consumer_id}}}
+        oauth_token_id = self.token_provider_api._persistence.create_token(
+            uuid.uuid4().hex, data)['id']
+
+        with sql.session_for_read() as session:
+            token_ref = session.query(token_sql.TokenModel).get(token_id)
+            self.assertEqual('tenant', token_ref.tenant_id)
+            self.assertIsNone(token_ref.consumer_id)
+            token_ref = session.query(token_sql.TokenModel).get(
+                oauth_token_id)
+            self.assertEqual(consumer_id, token_ref.consumer_id)
+
+    def test_delete_tokens_in_bulk_is_one_update(self):
+        user_ids = [uuid.uuid4().hex for i in range(3)]
+        for user_id in user_ids:
+            self.create_token_sample_data(user_id=user_id, tenant_id='tenant')
+
+        statements = []
+
+        def record_statement(conn, cursor, statement, *args):
+            statements.append(statement.split(None, 1)[0].upper())
+
+        with sql.session_for_read() as session:
+            engine = session.get_bind()
+        sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                                record_statement)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        'before_cursor_execute', record_statement)
+
+        token_list = token_sql.Token().delete_tokens_in_bulk(
+            user_ids, project_ids=['tenant'])
+        self.assertEqual(3, len(token_list))
+        self.assertEqual(1, statements.count('UPDATE'))
+
+    def _set_contract_version(self, version):
+        migrate_version = sqlalchemy.Table(
+            'migrate_version', sqlalchemy.MetaData(),
+            sqlalchemy.Column('repository_id', sqlalchemy.String(250),
+                              primary_key=True),
+            sqlalchemy.Column('repository_path', sqlalchemy.Text),
+            sqlalchemy.Column('version', sqlalchemy.Integer))
+        with sql.session_for_write() as session:
+            engine = session.get_bind()
+        migrate_version.create(engine)
+        self.addCleanup(migrate_version.drop, engine)
+        engine.execute(migrate_version.insert().values(
+            repository_id=token_sql.SCOPE_COLUMNS_CONTRACT_REPO,
+            version=version))
+
+    def test_delete_tokens_without_scope_columns(self):
+        # The contract migration which backfills the scope columns hasn't
+        # been run yet.
+        self._set_contract_version(
+            token_sql.SCOPE_COLUMNS_CONTRACT_VERSION - 1)
+        user1 = uuid.uuid4().hex
+        user2 = uuid.uuid4().hex
+        token_id = self.create_token_sample_data(user_id=user1,
+                                                 tenant_id='tenant')[0]
+        bulk_token_id = self.create_token_sample_data(user_id=user2,
+                                                      tenant_id='tenant')[0]
+        kept = [
+            self.create_token_sample_data(user_id=user1,
+                                          tenant_id='other')[0],
+            self.create_token_sample_data(user_id=user2)[0],
+        ]
+        # Nodes still running the previous release, until the contract
+        # migration, issue tokens without the scope columns.
+        with sql.session_for_write() as session:
+            query = session.query(token_sql.TokenModel)
+            query.update({'tenant_id': None}, synchronize_session=False)
+
+        driver = token_sql.Token()
+        self.assertEqual([token_id],
+                         driver._list_tokens(user1, tenant_id='tenant'))
+        self.assertEqual([token_id],
+                         driver.delete_tokens(user1, tenant_id='tenant'))
+        self.assertEqual(
+            [bulk_token_id],
+            driver.delete_tokens_in_bulk([user2], project_ids=['tenant']))
+        for deleted_token_id in (token_id, bulk_token_id):
+            self.assertRaises(exception.TokenNotFound,
+                              driver.get_token, deleted_token_id)
+        for kept_token_id in kept:
+            driver.get_token(kept_token_id)
+        # The tokens of a project are only looked for among the tokens of
+        # given users.
+        self.assertRaises(exception.NotImplemented,
+                          driver.delete_tokens_in_bulk, None,
+                          project_ids=['tenant'])
+
+    def test_tokens_without_scope_columns_ignored_after_contract(self):
+        self._set_contract_version(token_sql.SCOPE_COLUMNS_CONTRACT_VERSION)
+        user_id = uuid.uuid4().hex
+        token_id = self.create_token_sample_data(user_id=user_id,
+                                                 tenant_id='tenant')[0]
+        with sql.session_for_write() as session:
+            query = session.query(token_sql.TokenModel)
+            query.update({'tenant_id': None}, synchronize_session=False)
+
+        driver = token_sql.Token()
+        self.assertEqual([], driver.delete_tokens(user_id, tenant_id='tenant'))
+        self.assertEqual(
+            [], driver.delete_tokens_in_bulk(None, project_ids=['tenant']))
+        driver.get_token(token_id)
+        self.assertTrue(driver._scope_columns_backfilled)
+
+    def _create_domain_project_tokens(self, project_count):
+        domain = unit.new_domain_ref()
+        self.resource_api.create_domain(domain['id'], domain)
+        token_ids = []
+        for i in range(project_count):
+            project = unit.new_project_ref(domain_id=domain['id'])
+            self.resource_api.create_project(project['id'], project)
+            self.assignment_api.add_role_to_user_and_project(
+                self.user_foo['id'], project['id'], self.role_member['id'])
+            token_ids.append(self.create_token_sample_data(
+                user_id=self.user_foo['id'], tenant_id=project['id'])[0])
+        # The user has no role on the project any more, but still holds
+        # a token scoped to it.
+        token_ids.append(self.create_token_sample_data(
+            user_id=self.user_two['id'], tenant_id=project['id'])[0])
+        return domain['id'], token_ids
+
+    def test_delete_tokens_for_domain(self):
+        domain_id, deleted = self._create_domain_project_tokens(3)
+        kept = self.create_token_sample_data(
+            user_id=self.user_foo['id'], tenant_id=self.tenant_bar['id'])[0]
+
+        progress = []
+
+        def record_progress(service, resource_type, operation, payload):
+            info = payload['resource_info']
+            progress.append((info['projects_done'], info['project_count'],
+                             info['token_count']))
+
+        notifications.register_event_callback(
+            notifications.ACTIONS.internal,
+            notifications.DOMAIN_TOKEN_PERSISTENCE_PROGRESS, record_progress)
+
+        persistence_api = self.token_provider_api._persistence
+        with mock.patch.object(persistence.core,
+                               'DOMAIN_REVOCATION_BATCH_SIZE', 2):
+            persistence_api.delete_tokens_for_domain(domain_id)
+
+        for token_id in deleted:
+            self.assertRaises(exception.TokenNotFound,
+                              persistence_api.get_token, token_id)
+        persistence_api.get_token(kept)
+        # Progress is reported per batch of two projects.
+        self.assertEqual([(2, 3), (3, 3)],
+                         [(done, count) for done, count, tokens in progress])
+        self.assertEqual(len(deleted), progress[-1][2])
+
+    def test_delete_tokens_for_domain_by_user(self):
+        domain_id, token_ids = self._create_domain_project_tokens(2)
+
+        # A driver that can only find tokens by user is given the users with
+        # a role in the domain.
+        persistence_api = self.token_provider_api._persistence
+        driver = persistence_api.driver
+        delete_tokens_in_bulk = functools.partial(
+            persistence.TokenDriverV8.delete_tokens_in_bulk, driver)
+        with mock.patch.object(driver, 'delete_tokens_in_bulk',
+                               side_effect=delete_tokens_in_bulk):
+            persistence_api.delete_tokens_for_domain(domain_id)
+
+        for token_id in token_ids[:-1]:
+            self.assertRaises(exception.TokenNotFound,
+                              persistence_api.get_token, token_id)
+        persistence_api.get_token(token_ids[-1])
+
 
 class SqlCatalog(SqlTests, catalog_tests.CatalogTests):
 
@@ -769,6 +1088,65 @@ class SqlCatalog(SqlTests, catalog_tests.CatalogTests):
         self.assertIsNone(catalog_endpoint.get('adminURL'))
         self.assertIsNone(catalog_endpoint.get('internalURL'))
 
+    @unit.skip_if_cache_disabled('catalog')
+    def test_v3_catalog_kept_in_memory_until_catalog_changes(self):
+        service = unit.new_service_ref()
+        self.catalog_api.create_service(service['id'], service)
+        endpoint = unit.new_endpoint_ref(service_id=service['id'],
+                                         region_id=None)
+        self.catalog_api.create_endpoint(endpoint['id'], endpoint.copy())
+
+        catalog = self.catalog_api.get_v3_catalog('user', 'tenant')
+        self.assertEqual(endpoint['url'], catalog[0]['endpoints'][0]['url'])
+
+        # The rendered catalog is not rebuilt when the backend changes...
+        self.catalog_api.driver.update_endpoint(endpoint['id'],
+                                                {'url': uuid.uuid4().hex})
+        with mock.patch.object(self.catalog_api.driver,
+                               'get_v3_catalog') as get_v3_catalog:
+            catalog = self.catalog_api.get_v3_catalog('user', 'tenant')
+        self.assertFalse(get_v3_catalog.called)
+        self.assertEqual(endpoint['url'], catalog[0]['endpoints'][0]['url'])
+
+        # ...but only when the catalog manager signals a change.
+        new_url = uuid.uuid4().hex
+        self.catalog_api.update_endpoint(endpoint['id'], {'url': new_url})
+        catalog = self.catalog_api.get_v3_catalog('user', 'tenant')
+        self.assertEqual(new_url, catalog[0]['endpoints'][0]['url'])
+
+    @unit.skip_if_cache_disabled('catalog')
+    def test_v3_catalog_kept_in_memory_discards_least_recently_used(self):
+        self.config_fixture.config(group='catalog', local_cache_size=2)
+        self.catalog_api.get_v3_catalog('user', 'tenant1')
+        self.catalog_api.get_v3_catalog('user', 'tenant2')
+        # Using the first catalog again keeps it over the second one.
+        self.catalog_api.get_v3_catalog('user', 'tenant1')
+        self.catalog_api.get_v3_catalog('user', 'tenant3')
+
+        with mock.patch.object(self.catalog_api, '_get_v3_catalog',
+                               return_value=[]) as get_v3_catalog:
+            self.catalog_api.get_v3_catalog('user', 'tenant1')
+            self.catalog_api.get_v3_catalog('user', 'tenant3')
+            self.assertFalse(get_v3_catalog.called)
+            self.catalog_api.get_v3_catalog('user', 'tenant2')
+            get_v3_catalog.assert_called_once_with('user', 'tenant2')
+
+    @unit.skip_if_cache_disabled('catalog')
+    def test_v3_catalog_kept_in_memory_is_copied(self):
+        service = unit.new_service_ref()
+        self.catalog_api.create_service(service['id'], service)
+        endpoint = unit.new_endpoint_ref(service_id=service['id'],
+                                         region_id=None)
+        self.catalog_api.create_endpoint(endpoint['id'], endpoint.copy())
+
+        catalog = self.catalog_api.get_v3_catalog('user', 'tenant')
+        catalog[0]['endpoints'][0]['url'] = uuid.uuid4().hex
+        catalog[0]['endpoints'].append({})
+
+        catalog = self.catalog_api.get_v3_catalog('user', 'tenant')
+        self.assertEqual([endpoint['url']],
+                         [ep['url'] for ep in catalog[0]['endpoints']])
+
     def test_create_endpoint_region_returns_not_found(self):
         service = unit.new_service_ref()
         self.catalog_api.create_service(service['id'], service)
@@ -58,3 +58,45 @@ class ListHintsTests(test.TestCase):
         hints.set_limit(10, truncated=True)
         self.assertEqual(10, hints.limit['limit'])
         self.assertTrue(hints.limit['truncated'])
+
+    def test_list_limit_does_not_raise_requested_limit(self):
+        hints = driver_hints.Hints()
+        hints.set_list_limit(10)
+        self.assertEqual(10, hints.limit['limit'])
+        hints.set_limit(5)
+        hints.set_list_limit(10)
+        self.assertEqual(5, hints.limit['limit'])
+        hints.set_list_limit(3)
+        self.assertEqual(3, hints.limit['limit'])
+
+    def test_truncated_leaves_unsatisfied_marker_to_caller(self):
+        class Driver(object):
+            @driver_hints.truncated
+            def list_entities(self, hints):
+                return [{'id': str(i)} for i in range(5)]
+
+        hints = driver_hints.Hints()
+        hints.set_limit(2)
+        self.assertEqual(2, len(Driver().list_entities(hints)))
+        self.assertTrue(hints.limit['truncated'])
+
+        hints = driver_hints.Hints()
+        hints.set_limit(2)
+        hints.marker = '2'
+        self.assertEqual(5, len(Driver().list_entities(hints)))
+        self.assertEqual({'limit': 2, 'type': 'limit', 'truncated': False,
+                          'ordered': True},
+                         hints.limit)
+
+    def test_truncated_keeps_order_of_driver(self):
+        class Driver(object):
+            @driver_hints.truncated
+            def list_entities(self, hints):
+                hints.limit['ordered'] = False
+                return [{'id': str(i)} for i in reversed(range(5))]
+
+        hints = driver_hints.Hints()
+        hints.set_limit(2)
+        self.assertEqual(2, len(Driver().list_entities(hints)))
+        self.assertTrue(hints.limit['truncated'])
+        self.assertFalse(hints.limit['ordered'])
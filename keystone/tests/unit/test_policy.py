@@ -16,6 +16,7 @@
 import json
 import os
 
+import mock
 from oslo_policy import policy as common_policy
 import six
 from testtools import matchers
@@ -165,6 +166,94 @@ class DefaultPolicyTestCase(unit.TestCase):
                           self.credentials, "example:noexist", {})
 
 
+class PolicyDecisionCacheTestCase(unit.TestCase):
+    def setUp(self):
+        super(PolicyDecisionCacheTestCase, self).setUp()
+        self.rules = {
+            "true": [],
+            "example:denied": [["false:false"]],
+            "example:get_http": [["http:http://www.example.com"]],
+            "example:my_file": [["role:compute_admin"],
+                                ["project_id:%(project_id)s"]],
+            "example:owner": [["rule:my_file"], ["user_id:%(user_id)s"]],
+            "my_file": [["project_id:%(project_id)s"]],
+        }
+        rules._ENFORCER.set_rules(common_policy.Rules.from_dict(self.rules))
+        self.credentials = {'project_id': 'fake', 'user_id': 'me',
+                            'roles': []}
+
+    def config_overrides(self):
+        self.config_fixture.config(group='policy', decision_cache_size=2)
+        super(PolicyDecisionCacheTestCase, self).config_overrides()
+
+    def _assert_stats(self, hits, misses, evictions=0):
+        stats = rules.decision_cache_stats()
+        self.assertEqual((hits, misses, evictions),
+                         (stats['hits'], stats['misses'], stats['evictions']))
+
+    def test_repeated_checks_are_cached(self):
+        action = 'example:my_file'
+        rules.enforce(self.credentials, action, {'project_id': 'fake'})
+        self._assert_stats(hits=0, misses=1)
+        # Attributes which the rule does not read are not part of the key.
+        rules.enforce(dict(self.credentials, user_id='other'), action,
+                      {'project_id': 'fake', 'name': 'unused'})
+        self._assert_stats(hits=1, misses=1)
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action, {'project_id': 'another'})
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action, {'project_id': 'another'})
+        self._assert_stats(hits=2, misses=2)
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, 'example:denied', {})
+        self._assert_stats(hits=2, misses=3, evictions=1)
+
+    def test_rule_references_are_followed(self):
+        action = 'example:owner'
+        rules.enforce(self.credentials, action,
+                      {'project_id': 'another', 'user_id': 'me'})
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action,
+                          {'project_id': 'another', 'user_id': 'you'})
+        self._assert_stats(hits=0, misses=2)
+
+    def test_checks_with_unknown_inputs_are_not_cached(self):
+        key = rules._ENFORCER.decisions.make_key(
+            rules._ENFORCER.rules, 'example:get_http', self.credentials, {})
+        self.assertIsNone(key)
+
+    def test_checks_not_cached_without_oslo_policy_checks(self):
+        with mock.patch.object(rules, '_checks', None):
+            key = rules._ENFORCER.decisions.make_key(
+                rules._ENFORCER.rules, 'example:my_file', self.credentials,
+                {'project_id': 'fake'})
+        self.assertIsNone(key)
+
+    def test_checks_not_cached_when_check_classes_change(self):
+        # As if oslo.policy no longer had the check classes it used to have.
+        checks = mock.Mock(spec=[])
+        with mock.patch.object(rules, '_checks', checks):
+            key = rules._ENFORCER.decisions.make_key(
+                rules._ENFORCER.rules, 'example:my_file', self.credentials,
+                {'project_id': 'fake'})
+            self.assertIsNone(key)
+            # The decision is still taken, only not cached.
+            rules.enforce(self.credentials, 'example:my_file',
+                          {'project_id': 'fake'})
+        self._assert_stats(hits=0, misses=0)
+
+    def test_set_rules_discards_decisions(self):
+        action = 'example:my_file'
+        target = {'project_id': 'fake'}
+        rules.enforce(self.credentials, action, target)
+        self.rules[action] = [["false:false"]]
+        rules._ENFORCER.set_rules(common_policy.Rules.from_dict(self.rules))
+        self.assertRaises(exception.ForbiddenAction, rules.enforce,
+                          self.credentials, action, target)
+        self._assert_stats(hits=0, misses=2)
+        self.assertEqual(1, rules.decision_cache_stats()['entries'])
+
+
 class PolicyJsonTestCase(unit.TestCase):
 
     def _load_entries(self, filename):
@@ -15,12 +15,15 @@ import datetime
 import uuid
 
 import mock
+from oslo_serialization import msgpackutils
 from oslo_utils import timeutils
 from six.moves import range
 
+from keystone.common.cache import _context_cache
 from keystone.common import utils
 from keystone import exception
 from keystone.models import revoke_model
+from keystone import revoke
 from keystone.tests import unit
 from keystone.tests.unit import test_backend_sql
 from keystone.token import provider
@@ -161,6 +164,41 @@ class RevokeTests(object):
                           self.revoke_api.check_token,
                           token_values)
 
+    def test_check_token_sees_new_events(self):
+        token_values = _sample_blank_token()
+        token_values['user_id'] = _new_id()
+        self.revoke_api.revoke_by_user(user_id=_new_id())
+        self.revoke_api.check_token(token_values)
+
+        self.revoke_api.revoke_by_user(user_id=token_values['user_id'])
+        self.assertRaises(exception.TokenNotFound,
+                          self.revoke_api.check_token,
+                          token_values)
+
+    def test_revoke_fetches_only_new_events(self):
+        token_values = _sample_blank_token()
+        self.revoke_api.revoke_by_user(user_id=_new_id())
+        self.revoke_api.check_token(token_values)
+
+        self.revoke_api.revoke_by_user(user_id=_new_id())
+        with mock.patch.object(self.revoke_api.driver, 'list_events',
+                               return_value=[]) as list_events:
+            self.revoke_api.check_token(token_values)
+            self.revoke_api.check_token(token_values)
+        list_events.assert_called_once_with(mock.ANY)
+        self.assertIsNotNone(list_events.call_args[0][0])
+
+    def test_new_generation_reloads_all_events(self):
+        token_values = _sample_blank_token()
+        self.revoke_api.revoke_by_user(user_id=_new_id())
+        self.revoke_api.check_token(token_values)
+
+        revoke.REVOKE_REGION.delete(revoke.REVOKE_STATE_KEY)
+        with mock.patch.object(self.revoke_api.driver, 'list_events',
+                               return_value=[]) as list_events:
+            self.revoke_api.check_token(token_values)
+        list_events.assert_called_once_with()
+
 
 class SqlRevokeTests(test_backend_sql.SqlTests, RevokeTests):
     def config_overrides(self):
@@ -230,12 +268,20 @@ class RevokeListTests(unit.TestCase):
 
     def _assertTokenRevoked(self, token_data):
         self.assertTrue(any([_matches(e, token_data) for e in self.events]))
+        self.assertTrue(
+            revoke_model.RevokeIndex(self.revoke_events).is_revoked(
+                token_data),
+            'Token should be revoked by the index')
         return self.assertTrue(
             revoke_model.is_revoked(self.revoke_events, token_data),
             'Token should be revoked')
 
     def _assertTokenNotRevoked(self, token_data):
         self.assertFalse(any([_matches(e, token_data) for e in self.events]))
+        self.assertFalse(
+            revoke_model.RevokeIndex(self.revoke_events).is_revoked(
+                token_data),
+            'Token should not be revoked by the index')
         return self.assertFalse(
             revoke_model.is_revoked(self.revoke_events, token_data),
             'Token should not be revoked')
@@ -510,3 +556,123 @@ class RevokeListTests(unit.TestCase):
         for event in self.events:
             remove_event(self.revoke_events, event)
         self._assertEmpty(self.revoke_events)
+
+
+class RevokeIndexTests(unit.TestCase):
+    def test_duplicate_events_are_ignored(self):
+        event = revoke_model.RevokeEvent(user_id=_new_id())
+        index = revoke_model.RevokeIndex([event])
+        self.assertEqual(0, index.add_events([event]))
+        self.assertEqual(1, len(index))
+
+    def test_last_fetch_is_most_recent_revoked_at(self):
+        now = timeutils.utcnow()
+        earlier = now - datetime.timedelta(seconds=10)
+        index = revoke_model.RevokeIndex()
+        self.assertIsNone(index.last_fetch)
+        index.add_events([
+            revoke_model.RevokeEvent(user_id=_new_id(), revoked_at=now),
+            revoke_model.RevokeEvent(user_id=_new_id(), revoked_at=earlier),
+        ])
+        self.assertEqual(now, index.last_fetch)
+
+    def test_unindexed_events_are_checked(self):
+        expires_at = timeutils.normalize_time(_future_time()).replace(
+            microsecond=0)
+        index = revoke_model.RevokeIndex(
+            [revoke_model.RevokeEvent(expires_at=expires_at)])
+        token_data = _sample_blank_token()
+        token_data['expires_at'] = expires_at
+        self.assertTrue(index.is_revoked(token_data))
+        token_data['expires_at'] = _past_time()
+        self.assertFalse(index.is_revoked(token_data))
+
+    def test_remove_events_before(self):
+        now = timeutils.utcnow()
+        old_event = revoke_model.RevokeEvent(
+            user_id=_new_id(), revoked_at=now - datetime.timedelta(hours=2))
+        new_event = revoke_model.RevokeEvent(user_id=_new_id(),
+                                             revoked_at=now)
+        index = revoke_model.RevokeIndex([old_event, new_event])
+        self.assertEqual(
+            1, index.remove_events_before(now - datetime.timedelta(hours=1)))
+        self.assertEqual(1, len(index))
+
+        token_data = _sample_blank_token()
+        token_data['issued_at'] = now - datetime.timedelta(hours=3)
+        token_data['user_id'] = old_event.user_id
+        self.assertFalse(index.is_revoked(token_data))
+        token_data['user_id'] = new_event.user_id
+        self.assertTrue(index.is_revoked(token_data))
+
+        # Once removed, an event can be added again.
+        self.assertEqual(1, index.add_events([old_event]))
+
+    def test_matches_brute_force(self):
+        user_ids = [_new_id() for _ in range(5)]
+        project_ids = [_new_id() for _ in range(5)]
+        role_ids = [_new_id() for _ in range(5)]
+        events = []
+        for user_id, project_id, role_id in zip(user_ids, project_ids,
+                                                role_ids):
+            events.append(revoke_model.RevokeEvent(user_id=user_id,
+                                                   project_id=project_id,
+                                                   role_id=role_id))
+        index = revoke_model.RevokeIndex(events)
+
+        for user_id in user_ids:
+            for project_id in project_ids:
+                for role_id in role_ids:
+                    token_data = _sample_blank_token()
+                    token_data['user_id'] = user_id
+                    token_data['project_id'] = project_id
+                    token_data['roles'] = [role_id]
+                    self.assertEqual(
+                        revoke_model.is_revoked(events, token_data),
+                        index.is_revoked(token_data))
+
+
+class RevokeEventTests(unit.TestCase):
+    def test_mask(self):
+        event = revoke_model.RevokeEvent(user_id=_new_id(),
+                                         project_id=_new_id())
+        self.assertEqual(
+            revoke_model._MATCH_BITS['user_id'] |
+            revoke_model._MATCH_BITS['project_id'],
+            event.mask)
+
+    def test_timestamps(self):
+        revoked_at = timeutils.utcnow()
+        event = revoke_model.RevokeEvent(revoked_at=revoked_at,
+                                         expires_at=_future_time())
+        self.assertEqual(revoked_at, event.revoked_at)
+        self.assertEqual(revoked_at, event.issued_before)
+        self.assertEqual(0, event.expires_at.microsecond)
+
+    def test_tuple_round_trip(self):
+        event = revoke_model.RevokeEvent(domain_id=_new_id(),
+                                         expires_at=_future_time(),
+                                         user_id=_new_id())
+        rebuilt = revoke_model.RevokeEvent.from_tuple(event.to_tuple())
+        self.assertEqual(event.to_tuple(), rebuilt.to_tuple())
+        self.assertEqual(event.to_dict(), rebuilt.to_dict())
+        self.assertEqual(event.mask, rebuilt.mask)
+
+    def test_serialization(self):
+        registry = _context_cache._registry
+        event = revoke_model.RevokeEvent(project_id=_new_id(),
+                                         role_id=_new_id())
+        rebuilt = msgpackutils.loads(
+            msgpackutils.dumps(event, registry=registry), registry=registry)
+        self.assertEqual(event.to_tuple(), rebuilt.to_tuple())
+
+    def test_deserialize_legacy_dict(self):
+        registry = _context_cache._registry
+        revoked_at = timeutils.utcnow()
+        data = msgpackutils.dumps({'user_id': 'user', 'revoked_at': revoked_at,
+                                   'issued_before': revoked_at},
+                                  registry=registry)
+        handler = revoke_model._RevokeEventHandler(registry)
+        event = handler.deserialize(data)
+        self.assertEqual('user', event.user_id)
+        self.assertEqual(revoked_at, event.revoked_at)
@@ -31,6 +31,7 @@ WARNING::
     all data will be lost.
 """
 
+import datetime
 import json
 import uuid
 
@@ -1524,6 +1525,18 @@ class SqlExpandSchemaUpgradeTests(SqlMigrateBase):
             self.repos[EXPAND_REPO].min_version,
             self.repos[EXPAND_REPO].version)
 
+    def test_token_scope_columns(self):
+        self.expand(2)
+        self.assertTableColumns('token',
+                                ['id', 'expires', 'extra', 'valid',
+                                 'trust_id', 'user_id', 'tenant_id',
+                                 'consumer_id'])
+        table = sqlalchemy.Table('token', self.metadata, autoload=True)
+        index_data = [(idx.name, list(idx.columns.keys()))
+                      for idx in table.indexes]
+        self.assertIn(('ix_token_tenant_id', ['tenant_id']), index_data)
+        self.assertIn(('ix_token_consumer_id', ['consumer_id']), index_data)
+
 
 class MySQLOpportunisticExpandSchemaUpgradeTestCase(
         SqlExpandSchemaUpgradeTests):
@@ -1549,6 +1562,35 @@ class SqlDataMigrationUpgradeTests(SqlMigrateBase):
             self.repos[DATA_MIGRATION_REPO].min_version,
             self.repos[DATA_MIGRATION_REPO].version)
 
+    def test_token_scope_columns_are_populated(self):
+        tenant_id = uuid.uuid4().hex
+        consumer_id = uuid.uuid4().hex
+        expires = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        extras = {
+            'project': {'tenant': {'id': tenant_id}},
+            'consumer': {'token_data': {'token': {
+                'OS-OAUTH1': {'consumer_id': consumer_id}}}},
+            'unscoped': {'tenant': None},
+        }
+        session = self.sessionmaker()
+        for token_id, extra in extras.items():
+            self.insert_dict(session, 'token',
+                             {'id': token_id,
+                              'expires': expires,
+                              'extra': json.dumps(extra),
+                              'valid': True,
+                              'user_id': uuid.uuid4().hex})
+        session.commit()
+
+        self.migrate(2)
+
+        table = sqlalchemy.Table('token', self.metadata, autoload=True)
+        rows = {row.id: (row.tenant_id, row.consumer_id)
+                for row in session.execute(sqlalchemy.select([table]))}
+        self.assertEqual({'project': (tenant_id, None),
+                          'consumer': (None, consumer_id),
+                          'unscoped': (None, None)}, rows)
+
 
 class MySQLOpportunisticDataMigrationUpgradeTestCase(
         SqlDataMigrationUpgradeTests):
@@ -3176,6 +3176,30 @@ class SAMLGenerationTests(test_v3.RestfulTestCase):
         cert_text = cert_text.replace(os.linesep, '')
         self.assertEqual(idp_public_key, cert_text)
 
+    @mock.patch.object(keystone_idp, '_signer', (None, None))
+    def test_saml_signing_in_process(self):
+        """Test the SAML generator signs assertions in process."""
+        if not keystone_idp.xmlsec:
+            self.skipTest('xmlsec is not installed')
+        self.config_fixture.config(group='saml', signer='python-xmlsec')
+
+        generator = keystone_idp.SAMLGenerator()
+        with mock.patch.object(subprocess, 'check_output') as check_output:
+            response = generator.samlize_token(
+                self.ISSUER, self.RECIPIENT, self.SUBJECT,
+                self.SUBJECT_DOMAIN, self.ROLES, self.PROJECT,
+                self.PROJECT_DOMAIN)
+        self.assertFalse(check_output.called)
+
+        signature = response.assertion.signature
+        self.assertIsInstance(signature, xmldsig.Signature)
+        self.assertTrue(signature.signature_value.text.strip())
+
+        idp_public_key = sigver.read_cert_from_file(CONF.saml.certfile, 'pem')
+        cert_text = signature.key_info.x509_data[0].x509_certificate.text
+        cert_text = cert_text.replace(os.linesep, '')
+        self.assertEqual(idp_public_key, cert_text)
+
     def _create_generate_saml_request(self, token_id, sp_id):
         return {
             "auth": {
@@ -3441,6 +3465,43 @@ class SAMLGenerationTests(test_v3.RestfulTestCase):
             'Error when signing assertion, reason: %s\n' % exception_msg)
         self.assertEqual(expected_log, logger_fixture.output)
 
+    @mock.patch.object(keystone_idp, '_signer', (None, None))
+    @mock.patch('saml2.create_class_from_xml_string')
+    @mock.patch.object(keystone_idp, 'etree')
+    @mock.patch.object(keystone_idp, 'xmlsec')
+    def test__sign_assertion_in_process_loads_key_once(
+            self, xmlsec_mock, etree_mock, create_class_mock):
+        self.config_fixture.config(group='saml', signer='python-xmlsec')
+        etree_mock.tostring.return_value = 'fakeoutput'
+
+        with mock.patch.object(subprocess, 'check_output') as check_output:
+            keystone_idp._sign_assertion(self.signed_assertion)
+            keystone_idp._sign_assertion(self.signed_assertion)
+        self.assertFalse(check_output.called)
+
+        xmlsec_mock.Key.from_file.assert_called_once_with(
+            CONF.saml.keyfile, xmlsec_mock.KeyFormat.PEM)
+        self.assertEqual(2, xmlsec_mock.SignatureContext().sign.call_count)
+        create_class_mock.assert_called_with(saml.Assertion, 'fakeoutput')
+
+    @mock.patch.object(keystone_idp, '_signer', (None, None))
+    @mock.patch('saml2.create_class_from_xml_string')
+    @mock.patch('oslo_utils.fileutils.write_to_tempfile')
+    @mock.patch.object(subprocess, 'check_output')
+    @mock.patch.object(keystone_idp, 'xmlsec', None)
+    def test__sign_assertion_in_process_falls_back_to_xmlsec1(
+            self, check_output_mock, write_to_tempfile_mock,
+            create_class_mock):
+        self.config_fixture.config(group='saml', signer='python-xmlsec')
+        write_to_tempfile_mock.return_value = 'tmp_path'
+        check_output_mock.return_value = 'fakeoutput'
+
+        keystone_idp._sign_assertion(self.signed_assertion)
+
+        self.assertEqual(CONF.saml.xmlsec1_binary,
+                         check_output_mock.call_args[0][0][0])
+        create_class_mock.assert_called_with(saml.Assertion, 'fakeoutput')
+
 
 class IdPMetadataGenerationTests(test_v3.RestfulTestCase):
     """A class for testing Identity Provider Metadata generation."""
@@ -16,7 +16,9 @@
 import datetime
 
 import freezegun
+import mock
 from oslo_serialization import jsonutils
+from six.moves import http_client
 from six.moves import range
 
 import keystone.conf
@@ -428,6 +430,79 @@ class IdentityTestListLimitCase(IdentityTestFilteredCase):
         """
         self._test_entity_list_limit('policy', 'policy')
 
+    def _test_entity_list_pages(self, plural):
+        """GET /<entities>?limit=<n>&marker=<id> (paginated).
+
+        Test Plan:
+
+        - Update policy for no protection on api
+        - Walk the entities in pages of 4 by following the next links
+        - Check that the pages list every entity once, in the order of their
+          IDs, and that the last page has no next link
+
+        """
+        self._set_policy({"identity:list_%s" % plural: []})
+        r = self.get('/%s' % plural, auth=self.auth)
+        expected_ids = sorted(ref['id'] for ref in r.result.get(plural))
+
+        ids = []
+        url = '/%s?limit=4' % plural
+        while url:
+            r = self.get(url, auth=self.auth)
+            refs = r.result.get(plural)
+            self.assertLessEqual(len(refs), 4)
+            ids.extend(ref['id'] for ref in refs)
+            url = r.result['links']['next']
+            if url:
+                self.assertIs(r.result.get('truncated'), True)
+                self.assertIn('marker=%s' % refs[-1]['id'], url)
+                url = url.split('/v3', 1)[1]
+        self.assertEqual(expected_ids, ids)
+
+    def test_users_list_pages(self):
+        self._test_entity_list_pages('users')
+
+    def test_projects_list_pages(self):
+        self._test_entity_list_pages('projects')
+
+    def test_non_driver_list_pages(self):
+        """Check lists can be paginated without driver level support."""
+        self._test_entity_list_pages('policies')
+
+    def test_list_pages_are_bounded_by_list_limit(self):
+        self._set_policy({"identity:list_services": []})
+        self.config_fixture.config(group='catalog', list_limit=3)
+        r = self.get('/services?limit=5', auth=self.auth)
+        self.assertEqual(3, len(r.result.get('services')))
+        self.assertIsNotNone(r.result['links']['next'])
+
+    def test_invalid_page_limit(self):
+        self._set_policy({"identity:list_users": []})
+        self.get('/users?limit=0', auth=self.auth,
+                 expected_status=http_client.BAD_REQUEST)
+        self.get('/users?limit=many', auth=self.auth,
+                 expected_status=http_client.BAD_REQUEST)
+
+    def test_list_truncated_out_of_order_has_no_next_link(self):
+        self._set_policy({"identity:list_users": []})
+        driver = self.identity_api.driver
+        list_users = driver.list_users
+
+        def list_users_in_directory_order(hints):
+            # Like an LDAP search cut short by the directory's sizelimit.
+            refs = list_users(hints)
+            hints.limit['ordered'] = False
+            return refs
+
+        with mock.patch.object(driver, 'list_users',
+                               side_effect=list_users_in_directory_order):
+            r = self.get('/users?limit=4', auth=self.auth)
+        self.assertEqual(4, len(r.result.get('users')))
+        self.assertIs(r.result.get('truncated'), True)
+        self.assertIsNone(r.result['links']['next'])
+        self.get('/users?limit=many', auth=self.auth,
+                 expected_status=http_client.BAD_REQUEST)
+
     def test_no_limit(self):
         """Check truncated attribute not set when list not limited."""
         self._set_policy({"identity:list_services": []})
@@ -18,6 +18,7 @@ import gettext
 import os
 import uuid
 
+import fixtures
 import mock
 import oslo_i18n
 from oslo_serialization import jsonutils
@@ -105,6 +106,25 @@ class ApplicationTest(BaseWSGITest):
         self.assertEqual('X-Auth-Token', resp.headers.get('Vary'))
         self.assertEqual(str(len(body)), resp.headers.get('Content-Length'))
 
+    def test_render_response_streams_large_collections(self):
+        self.useFixture(fixtures.MockPatchObject(
+            wsgi, 'STREAMED_COLLECTION_SIZE', 2))
+        data = {'entities': [{'id': uuid.uuid4().hex} for _ in range(5)],
+                'links': {'next': None}}
+
+        resp = wsgi.render_response(body=data)
+        self.assertEqual(http_client.OK, resp.status_int)
+        self.assertEqual('application/json', resp.headers['Content-Type'])
+        # The attributes, three chunks of members and the closing brackets.
+        chunks = list(resp.app_iter)
+        self.assertEqual(5, len(chunks))
+        self.assertEqual(data, jsonutils.loads(b''.join(chunks)))
+
+        resp = wsgi.render_response(body=data, method='HEAD')
+        self.assertEqual(b'', resp.body)
+        self.assertEqual(str(len(jsonutils.dump_as_bytes(data))),
+                         resp.headers.get('Content-Length'))
+
     def test_render_response_custom_status(self):
         resp = wsgi.render_response(
             status=(http_client.NOT_IMPLEMENTED,
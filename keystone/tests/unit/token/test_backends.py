@@ -170,6 +170,36 @@ class TokenTests(object):
                           token_id1)
         self.token_provider_api._persistence.get_token(token_id2)
 
+    def test_delete_tokens_in_bulk(self):
+        persistence = self.token_provider_api._persistence
+        user1 = uuid.uuid4().hex
+        user2 = uuid.uuid4().hex
+        user3 = uuid.uuid4().hex
+        tenant1 = uuid.uuid4().hex
+        tenant2 = uuid.uuid4().hex
+        trust_id = uuid.uuid4().hex
+        deleted = [
+            self.create_token_sample_data(user_id=user1, tenant_id=tenant1)[0],
+            self.create_token_sample_data(user_id=user2, tenant_id=tenant1)[0],
+            self.create_token_sample_data(user_id=user3, tenant_id=tenant1,
+                                          trust_id=trust_id)[0],
+        ]
+        kept = [
+            self.create_token_sample_data(user_id=user1, tenant_id=tenant2)[0],
+            self.create_token_sample_data(user_id=user2)[0],
+            self.create_token_sample_data(user_id=user3, tenant_id=tenant1)[0],
+        ]
+
+        token_list = persistence.delete_tokens_in_bulk(
+            [user1, user2], project_ids=[tenant1], trusts={trust_id: user3})
+
+        self.assertItemsEqual(deleted, token_list)
+        for token_id in deleted:
+            self.assertRaises(exception.TokenNotFound,
+                              persistence.get_token, token_id)
+        for token_id in kept:
+            persistence.get_token(token_id)
+
     def _test_token_list(self, token_list_fn):
         tokens = token_list_fn('testuserid')
         self.assertEqual(0, len(tokens))
@@ -14,8 +14,11 @@ import base64
 import datetime
 import hashlib
 import os
+import time
 import uuid
 
+from cryptography import fernet as crypto_fernet
+import mock
 import msgpack
 from oslo_utils import timeutils
 from six.moves import urllib
@@ -217,6 +220,106 @@ class TestValidate(unit.TestCase):
         }
         self.assertEqual(exp_trust_info, token['OS-TRUST:trust'])
 
+    def _create_project_scoped_user(self):
+        domain_ref = unit.new_domain_ref()
+        domain_ref = self.resource_api.create_domain(domain_ref['id'],
+                                                     domain_ref)
+        user_ref = unit.new_user_ref(domain_ref['id'])
+        user_ref = self.identity_api.create_user(user_ref)
+        project_ref = unit.new_project_ref(domain_id=domain_ref['id'])
+        project_ref = self.resource_api.create_project(project_ref['id'],
+                                                       project_ref)
+        role_ref = unit.new_role_ref()
+        role_ref = self.role_api.create_role(role_ref['id'], role_ref)
+        self.assignment_api.create_grant(role_ref['id'],
+                                         user_id=user_ref['id'],
+                                         project_id=project_ref['id'])
+        return user_ref, project_ref
+
+    @unit.skip_if_cache_disabled('token')
+    def test_validate_v3_token_reuses_token_data(self):
+        # Tokens of the same user and scope share their user, scope and roles.
+        user_ref, project_ref = self._create_project_scoped_user()
+        token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        token = self.token_provider_api.validate_v3_token(token_id)['token']
+
+        other_token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        helper = self.token_provider_api.driver.v3_token_data_helper
+        with mock.patch.object(helper, 'get_token_data',
+                               wraps=helper.get_token_data) as get_token_data:
+            other_token = self.token_provider_api.validate_v3_token(
+                other_token_id)['token']
+        # Only the token itself is built, not the parts it shares.
+        self.assertEqual(1, get_token_data.call_count)
+        for key in ('user', 'project', 'roles', 'catalog'):
+            self.assertEqual(token[key], other_token[key])
+        self.assertNotEqual(token['audit_ids'], other_token['audit_ids'])
+
+    @unit.skip_if_cache_disabled('token')
+    def test_validate_v3_token_after_role_assignment(self):
+        # Granting a role rebuilds the token data shared by tokens.
+        user_ref, project_ref = self._create_project_scoped_user()
+        token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        token = self.token_provider_api.validate_v3_token(token_id)['token']
+        self.assertEqual(1, len(token['roles']))
+
+        role_ref = unit.new_role_ref()
+        role_ref = self.role_api.create_role(role_ref['id'], role_ref)
+        self.assignment_api.create_grant(role_ref['id'],
+                                         user_id=user_ref['id'],
+                                         project_id=project_ref['id'])
+
+        token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        token = self.token_provider_api.validate_v3_token(token_id)['token']
+        self.assertIn(role_ref['id'], [role['id'] for role in token['roles']])
+
+    def _assert_new_token_has_role(self, user_ref, project_ref, role_ref):
+        token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        token = self.token_provider_api.validate_v3_token(token_id)['token']
+        self.assertIn(role_ref['id'], [role['id'] for role in token['roles']])
+
+    @unit.skip_if_cache_disabled('token')
+    def test_validate_v3_token_after_group_membership(self):
+        # Adding the user to a group with a role rebuilds the token data
+        # shared by tokens.
+        user_ref, project_ref = self._create_project_scoped_user()
+        token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        self.token_provider_api.validate_v3_token(token_id)
+
+        group_ref = unit.new_group_ref(domain_id=user_ref['domain_id'])
+        group_ref = self.identity_api.create_group(group_ref)
+        role_ref = unit.new_role_ref()
+        role_ref = self.role_api.create_role(role_ref['id'], role_ref)
+        self.assignment_api.create_grant(role_ref['id'],
+                                         group_id=group_ref['id'],
+                                         project_id=project_ref['id'])
+        self.token_provider_api.validate_v3_token(token_id)
+        self.identity_api.add_user_to_group(user_ref['id'], group_ref['id'])
+
+        self._assert_new_token_has_role(user_ref, project_ref, role_ref)
+
+    @unit.skip_if_cache_disabled('token')
+    def test_validate_v3_token_after_implied_role(self):
+        # Implying a role from a granted one rebuilds the token data shared
+        # by tokens.
+        user_ref, project_ref = self._create_project_scoped_user()
+        token_id, token_data_ = self.token_provider_api.issue_v3_token(
+            user_ref['id'], ['password'], project_id=project_ref['id'])
+        token = self.token_provider_api.validate_v3_token(token_id)['token']
+
+        role_ref = unit.new_role_ref()
+        role_ref = self.role_api.create_role(role_ref['id'], role_ref)
+        self.role_api.create_implied_role(token['roles'][0]['id'],
+                                          role_ref['id'])
+
+        self._assert_new_token_has_role(user_ref, project_ref, role_ref)
+
     def test_validate_v3_token_validation_error_exc(self):
         # When the token format isn't recognized, TokenNotFound is raised.
 
@@ -296,6 +399,58 @@ class TestTokenFormatter(unit.TestCase):
         self.assertEqual(first_value, returned_payload[0].decode('utf-8'))
         self.assertEqual(second_value, returned_payload[1].decode('utf-8'))
 
+    def test_key_id_hint(self):
+        self.config_fixture.config(group='fernet_tokens', key_id_hint=True)
+        tf = token_formatters.TokenFormatter()
+        payload = msgpack.packb((uuid.uuid4().hex,))
+
+        token = tf.pack(payload)
+        token_bytes = base64.urlsafe_b64decode(
+            tf.restore_padding(token).encode('utf-8'))
+        primary_key = tf.key_ring.keys[0]
+        self.assertEqual(token_formatters.KEY_ID_HINT_MARKER +
+                         fernet_utils.key_id(primary_key),
+                         token_bytes[:token_formatters.KEY_ID_HINT_LENGTH])
+        self.assertEqual(payload, tf.unpack(token))
+
+        # Tokens without the hint are still valid.
+        self.config_fixture.config(group='fernet_tokens', key_id_hint=False)
+        self.assertEqual(payload, tf.unpack(token))
+        self.assertEqual(payload, tf.unpack(tf.pack(payload)))
+
+    def test_key_id_hint_after_rotation(self):
+        self.config_fixture.config(group='fernet_tokens', key_id_hint=True)
+        tf = token_formatters.TokenFormatter()
+        payload = msgpack.packb((uuid.uuid4().hex,))
+        token = tf.pack(payload)
+
+        key_utils = fernet_utils.FernetUtils(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        )
+        key_utils.rotate_keys()
+        self.assertEqual(payload, tf.unpack(token))
+
+    def test_key_id_hint_unknown_key(self):
+        tf = token_formatters.TokenFormatter()
+        key = crypto_fernet.Fernet.generate_key()
+        token = crypto_fernet.Fernet(key).encrypt(b'x')
+        token_bytes = base64.urlsafe_b64decode(token)
+        hinted_token = base64.urlsafe_b64encode(
+            token_formatters.KEY_ID_HINT_MARKER + b'\x00' * 4 + token_bytes)
+        self.assertRaises(exception.ValidationError,
+                          tf.unpack, hinted_token.decode('utf-8'))
+
+    def test_creation_time_with_key_id_hint(self):
+        tf = token_formatters.TokenFormatter()
+        payload = msgpack.packb((uuid.uuid4().hex,))
+        token = tf.pack(payload)
+        self.config_fixture.config(group='fernet_tokens', key_id_hint=True)
+        hinted_token = tf.pack(payload)
+        self.assertNotEqual(token, hinted_token)
+        delta = tf.creation_time(hinted_token) - tf.creation_time(token)
+        self.assertLessEqual(abs(delta.total_seconds()), 1)
+
 
 class TestPayloads(unit.TestCase):
     def assertTimestampsEqual(self, expected, actual):
@@ -666,3 +821,90 @@ class TestLoadKeys(unit.TestCase):
         keys = key_utils.load_keys()
         self.assertEqual(2, len(keys))
         self.assertTrue(len(keys[0]))
+
+
+class TestFernetKeyRing(unit.TestCase):
+    def setUp(self):
+        super(TestFernetKeyRing, self).setUp()
+        self.useFixture(
+            ksfixtures.KeyRepository(
+                self.config_fixture,
+                'fernet_tokens',
+                CONF.fernet_tokens.max_active_keys
+            )
+        )
+        # Backdate the repository so that its timestamp is trusted by the key
+        # ring straight away.
+        self._age_key_repository()
+        self.key_ring = fernet_utils.FernetKeyRing(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        )
+
+    def _age_key_repository(self):
+        past = time.time() - 60
+        os.utime(CONF.fernet_tokens.key_repository, (past, past))
+
+    def _rotate_keys(self):
+        key_utils = fernet_utils.FernetUtils(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        )
+        key_utils.rotate_keys()
+
+    def test_keys_are_loaded_once(self):
+        key_utils = fernet_utils.FernetUtils(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        )
+        self.assertEqual(key_utils.load_keys(), self.key_ring.keys)
+        self.assertEqual(key_utils.load_keys(), self.key_ring.keys)
+        self.key_ring.crypto
+        self.assertEqual(1, self.key_ring.reloads)
+        self.assertEqual(2, self.key_ring.hits)
+
+    def test_crypto_is_reused(self):
+        self.assertIs(self.key_ring.crypto, self.key_ring.crypto)
+
+    def test_rotation_reloads_keys(self):
+        old_keys = self.key_ring.keys
+        self._rotate_keys()
+        new_keys = self.key_ring.keys
+        self.assertEqual(2, self.key_ring.reloads)
+        self.assertNotEqual(old_keys, new_keys)
+        self.assertIn(old_keys[0], new_keys)
+
+    def test_recent_changes_are_not_trusted(self):
+        self._rotate_keys()
+        self.key_ring.keys
+        self.key_ring.keys
+        self.assertEqual(2, self.key_ring.reloads)
+        self.assertEqual(0, self.key_ring.hits)
+
+    def test_check_interval_defers_reload(self):
+        self.key_ring.check_interval = 3600
+        old_keys = self.key_ring.keys
+        self._rotate_keys()
+        self.assertEqual(old_keys, self.key_ring.keys)
+        self.assertEqual(1, self.key_ring.reloads)
+
+    def test_missing_key_repository(self):
+        self.config_fixture.config(group='fernet_tokens',
+                                   key_repository=uuid.uuid4().hex)
+        key_ring = fernet_utils.FernetKeyRing(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        )
+        self.assertEqual([], key_ring.keys)
+        self.assertIsNone(key_ring.crypto)
+        self.assertEqual(2, key_ring.reloads)
+
+    def test_get_key_ring_is_shared(self):
+        key_ring = fernet_utils.get_key_ring(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        )
+        self.assertIs(key_ring, fernet_utils.get_key_ring(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys
+        ))
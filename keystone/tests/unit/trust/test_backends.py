@@ -110,6 +110,17 @@ class TrustTests(object):
         trusts = self.trust_api.list_trusts_for_trustor(self.trustee['id'])
         self.assertEqual(0, len(trusts))
 
+    def test_list_trusts_for_users(self):
+        trust_ids = [self.create_sample_trust(uuid.uuid4().hex)['id']
+                     for i in range(3)]
+        for user_ids in ([self.trustee['id']], [self.trustor['id']],
+                         [self.trustee['id'], self.trustor['id']]):
+            trusts = self.trust_api.list_trusts_for_users(user_ids)
+            self.assertItemsEqual(trust_ids,
+                                  [trust['id'] for trust in trusts])
+        self.assertEqual(
+            [], self.trust_api.list_trusts_for_users([uuid.uuid4().hex]))
+
     def test_list_trusts(self):
         for i in range(3):
             self.create_sample_trust(uuid.uuid4().hex)
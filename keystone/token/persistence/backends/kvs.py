@@ -15,6 +15,7 @@
 
 from __future__ import absolute_import
 import copy
+import datetime
 import threading
 
 from oslo_log import log
@@ -35,6 +36,25 @@ LOG = log.getLogger(__name__)
 
 STORE_CONF_LOCK = threading.Lock()
 
+# The index of the tokens of a user is split into shards, each holding the
+# tokens that expire within the same hour.
+SHARD_DURATION = datetime.timedelta(hours=1)
+SHARD_NAME_FORMAT = '%Y%m%d%H'
+
+
+def _shard_start(expires):
+    """Return the start of the index shard of a token expiring at expires."""
+    return expires.replace(minute=0, second=0, microsecond=0)
+
+
+def _shard_name(shard_start):
+    """Return the name of a shard, which sorts like its start."""
+    return shard_start.strftime(SHARD_NAME_FORMAT)
+
+
+def _parse_shard_name(shard_name):
+    return datetime.datetime.strptime(shard_name, SHARD_NAME_FORMAT)
+
 
 class Token(token.persistence.TokenDriverV8):
     """KeyValueStore backend for tokens.
@@ -76,6 +96,16 @@ class Token(token.persistence.TokenDriverV8):
             user_id = user_id.encode('utf-8')
         return 'usertokens-%s' % user_id
 
+    def _prefix_user_shard(self, user_id, shard_start):
+        if six.PY2:
+            user_id = user_id.encode('utf-8')
+        return 'usertokenshard-%s-%s' % (_shard_name(shard_start), user_id)
+
+    def _prefix_user_shards(self, user_id):
+        if six.PY2:
+            user_id = user_id.encode('utf-8')
+        return 'usertokenshards-%s' % user_id
+
     def _get_key_or_default(self, key, default=None):
         try:
             return self._store.get(key)
@@ -113,16 +143,11 @@ class Token(token.persistence.TokenDriverV8):
         if not data_copy.get('user_id'):
             data_copy['user_id'] = data_copy['user']['id']
 
-        # NOTE(morganfainberg): for ease of manipulating the data without
-        # concern about the backend, always store the value(s) in the
-        # index as the isotime (string) version so this is where the string is
-        # built.
-        expires_str = utils.isotime(data_copy['expires'], subsecond=True)
+        expires = timeutils.normalize_time(data_copy['expires'])
 
         self._set_key(ptk, data_copy)
         user_id = data['user']['id']
-        user_key = self._prefix_user_id(user_id)
-        self._update_user_token_list(user_key, token_id, expires_str)
+        self._update_user_token_list(user_id, token_id, expires)
         if CONF.trust.enabled and data.get('trust_id'):
             # NOTE(morganfainberg): If trusts are enabled and this is a trust
             # scoped token, we add the token to the trustee list as well.  This
@@ -142,61 +167,143 @@ class Token(token.persistence.TokenDriverV8):
                     _('Unknown token version %s') %
                     data_copy.get('token_version'))
 
-            trustee_key = self._prefix_user_id(trustee_user_id)
-            self._update_user_token_list(trustee_key, token_id, expires_str)
+            self._update_user_token_list(trustee_user_id, token_id, expires)
 
         return data_copy
 
-    def _get_user_token_list_with_expiry(self, user_key):
+    def _get_window_shard_starts(self):
+        """Return the start of every shard tokens issued now may expire in.
+
+        Tokens are issued to expire at most `[token] expiration` seconds
+        later, so these are the shards between the current time and that
+        lifetime.
+        """
+        current_time = self._get_current_time()
+        last_expiry = current_time + datetime.timedelta(
+            seconds=CONF.token.expiration)
+        shard_start = _shard_start(current_time)
+        shard_starts = []
+        while shard_start <= last_expiry:
+            shard_starts.append(shard_start)
+            shard_start += SHARD_DURATION
+        return shard_starts
+
+    def _get_user_shard_starts(self, user_id):
+        """Return the start of every shard of a user that may hold live tokens.
+
+        The shards are read from the list kept of the shards of the user, so
+        that the tokens issued before `[token] expiration` was lowered are
+        still found. If that list is gone, for instance evicted by memcached,
+        the shards tokens issued now may expire in are read instead.
+        """
+        shard_names = self._get_key_or_default(
+            self._prefix_user_shards(user_id))
+        if shard_names is None:
+            return self._get_window_shard_starts()
+        current_shard_name = _shard_name(
+            _shard_start(self._get_current_time()))
+        return [_parse_shard_name(shard_name) for shard_name in shard_names
+                if shard_name >= current_shard_name]
+
+    def _get_user_token_list_with_expiry(self, user_id):
         """Return user token list with token expiry.
 
+        The shards of the user index are read in a single call, along with
+        the index of the tokens the user was issued by earlier releases,
+        which was kept in a single list.
+
         :return: the tuples in the format (token_id, token_expiry)
         :rtype: list
         """
-        return self._get_key_or_default(user_key, default=[])
-
-    def _get_user_token_list(self, user_key):
-        """Return a list of token_ids for the user_key."""
-        token_list = self._get_user_token_list_with_expiry(user_key)
+        token_list = list(self._get_key_or_default(
+            self._prefix_user_id(user_id), default=[]))
+        shard_keys = [self._prefix_user_shard(user_id, shard_start)
+                      for shard_start in self._get_user_shard_starts(user_id)]
+        if not shard_keys:
+            return token_list
+        try:
+            shards = self._store.get_multi(shard_keys)
+        except exception.NotFound:
+            # NOTE: A shard is missing, either because it has not been
+            # written yet or because the backend evicted it, so read the
+            # shards one by one.
+            shards = [self._get_key_or_default(shard_key, default=[])
+                      for shard_key in shard_keys]
+        for shard in shards:
+            token_list.extend(shard)
+        return token_list
+
+    def _get_user_token_list(self, user_id):
+        """Return a list of token_ids for the user."""
+        token_list = self._get_user_token_list_with_expiry(user_id)
         # Each element is a tuple of (token_id, token_expiry). Most code does
         # not care about the expiry, it is stripped out and only a
         # list of token_ids are returned.
         return [t[0] for t in token_list]
 
-    def _update_user_token_list(self, user_key, token_id, expires_isotime_str):
-        current_time = self._get_current_time()
-        revoked_token_list = set([t['id'] for t in
-                                  self.list_revoked_tokens()])
-
-        with self._store.get_lock(user_key) as lock:
-            filtered_list = []
-            token_list = self._get_user_token_list_with_expiry(user_key)
-            for item in token_list:
-                try:
-                    item_id, expires = self._format_token_index_item(item)
-                except (ValueError, TypeError):  # nosec(tkelsey)
-                    # NOTE(morganfainberg): Skip on expected errors
-                    # possibilities from the `_format_token_index_item` method.
-                    continue
-
-                if expires < current_time:
-                    LOG.debug(('Token `%(token_id)s` is expired, removing '
-                               'from `%(user_key)s`.'),
-                              {'token_id': item_id, 'user_key': user_key})
-                    continue
-
-                if item_id in revoked_token_list:
-                    # NOTE(morganfainberg): If the token has been revoked, it
-                    # can safely be removed from this list.  This helps to keep
-                    # the user_token_list as reasonably small as possible.
-                    LOG.debug(('Token `%(token_id)s` is revoked, removing '
-                               'from `%(user_key)s`.'),
-                              {'token_id': item_id, 'user_key': user_key})
-                    continue
-                filtered_list.append(item)
-            filtered_list.append((token_id, expires_isotime_str))
-            self._set_key(user_key, filtered_list, lock)
-            return filtered_list
+    def _update_user_token_list(self, user_id, token_id, expires):
+        """Add a token to the shard of the user index for its expiry hour.
+
+        Only that shard is locked and rewritten. Revoked tokens are left in
+        place, as listing the tokens of a user skips those that are gone, and
+        a shard is dropped whole once all of its tokens have expired.
+        """
+        shard_start = _shard_start(expires)
+        shard_key = self._prefix_user_shard(user_id, shard_start)
+        with self._store.get_lock(shard_key) as lock:
+            token_list = self._get_key_or_default(shard_key)
+            if token_list is None:
+                token_list = []
+                self._add_user_shard(user_id, shard_start)
+            # NOTE(morganfainberg): for ease of manipulating the data without
+            # concern about the backend, always store the value(s) in the
+            # index as the isotime (string) version so this is where the
+            # string is built.
+            token_list.append((token_id, utils.isotime(expires,
+                                                       subsecond=True)))
+            self._set_key(shard_key, token_list, lock)
+            return token_list
+
+    def _add_user_shard(self, user_id, shard_start):
+        """Add a new shard to the list of the shards of a user.
+
+        The shards that expired since are dropped at the same time.
+        """
+        # NOTE: A new shard is started about once an hour per user, so the
+        # list is rarely rewritten. Backends that expire keys by themselves,
+        # such as memcached, would drop the expired shards anyway.
+        shards_key = self._prefix_user_shards(user_id)
+        current_shard_name = _shard_name(
+            _shard_start(self._get_current_time()))
+        with self._store.get_lock(shards_key) as lock:
+            shard_names = self._get_key_or_default(shards_key)
+            if shard_names is None:
+                shard_names = self._find_user_shard_names(user_id)
+            expired_shard_keys = [
+                self._prefix_user_shard(user_id, _parse_shard_name(name))
+                for name in shard_names if name < current_shard_name]
+            if expired_shard_keys:
+                self._store.delete_multi(expired_shard_keys)
+            shard_names = set(name for name in shard_names
+                              if name >= current_shard_name)
+            shard_names.add(_shard_name(shard_start))
+            self._set_key(shards_key, sorted(shard_names), lock)
+
+    def _find_user_shard_names(self, user_id):
+        """Return the names of the shards of a user found in the store.
+
+        This is used when the list of the shards of the user is missing. The
+        shards tokens issued now may expire in are looked up, and as many
+        shards before them are dropped.
+        """
+        shard_starts = self._get_window_shard_starts()
+        self._store.delete_multi([
+            self._prefix_user_shard(user_id,
+                                    shard_starts[0] - i * SHARD_DURATION)
+            for i in range(1, len(shard_starts) + 1)])
+        return [_shard_name(shard_start) for shard_start in shard_starts
+                if self._get_key_or_default(self._prefix_user_shard(
+                    user_id, shard_start)) is not None]
 
     def _get_current_time(self):
         return timeutils.normalize_time(timeutils.utcnow())
@@ -332,8 +439,7 @@ class Token(token.persistence.TokenDriverV8):
         if not CONF.token.revoke_by_id:
             return []
         tokens = []
-        user_key = self._prefix_user_id(user_id)
-        token_list = self._get_user_token_list_with_expiry(user_key)
+        token_list = self._get_user_token_list_with_expiry(user_id)
         current_time = self._get_current_time()
         for item in token_list:
             try:
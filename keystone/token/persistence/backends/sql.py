@@ -14,9 +14,13 @@
 
 import copy
 import functools
+import itertools
 
 from oslo_log import log
 from oslo_utils import timeutils
+from six.moves import range
+import sqlalchemy
+from sqlalchemy.sql import true
 
 from keystone.common import sql
 import keystone.conf
@@ -29,6 +33,15 @@ from keystone.token import provider
 CONF = keystone.conf.CONF
 LOG = log.getLogger(__name__)
 
+# Upper bound on the number of IDs placed in a single IN clause when tokens are
+# invalidated in bulk, to stay clear of database parameter limits.
+MAX_IDS_PER_QUERY = 500
+
+# The contract migration which fills the scope columns of the tokens issued by
+# nodes of the previous release, after which no token lacks them.
+SCOPE_COLUMNS_CONTRACT_REPO = 'keystone_contract'
+SCOPE_COLUMNS_CONTRACT_VERSION = 2
+
 
 class TokenModel(sql.ModelBase, sql.DictBase):
     __tablename__ = 'token'
@@ -39,14 +52,37 @@ class TokenModel(sql.ModelBase, sql.DictBase):
     valid = sql.Column(sql.Boolean(), default=True, nullable=False)
     user_id = sql.Column(sql.String(64))
     trust_id = sql.Column(sql.String(64))
+    tenant_id = sql.Column(sql.String(64))
+    consumer_id = sql.Column(sql.String(64))
     __table_args__ = (
         sql.Index('ix_token_expires', 'expires'),
         sql.Index('ix_token_expires_valid', 'expires', 'valid'),
         sql.Index('ix_token_user_id', 'user_id'),
-        sql.Index('ix_token_trust_id', 'trust_id')
+        sql.Index('ix_token_trust_id', 'trust_id'),
+        sql.Index('ix_token_tenant_id', 'tenant_id'),
+        sql.Index('ix_token_consumer_id', 'consumer_id')
     )
 
 
+def _get_tenant_id(token_ref_dict):
+    tenant = token_ref_dict.get('tenant')
+    return tenant.get('id') if tenant else None
+
+
+def _get_consumer_id(token_ref_dict):
+    try:
+        oauth = token_ref_dict['token_data']['token'].get('OS-OAUTH1')
+    except (KeyError, TypeError):
+        return None
+    return oauth.get('consumer_id') if oauth else None
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), MAX_IDS_PER_QUERY):
+        yield ids[i:i + MAX_IDS_PER_QUERY]
+
+
 def _expiry_range_batched(session, upper_bound_func, batch_size):
     """Return the stop point of the next batch for expiration.
 
@@ -101,6 +137,11 @@ class Token(token.persistence.TokenDriverV8):
 
         token_ref = TokenModel.from_dict(data_copy)
         token_ref.valid = True
+        # NOTE: The scope is kept in extra as well, so that the token data
+        # handed back by to_dict() is unchanged; the columns only exist to
+        # make revocation queries cheap.
+        token_ref.tenant_id = _get_tenant_id(data_copy)
+        token_ref.consumer_id = _get_consumer_id(data_copy)
         with sql.session_for_write() as session:
             session.add(token_ref)
         return token_ref.to_dict()
@@ -112,6 +153,98 @@ class Token(token.persistence.TokenDriverV8):
                 raise exception.TokenNotFound(token_id=token_id)
             token_ref.valid = False
 
+    def _live_tokens_query(self, session, *criteria):
+        query = session.query(TokenModel.id)
+        query = query.filter_by(valid=True)
+        query = query.filter(TokenModel.expires > timeutils.utcnow())
+        return query.filter(*criteria)
+
+    def _invalidate_tokens(self, session, *criteria):
+        """Invalidate the live tokens matching criteria with one UPDATE.
+
+        The IDs are read first, from the indexes alone, because callers have
+        to evict the tokens from the cache.
+
+        """
+        query = self._live_tokens_query(session, *criteria)
+        token_list = [token_id for token_id, in query]
+        if token_list:
+            query.update({'valid': False}, synchronize_session=False)
+        return token_list
+
+    # Set once the contract migration is found to have run, as it is never
+    # undone.
+    _scope_columns_backfilled = False
+
+    def _has_unindexed_tokens(self, session):
+        """Whether tokens without the scope columns may be live.
+
+        A database which isn't under version control was created with the
+        columns, otherwise they can be unset until the contract migration.
+
+        """
+        if self._scope_columns_backfilled:
+            return False
+        connection = session.connection()
+        if connection.dialect.has_table(connection, 'migrate_version'):
+            migrate_version = sqlalchemy.table(
+                'migrate_version', sqlalchemy.column('repository_id'),
+                sqlalchemy.column('version'))
+            query = sqlalchemy.select([migrate_version.c.version]).where(
+                migrate_version.c.repository_id ==
+                SCOPE_COLUMNS_CONTRACT_REPO)
+            version = connection.execute(query).scalar()
+            if version is None or version < SCOPE_COLUMNS_CONTRACT_VERSION:
+                return True
+        self._scope_columns_backfilled = True
+        return False
+
+    def _list_unindexed_tokens(self, session, owner, tenant_ids=None,
+                               consumer_id=None):
+        """List the live tokens of an owner whose scope columns are unset.
+
+        Nodes still running the previous release issue tokens without the
+        tenant_id and consumer_id columns until every node is upgraded and
+        the contract migration backfills them, so those tokens are matched
+        on their extra data instead.
+
+        :param owner: the criterion on the user or trust of the tokens
+        :param tenant_ids: the projects the tokens must be scoped to, or None
+        :param consumer_id: the OAuth consumer the tokens must be issued to,
+                            or None
+
+        """
+        if not self._has_unindexed_tokens(session):
+            return []
+        query = session.query(TokenModel.id, TokenModel.extra)
+        query = query.filter_by(valid=True)
+        query = query.filter(TokenModel.expires > timeutils.utcnow(), owner)
+        if tenant_ids is not None:
+            query = query.filter(TokenModel.tenant_id.is_(None))
+        if consumer_id is not None:
+            query = query.filter(TokenModel.consumer_id.is_(None))
+        token_list = []
+        for token_id, extra in query:
+            extra = extra or {}
+            if tenant_ids is not None and (
+                    _get_tenant_id(extra) not in tenant_ids):
+                continue
+            if consumer_id is not None and (
+                    _get_consumer_id(extra) != consumer_id):
+                continue
+            token_list.append(token_id)
+        return token_list
+
+    def _invalidate_unindexed_tokens(self, session, owner, tenant_ids=None,
+                                     consumer_id=None):
+        token_list = self._list_unindexed_tokens(
+            session, owner, tenant_ids=tenant_ids, consumer_id=consumer_id)
+        for chunk in _chunks(token_list):
+            query = session.query(TokenModel)
+            query = query.filter(TokenModel.id.in_(chunk))
+            query.update({'valid': False}, synchronize_session=False)
+        return token_list
+
     def delete_tokens(self, user_id, tenant_id=None, trust_id=None,
                       consumer_id=None):
         """Delete all tokens in one session.
@@ -122,90 +255,97 @@ class Token(token.persistence.TokenDriverV8):
         or the trustor's user ID, so will use trust_id to query the tokens.
 
         """
-        token_list = []
+        if trust_id:
+            owner = TokenModel.trust_id == trust_id
+        else:
+            owner = TokenModel.user_id == user_id
+        scope_criteria = []
+        if tenant_id:
+            scope_criteria.append(TokenModel.tenant_id == tenant_id)
+        if consumer_id:
+            scope_criteria.append(TokenModel.consumer_id == consumer_id)
         with sql.session_for_write() as session:
-            now = timeutils.utcnow()
-            query = session.query(TokenModel)
-            query = query.filter_by(valid=True)
-            query = query.filter(TokenModel.expires > now)
-            if trust_id:
-                query = query.filter(TokenModel.trust_id == trust_id)
-            else:
-                query = query.filter(TokenModel.user_id == user_id)
-
-            for token_ref in query.all():
-                if tenant_id:
-                    token_ref_dict = token_ref.to_dict()
-                    if not self._tenant_matches(tenant_id, token_ref_dict):
-                        continue
-                if consumer_id:
-                    token_ref_dict = token_ref.to_dict()
-                    if not self._consumer_matches(consumer_id, token_ref_dict):
-                        continue
-
-                token_ref.valid = False
-                token_list.append(token_ref.id)
-
-        return token_list
+            token_list = self._invalidate_tokens(session, owner,
+                                                 *scope_criteria)
+            if scope_criteria:
+                token_list.extend(self._invalidate_unindexed_tokens(
+                    session, owner,
+                    tenant_ids=[tenant_id] if tenant_id else None,
+                    consumer_id=consumer_id or None))
+            return token_list
+
+    def delete_tokens_in_bulk(self, user_ids, project_ids=None,
+                              trusts=None):
+        """Delete the tokens of many users and trusts in one session.
+
+        One UPDATE is issued per combination of ID chunks, which for all but
+        the largest sets means one or two statements in total.
+
+        :raises keystone.exception.NotImplemented: If user_ids is None before
+            the contract migration, as tokens without the scope columns are
+            only looked for among the tokens of given users.
 
-    def _tenant_matches(self, tenant_id, token_ref_dict):
-        return ((tenant_id is None) or
-                (token_ref_dict.get('tenant') and
-                 token_ref_dict['tenant'].get('id') == tenant_id))
-
-    def _consumer_matches(self, consumer_id, ref):
-        if consumer_id is None:
-            return True
+        """
+        if user_ids is None:
+            if project_ids is not None:
+                with sql.session_for_read() as session:
+                    if self._has_unindexed_tokens(session):
+                        raise exception.NotImplemented()
+            # The tokens of the projects are wanted whoever they were issued
+            # to, trusts included.
+            owner_criteria = [true()]
         else:
-            try:
-                oauth = ref['token_data']['token'].get('OS-OAUTH1', {})
-                return oauth and oauth['consumer_id'] == consumer_id
-            except KeyError:
-                return False
+            owner_criteria = [TokenModel.user_id.in_(chunk)
+                              for chunk in _chunks(user_ids)]
+            owner_criteria.extend(TokenModel.trust_id.in_(chunk)
+                                  for chunk in _chunks(trusts or {}))
+        if project_ids is None:
+            scope_criteria = [true()]
+        else:
+            scope_criteria = [TokenModel.tenant_id.in_(chunk)
+                              for chunk in _chunks(project_ids)]
+
+        token_list = []
+        with sql.session_for_write() as session:
+            for owner, scope in itertools.product(owner_criteria,
+                                                  scope_criteria):
+                token_list.extend(
+                    self._invalidate_tokens(session, owner, scope))
+            if user_ids is not None and project_ids is not None:
+                project_ids = set(project_ids)
+                for owner in owner_criteria:
+                    token_list.extend(self._invalidate_unindexed_tokens(
+                        session, owner, tenant_ids=project_ids))
+        return token_list
 
     def _list_tokens_for_trust(self, trust_id):
         with sql.session_for_read() as session:
-            tokens = []
-            now = timeutils.utcnow()
-            query = session.query(TokenModel)
-            query = query.filter(TokenModel.expires > now)
-            query = query.filter(TokenModel.trust_id == trust_id)
-
-            token_references = query.filter_by(valid=True)
-            for token_ref in token_references:
-                token_ref_dict = token_ref.to_dict()
-                tokens.append(token_ref_dict['id'])
-            return tokens
+            query = self._live_tokens_query(
+                session, TokenModel.trust_id == trust_id)
+            return [token_id for token_id, in query]
 
     def _list_tokens_for_user(self, user_id, tenant_id=None):
+        owner = TokenModel.user_id == user_id
+        criteria = [owner]
+        if tenant_id is not None:
+            criteria.append(TokenModel.tenant_id == tenant_id)
         with sql.session_for_read() as session:
-            tokens = []
-            now = timeutils.utcnow()
-            query = session.query(TokenModel)
-            query = query.filter(TokenModel.expires > now)
-            query = query.filter(TokenModel.user_id == user_id)
-
-            token_references = query.filter_by(valid=True)
-            for token_ref in token_references:
-                token_ref_dict = token_ref.to_dict()
-                if self._tenant_matches(tenant_id, token_ref_dict):
-                    tokens.append(token_ref['id'])
-            return tokens
+            query = self._live_tokens_query(session, *criteria)
+            token_list = [token_id for token_id, in query]
+            if tenant_id is not None:
+                token_list.extend(self._list_unindexed_tokens(
+                    session, owner, tenant_ids=[tenant_id]))
+            return token_list
 
     def _list_tokens_for_consumer(self, user_id, consumer_id):
-        tokens = []
-        with sql.session_for_write() as session:
-            now = timeutils.utcnow()
-            query = session.query(TokenModel)
-            query = query.filter(TokenModel.expires > now)
-            query = query.filter(TokenModel.user_id == user_id)
-            token_references = query.filter_by(valid=True)
-
-            for token_ref in token_references:
-                token_ref_dict = token_ref.to_dict()
-                if self._consumer_matches(consumer_id, token_ref_dict):
-                    tokens.append(token_ref_dict['id'])
-        return tokens
+        owner = TokenModel.user_id == user_id
+        with sql.session_for_read() as session:
+            query = self._live_tokens_query(
+                session, owner, TokenModel.consumer_id == consumer_id)
+            token_list = [token_id for token_id, in query]
+            token_list.extend(self._list_unindexed_tokens(
+                session, owner, consumer_id=consumer_id))
+            return token_list
 
     def _list_tokens(self, user_id, tenant_id=None, trust_id=None,
                      consumer_id=None):
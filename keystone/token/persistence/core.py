@@ -20,6 +20,7 @@ import copy
 from oslo_log import log
 from oslo_utils import timeutils
 import six
+from six.moves import range
 
 from keystone.common import cache
 from keystone.common import dependency
@@ -27,6 +28,7 @@ from keystone.common import manager
 import keystone.conf
 from keystone import exception
 from keystone.i18n import _LW
+from keystone import notifications
 from keystone.token import utils
 
 
@@ -36,6 +38,10 @@ MEMOIZE = cache.get_memoization_decorator(group='token')
 REVOCATION_MEMOIZE = cache.get_memoization_decorator(group='token',
                                                      expiration_group='revoke')
 
+# The number of projects whose tokens are invalidated together when a domain is
+# disabled or deleted.
+DOMAIN_REVOCATION_BATCH_SIZE = 500
+
 
 @dependency.requires('assignment_api', 'identity_api', 'resource_api',
                      'token_provider_api', 'trust_api')
@@ -105,6 +111,14 @@ class PersistenceManager(manager.Manager):
             self._invalidate_individual_token_cache(unique_id)
         self.invalidate_revocation_list()
 
+    def delete_tokens_in_bulk(self, user_ids, project_ids=None, trusts=None):
+        if not CONF.token.revoke_by_id:
+            return []
+        token_list = self.driver.delete_tokens_in_bulk(
+            user_ids, project_ids=project_ids, trusts=trusts)
+        self._invalidate_token_list(token_list)
+        return token_list
+
     @REVOCATION_MEMOIZE
     def list_revoked_tokens(self):
         return self.driver.list_revoked_tokens()
@@ -122,23 +136,55 @@ class PersistenceManager(manager.Manager):
         that are owned by the given domain, as well as any tokens issued
         to users that are owned by this domain.
 
+        The projects are handled in batches, each reported with an internal
+        ``DOMAIN_TOKEN_PERSISTENCE_PROGRESS`` notification. Drivers that
+        cannot invalidate the tokens of a project regardless of their user
+        are given the users with a role in the domain instead.
+
         However, deletion of domain_scoped tokens will still need to be
         implemented as stated in TODO below.
         """
         if not CONF.token.revoke_by_id:
             return
-        projects = self.resource_api.list_projects()
-        for project in projects:
-            if project['domain_id'] == domain_id:
-                for user_id in self.assignment_api.list_user_ids_for_project(
-                        project['id']):
-                    self.delete_tokens_for_user(user_id, project['id'])
+        project_ids = self.resource_api.list_project_ids_from_domain_ids(
+            [domain_id])
+        user_ids = None
+        token_count = 0
+        for i in range(0, len(project_ids), DOMAIN_REVOCATION_BATCH_SIZE):
+            batch = project_ids[i:i + DOMAIN_REVOCATION_BATCH_SIZE]
+            token_list = None
+            if user_ids is None:
+                try:
+                    token_list = self.delete_tokens_in_bulk(
+                        None, project_ids=batch)
+                except exception.NotImplemented:
+                    user_ids = self.assignment_api.list_user_ids_for_domain(
+                        domain_id, project_ids)
+            if token_list is None:
+                token_list = self._delete_tokens_in_bulk(
+                    user_ids, project_ids=batch)
+            token_count += len(token_list)
+            self._notify_domain_progress(domain_id, i + len(batch),
+                                         len(project_ids), token_count)
         # TODO(morganfainberg): implement deletion of domain_scoped tokens.
 
         users = self.identity_api.list_users(domain_id)
         user_ids = (user['id'] for user in users)
         self.delete_tokens_for_users(user_ids)
 
+    def _notify_domain_progress(self, domain_id, projects_done,
+                                project_count, token_count):
+        LOG.debug('Invalidated %(tokens)d tokens of %(done)d/%(count)d '
+                  'projects of domain %(domain)s',
+                  {'tokens': token_count, 'done': projects_done,
+                   'count': project_count, 'domain': domain_id})
+        payload = {'domain_id': domain_id,
+                   'projects_done': projects_done,
+                   'project_count': project_count,
+                   'token_count': token_count}
+        notifications.Audit.internal(
+            notifications.DOMAIN_TOKEN_PERSISTENCE_PROGRESS, payload)
+
     def delete_tokens_for_user(self, user_id, project_id=None):
         """Delete all tokens for a given user or user-project combination.
 
@@ -148,26 +194,7 @@ class PersistenceManager(manager.Manager):
         """
         if not CONF.token.revoke_by_id:
             return
-        self.delete_tokens(user_id, tenant_id=project_id)
-        for trust in self.trust_api.list_trusts_for_trustee(user_id):
-            # Ensure we revoke tokens associated to the trust / project
-            # user_id combination.
-            self.delete_tokens(user_id, trust_id=trust['id'],
-                               tenant_id=project_id)
-        for trust in self.trust_api.list_trusts_for_trustor(user_id):
-            # Ensure we revoke tokens associated to the trust / project /
-            # user_id combination where the user_id is the trustor.
-
-            # NOTE(morganfainberg): This revocation is a bit coarse, but it
-            # covers a number of cases such as disabling of the trustor user,
-            # deletion of the trustor user (for any number of reasons). It
-            # might make sense to refine this and be more surgical on the
-            # deletions (e.g. don't revoke tokens for the trusts when the
-            # trustor changes password). For now, to maintain previous
-            # functionality, this will continue to be a bit overzealous on
-            # revocations.
-            self.delete_tokens(trust['trustee_user_id'], trust_id=trust['id'],
-                               tenant_id=project_id)
+        self.delete_tokens_for_users([user_id], project_id=project_id)
 
     def delete_tokens_for_users(self, user_ids, project_id=None):
         """Delete all tokens for a list of user_ids.
@@ -177,8 +204,35 @@ class PersistenceManager(manager.Manager):
         """
         if not CONF.token.revoke_by_id:
             return
-        for user_id in user_ids:
-            self.delete_tokens_for_user(user_id, project_id=project_id)
+        project_ids = None if project_id is None else [project_id]
+        self._delete_tokens_in_bulk(user_ids, project_ids=project_ids)
+
+    def _delete_tokens_in_bulk(self, user_ids, project_ids=None):
+        user_ids = set(user_ids)
+        if not user_ids:
+            return []
+        # Tokens issued through a trust are bound to the trust rather than to
+        # the user, so revoke them for the trusts the users take part in,
+        # whether as trustee or as trustor.
+
+        # NOTE(morganfainberg): This revocation is a bit coarse, but it
+        # covers a number of cases such as disabling of the trustor user,
+        # deletion of the trustor user (for any number of reasons). It
+        # might make sense to refine this and be more surgical on the
+        # deletions (e.g. don't revoke tokens for the trusts when the
+        # trustor changes password). For now, to maintain previous
+        # functionality, this will continue to be a bit overzealous on
+        # revocations.
+        trusts = {trust['id']: trust['trustee_user_id']
+                  for trust in self.trust_api.list_trusts_for_users(user_ids)}
+        return self.delete_tokens_in_bulk(
+            user_ids, project_ids=project_ids, trusts=trusts)
+
+    def _invalidate_token_list(self, token_list):
+        for token_id in token_list:
+            unique_id = utils.generate_unique_id(token_id)
+            self._invalidate_individual_token_cache(unique_id)
+        self.invalidate_revocation_list()
 
     def _invalidate_individual_token_cache(self, token_id):
         # NOTE(morganfainberg): invalidate takes the exact same arguments as
@@ -317,6 +371,58 @@ class TokenDriverV8(object):
                 pass
         return token_list
 
+    def delete_tokens_in_bulk(self, user_ids, project_ids=None,
+                              trusts=None):
+        """Delete the tokens of many users and trusts at once.
+
+        A token is deleted if it was issued to one of the users or through
+        one of the trusts and, when project_ids is not None, it is scoped to
+        one of the projects.
+
+        Drivers that can invalidate sets of tokens in a single operation
+        should override this; the default lists the tokens of each user and
+        trust once and deletes those scoped to one of the projects.
+
+        :param user_ids: identities of the users, or None for tokens issued
+                         to any user, in which case project_ids is required
+        :type user_ids: iterable of strings
+        :param project_ids: identities of the projects, or None for tokens
+                            with any scope
+        :type project_ids: iterable of strings
+        :param trusts: trustee user IDs keyed by trust ID
+        :type trusts: dict
+        :returns: The tokens that have been deleted.
+        :raises keystone.exception.NotImplemented: If user_ids is None, as
+            the default implementation can only find tokens by user.
+
+        """
+        if user_ids is None:
+            raise exception.NotImplemented()
+        if not CONF.token.revoke_by_id:
+            return []
+        if project_ids is not None:
+            project_ids = set(project_ids)
+        owners = [(user_id, None) for user_id in user_ids]
+        owners.extend((trustee_user_id, trust_id) for trust_id, trustee_user_id
+                      in (trusts or {}).items())
+        token_list = []
+        for user_id, trust_id in owners:
+            if project_ids is None:
+                token_list.extend(self.delete_tokens(
+                    user_id, trust_id=trust_id) or [])
+                continue
+            for token_id in self._list_tokens(user_id, trust_id=trust_id):
+                try:
+                    tenant = self.get_token(token_id).get('tenant')
+                    if not tenant or tenant.get('id') not in project_ids:
+                        continue
+                    self.delete_token(token_id)
+                except exception.NotFound:  # nosec
+                    # The token is already gone, good.
+                    continue
+                token_list.append(token_id)
+        return token_list
+
     @abc.abstractmethod
     def _list_tokens(self, user_id, tenant_id=None, trust_id=None,
                      consumer_id=None):
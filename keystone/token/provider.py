@@ -45,6 +45,15 @@ MEMOIZE_TOKENS = cache.get_memoization_decorator(
     group='token',
     region=TOKENS_REGION)
 
+# This builds a discrete cache region dedicated to the parts of the token data
+# which do not depend on the token itself (the user, scope, roles and catalog)
+# computed for a given user, scope and trust. Any change to what they are built
+# from should invalidate this entire cache region.
+TOKEN_DATA_REGION = cache.create_region(name='token data')
+MEMOIZE_TOKEN_DATA = cache.get_memoization_decorator(
+    group='token',
+    region=TOKEN_DATA_REGION)
+
 # NOTE(morganfainberg): This is for compatibility in case someone was relying
 # on the old location of the UnsupportedTokenVersionException for their code.
 UnsupportedTokenVersionException = exception.UnsupportedTokenVersionException
@@ -176,6 +185,32 @@ class Manager(manager.Manager):
                 notifications.register_event_callback(event, resource_type,
                                                       callback_fns)
 
+        # The token data cached for a user, scope and trust has to be rebuilt
+        # whenever any of them change. Changes to the roles granted do not
+        # notify callbacks, so the assignment and identity managers invalidate
+        # the region themselves, along with the computed assignments.
+        token_data_callbacks = {
+            notifications.ACTIONS.updated: [
+                'domain', 'group', 'project', 'role', 'user',
+            ],
+            notifications.ACTIONS.deleted: [
+                'OS-TRUST:trust', 'OS-OAUTH1:consumer',
+                'OS-OAUTH1:access_token', 'role', 'user', 'project',
+            ],
+            notifications.ACTIONS.disabled: [
+                'user', 'project', 'domain',
+            ],
+            notifications.ACTIONS.internal: [
+                notifications.INVALIDATE_USER_TOKEN_PERSISTENCE,
+                notifications.INVALIDATE_USER_PROJECT_TOKEN_PERSISTENCE,
+            ],
+        }
+
+        for event, resource_types in token_data_callbacks.items():
+            for resource_type in resource_types:
+                notifications.register_event_callback(
+                    event, resource_type, self._invalidate_token_data_callback)
+
     @property
     def _needs_persistence(self):
         return self.driver.needs_persistence()
@@ -496,6 +531,10 @@ class Manager(manager.Manager):
                 self.assignment_api.list_user_ids_for_project(project_id),
                 project_id=project_id)
 
+    def _invalidate_token_data_callback(self, service, resource_type,
+                                        operation, payload):
+        TOKEN_DATA_REGION.invalidate()
+
     def _delete_user_oauth_consumer_tokens_callback(self, service,
                                                     resource_type, operation,
                                                     payload):
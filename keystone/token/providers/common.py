@@ -12,6 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
+
 from oslo_log import log
 from oslo_serialization import jsonutils
 import six
@@ -31,6 +33,14 @@ from keystone.token import provider
 LOG = log.getLogger(__name__)
 CONF = keystone.conf.CONF
 
+# The parts of the V3 token data which only depend on the user, the scope and
+# the trust of a token, and not on the token itself. The catalog is left out,
+# as the catalog manager keeps the rendered catalogs itself.
+REUSABLE_TOKEN_DATA = ('domain', 'project', 'is_domain', 'is_admin_project',
+                       'user', 'OS-TRUST:trust', 'roles')
+# The parts of the V3 token data taken from the token being rebuilt, if any.
+KNOWN_TOKEN_DATA = REUSABLE_TOKEN_DATA + ('catalog',)
+
 
 @dependency.requires('catalog_api', 'resource_api', 'assignment_api',
                      'trust_api', 'identity_api')
@@ -560,6 +570,31 @@ class V3TokenDataHelper(object):
             LOG.error(msg)
             raise exception.UnexpectedError(msg)
 
+    @provider.MEMOIZE_TOKEN_DATA
+    def _get_reusable_token_data(self, user_id, domain_id, project_id,
+                                 trust_id):
+        trust = self.trust_api.get_trust(trust_id) if trust_id else None
+        token_data = self.get_token_data(
+            user_id, [], domain_id=domain_id, project_id=project_id,
+            trust=trust)['token']
+        return {x: token_data[x] for x in REUSABLE_TOKEN_DATA
+                if x in token_data}
+
+    def get_reusable_token_data(self, user_id, domain_id=None,
+                                project_id=None, trust_id=None):
+        """Return the parts of the token data which can be shared by tokens.
+
+        The user, scope and roles of a token only depend on its user, scope
+        and trust. They are cached for each of those, and the cache is
+        invalidated whenever any of them change.
+
+        :returns: a dictionary to be passed as the `token` of
+                  :meth:`get_token_data`.
+
+        """
+        return copy.deepcopy(self._get_reusable_token_data(
+            user_id, domain_id, project_id, trust_id))
+
     def get_token_data(self, user_id, method_names, domain_id=None,
                        project_id=None, expires=None, trust=None, token=None,
                        include_catalog=True, bind=None, access_token=None,
@@ -568,7 +603,7 @@ class V3TokenDataHelper(object):
 
         # We've probably already written these to the token
         if token:
-            for x in ('roles', 'user', 'catalog', 'project', 'domain'):
+            for x in KNOWN_TOKEN_DATA:
                 if x in token:
                     token_data[x] = token[x]
 
@@ -813,6 +848,12 @@ class BaseProvider(provider.Provider):
         access_token = None
         if access_token_id:
             access_token = self.oauth_api.get_access_token(access_token_id)
+        elif not federated_info:
+            # NOTE: The roles of federated and OAuth tokens are not those of
+            # the user on the scope, so their token data is never shared.
+            token_dict = self.v3_token_data_helper.get_reusable_token_data(
+                user_id, domain_id=domain_id, project_id=project_id,
+                trust_id=trust_id)
 
         return self.v3_token_data_helper.get_token_data(
             user_id,
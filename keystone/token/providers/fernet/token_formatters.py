@@ -40,6 +40,12 @@ LOG = log.getLogger(__name__)
 TIMESTAMP_START = 1
 TIMESTAMP_END = 9
 
+# Tokens carrying a key ID hint are prefixed with this marker and the ID of the
+# key that encrypted them, ahead of the actual Fernet token. The marker can not
+# be confused with the version byte (0x80) that starts every Fernet token.
+KEY_ID_HINT_MARKER = b'\x91'
+KEY_ID_HINT_LENGTH = len(KEY_ID_HINT_MARKER) + utils.KEY_ID_LENGTH
+
 
 class TokenFormatter(object):
     """Packs and unpacks payloads into tokens for transport."""
@@ -57,17 +63,21 @@ class TokenFormatter(object):
         ``encrypt(plaintext)`` and ``decrypt(ciphertext)``.
 
         """
-        fernet_utils = utils.FernetUtils(
-            CONF.fernet_tokens.key_repository,
-            CONF.fernet_tokens.max_active_keys
-        )
-        keys = fernet_utils.load_keys()
+        crypto = self.key_ring.crypto
 
-        if not keys:
+        if crypto is None:
             raise exception.KeysNotFound()
 
-        fernet_instances = [fernet.Fernet(key) for key in keys]
-        return fernet.MultiFernet(fernet_instances)
+        return crypto
+
+    @property
+    def key_ring(self):
+        """Return the key ring of the Fernet key repository."""
+        return utils.get_key_ring(
+            CONF.fernet_tokens.key_repository,
+            CONF.fernet_tokens.max_active_keys,
+            CONF.fernet_tokens.key_repository_check_interval
+        )
 
     def pack(self, payload):
         """Pack a payload for transport as a token.
@@ -76,8 +86,43 @@ class TokenFormatter(object):
         :rtype: six.text_type
 
         """
+        if CONF.fernet_tokens.key_id_hint:
+            primary = self.key_ring.primary
+            if primary is None:
+                raise exception.KeysNotFound()
+            key_id, crypto = primary
+            token_bytes = base64.urlsafe_b64decode(crypto.encrypt(payload))
+            token = base64.urlsafe_b64encode(
+                KEY_ID_HINT_MARKER + key_id + token_bytes)
+        else:
+            token = self.crypto.encrypt(payload)
+
         # base64 padding (if any) is not URL-safe
-        return self.crypto.encrypt(payload).rstrip(b'=').decode('utf-8')
+        return token.rstrip(b'=').decode('utf-8')
+
+    @classmethod
+    def _split_key_id_hint(cls, token):
+        """Split the key ID hint, if any, from a padded token.
+
+        :type token: six.text_type
+        :returns: a tuple of the key ID (or None) and the Fernet token
+        :rtype: (six.binary_type, six.binary_type)
+
+        """
+        token = token.encode('utf-8')
+        # The first four characters decode to the first three bytes of the
+        # token, which is enough to tell the marker from the Fernet version.
+        try:
+            first_bytes = base64.urlsafe_b64decode(token[:4])
+            if first_bytes[:1] != KEY_ID_HINT_MARKER:
+                return None, token
+            token_bytes = base64.urlsafe_b64decode(token)
+        except (TypeError, ValueError):
+            return None, token
+        key_id = token_bytes[len(KEY_ID_HINT_MARKER):KEY_ID_HINT_LENGTH]
+        fernet_token = base64.urlsafe_b64encode(
+            token_bytes[KEY_ID_HINT_LENGTH:])
+        return key_id, fernet_token
 
     def unpack(self, token):
         """Unpack a token, and validate the payload.
@@ -100,8 +145,17 @@ class TokenFormatter(object):
         else:
             token = TokenFormatter.restore_padding(token)
 
+        key_id, fernet_token = self._split_key_id_hint(token)
         try:
-            return self.crypto.decrypt(token.encode('utf-8'))
+            if key_id is None:
+                return self.crypto.decrypt(fernet_token)
+
+            # The hint tells us which key encrypted the token, so there is
+            # exactly one HMAC to verify, no matter how many keys are active.
+            crypto = self.key_ring.fernets_by_key_id.get(key_id)
+            if crypto is None:
+                raise fernet.InvalidToken
+            return crypto.decrypt(fernet_token)
         except fernet.InvalidToken:
             raise exception.ValidationError(
                 _('This is not a recognized Fernet token %s') % token)
@@ -135,6 +189,8 @@ class TokenFormatter(object):
         # Fernet tokens are base64 encoded, so we need to unpack them first
         # urlsafe_b64decode() requires six.binary_type
         token_bytes = base64.urlsafe_b64decode(fernet_token.encode('utf-8'))
+        if token_bytes[:1] == KEY_ID_HINT_MARKER:
+            token_bytes = token_bytes[KEY_ID_HINT_LENGTH:]
 
         # slice into the byte array to get just the timestamp
         timestamp_bytes = token_bytes[TIMESTAMP_START:TIMESTAMP_END]
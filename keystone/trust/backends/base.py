@@ -54,6 +54,24 @@ class TrustDriverV8(object):
     def list_trusts_for_trustor(self, trustor):
         raise exception.NotImplemented()  # pragma: no cover
 
+    def list_trusts_for_users(self, user_ids):
+        """List the trusts in which any of the users is trustee or trustor.
+
+        Drivers that can look up many users in a single query should
+        override this; the default lists the trusts of each user in turn.
+
+        :param user_ids: the user identifiers
+        :type user_ids: iterable of strings
+        :returns: a list of trusts, each listed once
+        """
+        trusts = {}
+        for user_id in user_ids:
+            for trust in self.list_trusts_for_trustee(user_id):
+                trusts[trust['id']] = trust
+            for trust in self.list_trusts_for_trustor(user_id):
+                trusts[trust['id']] = trust
+        return list(trusts.values())
+
     @abc.abstractmethod
     def delete_trust(self, trust_id):
         raise exception.NotImplemented()  # pragma: no cover
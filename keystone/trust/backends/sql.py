@@ -16,6 +16,7 @@ import time
 
 from oslo_utils import timeutils
 from six.moves import range
+import sqlalchemy
 
 from keystone.common import sql
 from keystone import exception
@@ -26,6 +27,10 @@ from keystone.trust.backends import base
 # locking on consuming a limited-use trust.
 MAXIMUM_CONSUME_ATTEMPTS = 10
 
+# The maximum number of users whose trusts are looked up by a single query,
+# which keeps the IN clauses within the limits of every supported database.
+MAX_USERS_PER_QUERY = 500
+
 
 class TrustModel(sql.ModelBase, sql.DictBase):
     __tablename__ = 'trust'
@@ -174,6 +179,23 @@ class Trust(base.TrustDriverV8):
                       filter_by(trustor_user_id=trustor_user_id))
             return [trust_ref.to_dict() for trust_ref in trusts]
 
+    @sql.handle_conflicts(conflict_type='trust')
+    def list_trusts_for_users(self, user_ids):
+        user_ids = list(set(user_ids))
+        refs = {}
+        with sql.session_for_read() as session:
+            for i in range(0, len(user_ids), MAX_USERS_PER_QUERY):
+                chunk = user_ids[i:i + MAX_USERS_PER_QUERY]
+                trusts = (session.query(TrustModel).
+                          filter_by(deleted_at=None).
+                          filter(sqlalchemy.or_(
+                              TrustModel.trustee_user_id.in_(chunk),
+                              TrustModel.trustor_user_id.in_(chunk))))
+                # A trust between users of different chunks is found twice.
+                refs.update((trust_ref.id, trust_ref.to_dict())
+                            for trust_ref in trusts)
+        return list(refs.values())
+
     @sql.handle_conflicts(conflict_type='trust')
     def delete_trust(self, trust_id):
         with sql.session_for_write() as session:
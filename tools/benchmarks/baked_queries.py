@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare building role assignment queries per call with baking them.
+
+The assignments are kept in an in-memory SQLite database, so that the time
+spent building and compiling queries dominates.
+
+Usage: python tools/benchmarks/baked_queries.py [number of calls]
+
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+import uuid
+
+import sqlalchemy
+from sqlalchemy import orm
+
+from keystone.assignment.backends import sql as assignment_sql
+from keystone.common import sql
+
+
+RoleAssignment = assignment_sql.RoleAssignment
+AssignmentType = assignment_sql.AssignmentType
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def build_query(session, role_id, actors, targets, assignment_types):
+    query = session.query(RoleAssignment)
+    query = query.filter_by(role_id=role_id)
+    query = query.filter(RoleAssignment.actor_id.in_(actors))
+    query = query.filter(RoleAssignment.target_id.in_(targets))
+    query = query.filter(RoleAssignment.type.in_(assignment_types))
+    return query.all()
+
+
+def baked_query(session, role_id, actors, targets, assignment_types):
+    query = sql.bakery(lambda session: session.query(RoleAssignment))
+    query += lambda q: q.filter(
+        RoleAssignment.role_id == sql.bindparam('role_id'))
+    params = {'role_id': role_id}
+    actors_size = sql.in_size(actors)
+    query.add_criteria(lambda q: q.filter(sql.in_bindparams(
+        RoleAssignment.actor_id, 'actor_id', actors_size)), actors_size)
+    params.update(sql.in_params('actor_id', actors, actors_size))
+    targets_size = sql.in_size(targets)
+    query.add_criteria(lambda q: q.filter(sql.in_bindparams(
+        RoleAssignment.target_id, 'target_id', targets_size)), targets_size)
+    params.update(sql.in_params('target_id', targets, targets_size))
+    types_size = sql.in_size(assignment_types)
+    query.add_criteria(lambda q: q.filter(sql.in_bindparams(
+        RoleAssignment.type, 'type', types_size)), types_size)
+    params.update(sql.in_params('type', assignment_types, types_size))
+    return query(session).params(**params).all()
+
+
+def main(count):
+    engine = sqlalchemy.create_engine('sqlite://')
+    RoleAssignment.__table__.create(engine)
+    session = orm.sessionmaker(bind=engine)()
+
+    user_ids = [_new_id() for _ in range(100)]
+    project_ids = [_new_id() for _ in range(100)]
+    role_ids = [_new_id() for _ in range(5)]
+    for user_id in user_ids:
+        for project_id in random.sample(project_ids, 5):
+            session.add(RoleAssignment(
+                type=AssignmentType.USER_PROJECT, actor_id=user_id,
+                target_id=project_id, role_id=random.choice(role_ids),
+                inherited=False))
+    session.commit()
+
+    calls = [(random.choice(role_ids), [random.choice(user_ids)],
+              random.sample(project_ids, random.randint(1, 3)),
+              [AssignmentType.USER_PROJECT, AssignmentType.GROUP_PROJECT])
+             for _ in range(count)]
+
+    for args in calls[:10]:
+        assert (sorted(ref.target_id for ref in build_query(session, *args)) ==
+                sorted(ref.target_id for ref in baked_query(session, *args)))
+
+    def built():
+        for args in calls:
+            build_query(session, *args)
+
+    def baked():
+        for args in calls:
+            baked_query(session, *args)
+
+    runs = 5
+    built_time = min(timeit.repeat(built, number=1, repeat=runs))
+    baked_time = min(timeit.repeat(baked, number=1, repeat=runs))
+
+    print('%d role assignment queries' % count)
+    print('built per call: %8.3f ms per query' % (built_time * 1000 / count))
+    print('baked:          %8.3f ms per query' % (baked_time * 1000 / count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare reusing a compiled mapping against compiling it per assertion.
+
+Usage: python tools/benchmarks/mapping_rules.py [number of rules]
+
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+import uuid
+
+from keystone.federation import utils as mapping_utils
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def build_rules(count, attributes, group_names):
+    """Build rules resembling a mapping per group of a large organization."""
+    rules = []
+    for i in range(count):
+        kind = i % 4
+        group_name = random.choice(group_names)
+        attribute = random.choice(attributes)
+        local = [{'user': {'name': '{0}'}},
+                 {'group': {'id': _new_id()}}]
+        remote = [{'type': 'UserName'}]
+        if kind == 0:
+            remote.append({'type': attribute,
+                           'any_one_of': random.sample(group_names, 5)})
+        elif kind == 1:
+            remote.append({'type': attribute,
+                           'any_one_of': ['^%s-[0-9]+$' % group_name],
+                           'regex': True})
+        elif kind == 2:
+            remote.append({'type': attribute,
+                           'not_any_of': random.sample(group_names, 5)})
+        else:
+            local = [{'user': {'name': '{0}'}},
+                     {'groups': '{1}', 'domain': {'id': _new_id()}}]
+            remote.append({'type': attribute,
+                           'whitelist': random.sample(group_names, 20)})
+        rules.append({'local': local, 'remote': remote})
+    return rules
+
+
+def build_assertion(attributes, group_names):
+    assertion = {'UserName': _new_id()}
+    # Identity providers rarely release every attribute a mapping knows of.
+    for attribute in random.sample(attributes, len(attributes) // 4 or 1):
+        values = random.sample(group_names, 10)
+        values += ['%s-%d' % (random.choice(group_names), i)
+                   for i in range(5)]
+        assertion[attribute] = ';'.join(values)
+    return assertion
+
+
+def main(count):
+    attributes = ['attribute_%d' % i for i in range(40)]
+    group_names = ['group_%d' % i for i in range(count)]
+    rules = build_rules(count, attributes, group_names)
+    assertions = [build_assertion(attributes, group_names)
+                  for _ in range(50)]
+
+    start = timeit.default_timer()
+    rule_processor = mapping_utils.RuleProcessor(_new_id(), rules)
+    compile_time = timeit.default_timer() - start
+
+    def process(rule_processor, assertion):
+        try:
+            return rule_processor.process(assertion)
+        except Exception:
+            # No rule matched the assertion.
+            return None
+
+    for assertion in assertions:
+        assert (process(mapping_utils.RuleProcessor(_new_id(), rules),
+                        assertion) ==
+                process(rule_processor, assertion))
+
+    def compiled_per_assertion():
+        for assertion in assertions:
+            process(mapping_utils.RuleProcessor(_new_id(), rules), assertion)
+
+    def compiled_once():
+        for assertion in assertions:
+            process(rule_processor, assertion)
+
+    runs = 5
+    per_assertion_time = min(timeit.repeat(compiled_per_assertion, number=1,
+                                           repeat=runs))
+    once_time = min(timeit.repeat(compiled_once, number=1, repeat=runs))
+
+    print('%d rules, %d assertions' % (count, len(assertions)))
+    print('compile:        %8.3f ms' % (compile_time * 1000))
+    print('compiled each:  %8.3f ms per assertion' %
+          (per_assertion_time * 1000 / len(assertions)))
+    print('compiled once:  %8.3f ms per assertion' %
+          (once_time * 1000 / len(assertions)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare walking a project hierarchy with recursive and per level queries.
+
+The projects are stored in a temporary SQLite database, unless a database URL
+is given.
+
+Usage: python tools/benchmarks/project_hierarchy.py [projects] [levels] [url]
+
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+import uuid
+
+import keystone.conf
+from keystone.common import sql
+from keystone.resource.backends import base
+from keystone.resource.backends import sql as resource_sql
+
+
+CONF = keystone.conf.CONF
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def _new_project(domain_id, parent_id, is_domain=False):
+    return {'id': _new_id(), 'name': _new_id(), 'domain_id': domain_id,
+            'description': '', 'enabled': True, 'extra': {},
+            'parent_id': parent_id, 'is_domain': is_domain}
+
+
+def build_hierarchy(count, levels):
+    """Build a tree of projects with the same number of projects per level.
+
+    :returns: the root and the projects of the deepest level
+
+    """
+    domain = _new_project(base.NULL_DOMAIN_ID, None, is_domain=True)
+    root = _new_project(domain['id'], domain['id'])
+    projects = [domain, root]
+    level = [root]
+    for _ in range(levels - 1):
+        parents = level
+        level = [_new_project(domain['id'], random.choice(parents)['id'])
+                 for _ in range(count // (levels - 1))]
+        projects += level
+
+    with sql.session_for_write() as session:
+        table = resource_sql.Project.__table__
+        table.create(session.connection())
+        session.execute(table.insert(), projects)
+    return root, level
+
+
+def main(count, levels, url=None):
+    keystone.conf.configure()
+    CONF([], project='keystone', default_config_files=[])
+    directory = None
+    if url is None:
+        directory = tempfile.mkdtemp()
+        url = 'sqlite:///%s' % os.path.join(directory, 'keystone.db')
+    CONF.set_override('connection', url, group='database')
+
+    try:
+        root, leaves = build_hierarchy(count, levels)
+
+        recursive = resource_sql.Resource()
+        per_level = resource_sql.Resource()
+        per_level._supports_recursive_queries = lambda session: False
+        with sql.session_for_read() as session:
+            if not recursive._supports_recursive_queries(session):
+                sys.exit('The database cannot run recursive queries.')
+
+        leaf_ids = [leaf['id'] for leaf in random.sample(leaves, 100)]
+        assert (len(recursive.list_projects_in_subtree(root['id'])) ==
+                len(per_level.list_projects_in_subtree(root['id'])))
+        for leaf_id in leaf_ids[:10]:
+            assert (recursive.list_project_parents(leaf_id) ==
+                    per_level.list_project_parents(leaf_id))
+
+        def subtree(driver):
+            return lambda: driver.list_projects_in_subtree(root['id'])
+
+        def parents(driver):
+            def list_parents():
+                for leaf_id in leaf_ids:
+                    driver.list_project_parents(leaf_id)
+            return list_parents
+
+        runs = 3
+        print('%d projects, %d levels' % (count, levels))
+        for name, driver in (('recursive', recursive),
+                             ('per level', per_level)):
+            subtree_time = min(timeit.repeat(subtree(driver), number=1,
+                                             repeat=runs))
+            parents_time = min(timeit.repeat(parents(driver), number=1,
+                                             repeat=runs))
+            print('%-10s subtree: %9.3f ms  parents: %8.3f ms per project' %
+                  (name, subtree_time * 1000,
+                   parents_time * 1000 / len(leaf_ids)))
+    finally:
+        if directory:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+         sys.argv[3] if len(sys.argv) > 3 else None)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare the indexed revocation check against the brute force scan.
+
+Usage: python tools/benchmarks/revoke_index.py [number of events]
+
+"""
+
+from __future__ import print_function
+
+import datetime
+import random
+import sys
+import timeit
+import uuid
+
+from oslo_utils import timeutils
+
+from keystone.models import revoke_model
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def build_events(count, user_ids, project_ids, role_ids, domain_ids):
+    """Build a mix of events resembling bulk user and role changes."""
+    events = []
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            event = revoke_model.RevokeEvent(user_id=random.choice(user_ids))
+        elif kind == 1:
+            event = revoke_model.RevokeEvent(
+                user_id=random.choice(user_ids),
+                project_id=random.choice(project_ids),
+                role_id=random.choice(role_ids))
+        elif kind == 2:
+            event = revoke_model.RevokeEvent(audit_id=_new_id())
+        elif kind == 3:
+            event = revoke_model.RevokeEvent(
+                project_id=random.choice(project_ids),
+                role_id=random.choice(role_ids))
+        else:
+            event = revoke_model.RevokeEvent(
+                domain_id=random.choice(domain_ids),
+                role_id=random.choice(role_ids))
+        events.append(event)
+    return events
+
+
+def build_token(user_ids, project_ids, role_ids, domain_ids):
+    issued_at = timeutils.utcnow() - datetime.timedelta(minutes=2)
+    token_values = revoke_model.blank_token_data(issued_at)
+    token_values['user_id'] = random.choice(user_ids)
+    token_values['project_id'] = random.choice(project_ids)
+    token_values['identity_domain_id'] = random.choice(domain_ids)
+    token_values['assignment_domain_id'] = random.choice(domain_ids)
+    token_values['audit_id'] = _new_id()
+    token_values['audit_chain_id'] = token_values['audit_id']
+    token_values['roles'] = random.sample(role_ids, 3)
+    return token_values
+
+
+def main(count):
+    user_ids = [_new_id() for _ in range(count // 2 or 1)]
+    project_ids = [_new_id() for _ in range(count // 4 or 1)]
+    role_ids = [_new_id() for _ in range(20)]
+    domain_ids = [_new_id() for _ in range(10)]
+
+    events = build_events(count, user_ids, project_ids, role_ids,
+                          domain_ids)
+    # Tokens issued after the events, for users never revoked, which is the
+    # common (and most expensive) case of a valid token.
+    other_role_ids = [_new_id() for _ in range(3)]
+    tokens = [build_token([_new_id()], project_ids, other_role_ids,
+                          [_new_id()])
+              for _ in range(100)]
+    # And tokens likely to be revoked.
+    tokens += [build_token(user_ids, project_ids, role_ids, domain_ids)
+               for _ in range(100)]
+    for token_values in tokens:
+        token_values['issued_at'] -= datetime.timedelta(minutes=10)
+
+    start = timeit.default_timer()
+    index = revoke_model.RevokeIndex(events)
+    build_time = timeit.default_timer() - start
+
+    for token_values in tokens:
+        assert (revoke_model.is_revoked(events, token_values) ==
+                index.is_revoked(token_values))
+
+    def brute_force():
+        for token_values in tokens:
+            revoke_model.is_revoked(events, token_values)
+
+    def indexed():
+        for token_values in tokens:
+            index.is_revoked(token_values)
+
+    runs = 5
+    brute_force_time = min(timeit.repeat(brute_force, number=1, repeat=runs))
+    indexed_time = min(timeit.repeat(indexed, number=1, repeat=runs))
+
+    print('%d events, %d token checks' % (count, len(tokens)))
+    print('index build:   %8.3f ms' % (build_time * 1000))
+    print('brute force:   %8.3f ms per check' %
+          (brute_force_time * 1000 / len(tokens)))
+    print('indexed:       %8.3f ms per check' %
+          (indexed_time * 1000 / len(tokens)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
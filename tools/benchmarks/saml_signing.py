@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare signing SAML assertions with xmlsec1 and in process.
+
+Each thread generates signed assertions back to back, like concurrent
+keystone to keystone token exchanges. Run from the root of the repository,
+with xmlsec1 and the xmlsec module installed.
+
+Usage: python tools/benchmarks/saml_signing.py [threads] [assertions]
+
+"""
+
+from __future__ import print_function
+
+import sys
+import threading
+import timeit
+import uuid
+
+import keystone.conf
+from keystone.federation import idp
+
+
+CONF = keystone.conf.CONF
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def exchange_tokens(count):
+    for _ in range(count):
+        generator = idp.SAMLGenerator()
+        generator.samlize_token(
+            'https://acme.com/FIM/sps/openstack/saml20',
+            'http://beta.com/Shibboleth.sso/SAML2/POST',
+            _new_id(), _new_id(), ['admin', 'member'], _new_id(), _new_id())
+
+
+def run(signer, threads, count):
+    CONF.set_override('signer', signer, group='saml')
+    # Load the key and certificate, if the signer does, before timing.
+    exchange_tokens(1)
+
+    workers = [threading.Thread(target=exchange_tokens, args=(count,))
+               for _ in range(threads)]
+    start = timeit.default_timer()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return timeit.default_timer() - start
+
+
+def main(threads, count):
+    keystone.conf.configure()
+    CONF([], project='keystone', default_config_files=[])
+    CONF.set_override('certfile', 'examples/pki/certs/signing_cert.pem',
+                      group='saml')
+    CONF.set_override('keyfile', 'examples/pki/private/signing_key.pem',
+                      group='saml')
+    if not idp.xmlsec:
+        sys.exit('The xmlsec module is not installed.')
+
+    xmlsec1_time = run('xmlsec1', threads, count)
+    in_process_time = run('python-xmlsec', threads, count)
+
+    total = threads * count
+    print('%d threads, %d assertions each' % (threads, count))
+    print('xmlsec1:       %8.3f ms per assertion, %8.1f per second' %
+          (xmlsec1_time * 1000 / total, total / xmlsec1_time))
+    print('in process:    %8.3f ms per assertion, %8.1f per second' %
+          (in_process_time * 1000 / total, total / in_process_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)